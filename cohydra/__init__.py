@@ -1,7 +1,37 @@
 """Cohydra is a testbed for writing scenarios with the ns-3 network simulator."""
 
-from .channel import Channel, CSMAChannel, WiFiChannel
-from .network import Network
-from .node import Node, SwitchNode, DockerNode, LXDNode, ExternalNode, SSHNode, InterfaceNode
-from .scenario import Scenario
 from .argparse import ArgumentParser
+from .util import lazy_attributes
+
+# The other classes are loaded on first use, so importing cohydra (e.g. in tools) is fast
+# and does not load the ns-3 bindings and backends which are not needed.
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'Channel': '.channel',
+    'CSMAChannel': '.channel',
+    'WiFiChannel': '.channel',
+    'NetemChannel': '.channel',
+    'Network': '.network',
+    'Node': '.node',
+    'SwitchNode': '.node',
+    'DockerNode': '.node',
+    'LXDNode': '.node',
+    'ExternalNode': '.node',
+    'SSHNode': '.node',
+    'InterfaceNode': '.node',
+    'Scenario': '.scenario',
+    'CapturePolicy': '.capture',
+    'Distribution': '.distribution',
+    'Host': '.distribution',
+    'MetricsExporter': '.metrics',
+})
+
+__all__ = [
+    'Channel', 'CSMAChannel', 'WiFiChannel', 'NetemChannel',
+    'Network',
+    'Node', 'SwitchNode', 'DockerNode', 'LXDNode', 'ExternalNode', 'SSHNode', 'InterfaceNode',
+    'Scenario',
+    'CapturePolicy',
+    'Distribution', 'Host',
+    'MetricsExporter',
+    'ArgumentParser',
+]
@@ -0,0 +1,11 @@
+"""Post-processing of the captures written by a simulation."""
+from .pcap import CaptureFile, PcapError, PcapReader, PcapngWriter, find_capture_files
+from .merge import merge
+from .protocols import flow_key
+from .index import PcapIndex
+from .columns import load_columns, write_columns
+from .flows import FlowSummarizer, load_flow_monitors, load_flow_summaries, summarize
+
+__all__ = ['CaptureFile', 'PcapError', 'PcapReader', 'PcapngWriter', 'find_capture_files', 'merge', 'PcapIndex',
+           'flow_key', 'load_columns', 'write_columns', 'FlowSummarizer', 'load_flow_monitors', 'load_flow_summaries',
+           'summarize']
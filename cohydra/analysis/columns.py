@@ -0,0 +1,101 @@
+"""Columnar result files, which can be loaded with NumPy.
+
+The files are NumPy :code:`.npz` archives with one :code:`.npy` array per column,
+named :code:`<group>.<column>`. They are written without NumPy, so a simulation host does not need it.
+"""
+
+import array
+import os
+import sys
+import zipfile
+
+# The array module's type codes of the supported (little endian) NumPy types.
+_TYPE_CODES = {
+    'i8': 'q',
+    'u8': 'Q',
+    'u4': 'I',
+    'u2': 'H',
+    'f8': 'd',
+}
+
+def _npy(dtype, values):
+    """Return the bytes of a :code:`.npy` file of a one-dimensional array."""
+    values = list(values)
+    if dtype == 'U':
+        width = max((len(value) for value in values), default=1) or 1
+        descr = f'<U{width}'
+        data = b''.join(value.encode('utf-32-le').ljust(width * 4, b'\0') for value in values)
+    else:
+        descr = f'<{dtype}'
+        column = array.array(_TYPE_CODES[dtype], values)
+        if sys.byteorder != 'little':
+            column.byteswap()
+        data = column.tobytes()
+
+    header = f"{{'descr': '{descr}', 'fortran_order': False, 'shape': ({len(values)},), }}"
+    # The magic, version and header length take 10 bytes. The data is aligned to 64 bytes.
+    header += ' ' * (-(10 + len(header) + 1) % 64) + '\n'
+    return b'\x93NUMPY\x01\x00' + len(header).to_bytes(2, 'little') + header.encode('latin1') + data
+
+def write_columns(path, groups):
+    """Write columns to a :code:`.npz` file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+    groups : dict
+        The groups of columns: the group's name mapped to a dict of the column names mapped to
+        the NumPy type (:code:`'i8'`, :code:`'u8'`, :code:`'u4'`, :code:`'u2'`, :code:`'f8'` or :code:`'U'`
+        for strings) and the values. All columns of a group have the same length.
+    """
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for group, columns in groups.items():
+            for column, (dtype, values) in columns.items():
+                archive.writestr(f'{group}.{column}.npy', _npy(dtype, values))
+
+def load_columns(paths):
+    """Load the columns of several runs into NumPy arrays.
+
+    The columns of the same group are concatenated. An additional :code:`run` column contains the position
+    of the row's file in :code:`paths`. Rows referring to other rows (e.g. the :code:`flow` of an interval)
+    use the position within their run.
+
+    Parameters
+    ----------
+    paths : iterable of str
+        The paths of the files (see :func:`result_paths` for log directories).
+
+    Returns
+    -------
+    dict
+        The group names mapped to dicts of the column names mapped to the arrays.
+    """
+    import numpy # pylint: disable=import-outside-toplevel
+
+    parts = {}
+    for run, path in enumerate(paths):
+        with numpy.load(path) as archive:
+            lengths = {}
+            for key in archive.files:
+                group, _, column = key.partition('.')
+                values = archive[key]
+                parts.setdefault(group, {}).setdefault(column, []).append(values)
+                lengths[group] = len(values)
+            for group, length in lengths.items():
+                parts[group].setdefault('run', []).append(numpy.full(length, run, dtype='u4'))
+
+    return {group: {column: numpy.concatenate(values) for column, values in columns.items()}
+            for group, columns in parts.items()}
+
+def result_paths(paths, file_name):
+    """Resolve log directories to the result files in them.
+
+    Parameters
+    ----------
+    paths : iterable of str
+        Paths of result files or log directories.
+    file_name : str
+        The name of the result file in a log directory.
+    """
+    return [os.path.join(path, file_name) if os.path.isdir(path) else path for path in paths]
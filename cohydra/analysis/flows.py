@@ -0,0 +1,283 @@
+"""Per-flow statistics of the captures of a simulation."""
+
+import collections
+import heapq
+import ipaddress
+import logging
+import os
+
+from .columns import load_columns, result_paths, write_columns
+from .pcap import PcapReader, find_capture_files
+from .protocols import PROTOCOL_TCP, parse_ip, ports, tcp_header
+
+logger = logging.getLogger(__name__)
+
+#: The file name of the flow summary in the log directory.
+FLOW_SUMMARY_FILE_NAME = 'flows.npz'
+#: The file name of the statistics of ns-3's FlowMonitor in the log directory.
+FLOW_MONITOR_FILE_NAME = 'flow-monitor.npz'
+
+# The maximum number of unacknowledged segments per flow remembered for RTT samples.
+_MAX_OUTSTANDING = 4096
+
+_SEQUENCE_MASK = 0xffffffff
+
+# The columns of the summary and their types.
+_FLOW_COLUMNS = (
+    ('node', 'U'), ('ifname', 'U'), ('protocol', 'u2'), ('source', 'U'), ('source_port', 'u2'),
+    ('destination', 'U'), ('destination_port', 'u2'), ('packets', 'u8'), ('bytes', 'u8'), ('first', 'i8'),
+    ('last', 'i8'), ('rtt_samples', 'u8'), ('rtt_mean', 'f8'), ('rtt_min', 'f8'), ('rtt_max', 'f8'),
+    ('retransmissions', 'u8'), ('lost', 'u8'),
+)
+_INTERVAL_COLUMNS = (('flow', 'u8'), ('start', 'i8'), ('packets', 'u8'), ('bytes', 'u8'))
+
+def _after(sequence, other):
+    """Return whether a TCP sequence number is after another one (with wrap around)."""
+    return 0 < (sequence - other) & _SEQUENCE_MASK < 0x80000000
+
+class _FlowStatistics:
+    """The statistics of a flow at an interface."""
+
+    __slots__ = ('packets', 'bytes', 'first', 'last', 'intervals', 'highest', 'outstanding', 'retransmissions',
+                 'rtt_samples', 'rtt_sum', 'rtt_min', 'rtt_max')
+
+    def __init__(self):
+        self.packets = 0
+        self.bytes = 0
+        self.first = None
+        self.last = None
+        self.intervals = {}
+        self.highest = None
+        self.outstanding = collections.deque(maxlen=_MAX_OUTSTANDING)
+        self.retransmissions = 0
+        self.rtt_samples = 0
+        self.rtt_sum = 0
+        self.rtt_min = None
+        self.rtt_max = None
+
+    def add_rtt(self, rtt):
+        self.rtt_samples += 1
+        self.rtt_sum += rtt
+        self.rtt_min = rtt if self.rtt_min is None else min(self.rtt_min, rtt)
+        self.rtt_max = rtt if self.rtt_max is None else max(self.rtt_max, rtt)
+
+class FlowSummarizer:
+    """The FlowSummarizer computes per-flow statistics of the captured packets.
+
+    A flow is identified by its 5-tuple (protocol, addresses and ports) and direction.
+    The statistics are computed per interface capturing the flow:
+
+    * packets and bytes (the frames' original length), also per interval
+    * the time of the first and last packet (in nanoseconds, as timestamped by the capture)
+    * for TCP, round-trip time samples from acknowledged segments (not retransmitted ones).
+      At the sender's interface, this is the round-trip time, at the receiver's interface the
+      time until the receiver acknowledges.
+    * for TCP, the number of retransmitted segments
+    * the number of packets lost, i.e. captured at another interface, but not at this one
+
+    Parameters
+    ----------
+    interval : float
+        The length of the intervals in seconds.
+    """
+
+    def __init__(self, interval=1.0):
+        #: The length of the intervals in nanoseconds.
+        self.interval = int(interval * 1e9)
+        self.__flows = {}
+
+    def add_interface(self, node, ifname, linktype, packets):
+        """Add the packets captured at an interface.
+
+        Parameters
+        ----------
+        node : str
+            The name of the node.
+        ifname : str
+            The name of the interface.
+        linktype : int
+            The link type of the packets.
+        packets : iterable of :class:`.Packet`
+            The packets in the order of capture.
+        """
+        flows = self.__flows
+        for packet in packets:
+            data = packet.data
+            ip_packet = parse_ip(linktype, data)
+            if ip_packet is None:
+                continue
+            source_port, destination_port = ports(ip_packet, data)
+            key = (node, ifname, ip_packet.protocol, ip_packet.source, source_port,
+                   ip_packet.destination, destination_port)
+            statistics = flows.get(key)
+            if statistics is None:
+                statistics = flows[key] = _FlowStatistics()
+                statistics.first = packet.timestamp
+            statistics.packets += 1
+            statistics.bytes += packet.length
+            statistics.last = packet.timestamp
+            interval = statistics.intervals.setdefault(packet.timestamp // self.interval, [0, 0])
+            interval[0] += 1
+            interval[1] += packet.length
+
+            if ip_packet.protocol != PROTOCOL_TCP:
+                continue
+            header = tcp_header(ip_packet, data)
+            if header is None:
+                continue
+            sequence, acknowledgement, flags, payload = header
+            # SYN and FIN occupy a sequence number.
+            length = payload + (flags & 0x02 != 0) + (flags & 0x01 != 0)
+            if length:
+                end = (sequence + length) & _SEQUENCE_MASK
+                if statistics.highest is not None and not _after(end, statistics.highest):
+                    statistics.retransmissions += 1
+                    # Karn's algorithm: acknowledgements of retransmitted segments are ambiguous.
+                    statistics.outstanding.clear()
+                else:
+                    statistics.outstanding.append((end, packet.timestamp))
+                    statistics.highest = end
+            if flags & 0x10:
+                reverse = flows.get((node, ifname, ip_packet.protocol, ip_packet.destination, destination_port,
+                                     ip_packet.source, source_port))
+                if reverse is None or not reverse.outstanding:
+                    continue
+                sent = None
+                while reverse.outstanding and not _after(reverse.outstanding[0][0], acknowledgement):
+                    sent = reverse.outstanding.popleft()[1]
+                if sent is not None:
+                    reverse.add_rtt((packet.timestamp - sent) / 1e9)
+
+    def columns(self):
+        """Return the statistics as columns for :func:`.write_columns`.
+
+        Returns
+        -------
+        dict
+            The groups :code:`flows` (a row per flow and interface) and
+            :code:`intervals` (a row per flow, interface and interval with packets).
+        """
+        most_packets = {}
+        for key, statistics in self.__flows.items():
+            # The flow without the interface
+            most_packets[key[2:]] = max(most_packets.get(key[2:], 0), statistics.packets)
+
+        flows = collections.defaultdict(list)
+        intervals = collections.defaultdict(list)
+        nan = float('nan')
+        for row, (key, statistics) in enumerate(self.__flows.items()):
+            node, ifname, protocol, source, source_port, destination, destination_port = key
+            for column, value in (
+                    ('node', node),
+                    ('ifname', ifname),
+                    ('protocol', protocol),
+                    ('source', str(ipaddress.ip_address(source))),
+                    ('source_port', source_port),
+                    ('destination', str(ipaddress.ip_address(destination))),
+                    ('destination_port', destination_port),
+                    ('packets', statistics.packets),
+                    ('bytes', statistics.bytes),
+                    ('first', statistics.first),
+                    ('last', statistics.last),
+                    ('rtt_samples', statistics.rtt_samples),
+                    ('rtt_mean', statistics.rtt_sum / statistics.rtt_samples if statistics.rtt_samples else nan),
+                    ('rtt_min', nan if statistics.rtt_min is None else statistics.rtt_min),
+                    ('rtt_max', nan if statistics.rtt_max is None else statistics.rtt_max),
+                    ('retransmissions', statistics.retransmissions),
+                    ('lost', most_packets[key[2:]] - statistics.packets)):
+                flows[column].append(value)
+            for interval, (packets, size) in sorted(statistics.intervals.items()):
+                intervals['flow'].append(row)
+                intervals['start'].append(interval * self.interval)
+                intervals['packets'].append(packets)
+                intervals['bytes'].append(size)
+
+        return {
+            'flows': {column: (dtype, flows[column]) for column, dtype in _FLOW_COLUMNS},
+            'intervals': {column: (dtype, intervals[column]) for column, dtype in _INTERVAL_COLUMNS},
+        }
+
+def summarize(directory, output=None, interval=1.0):
+    """Summarize the flows captured in a log directory.
+
+    The captures are streamed, only the statistics of the flows are kept in memory.
+    See :class:`FlowSummarizer` for the statistics.
+
+    Parameters
+    ----------
+    directory : str
+        The log directory of a simulation.
+    output : str
+        The path of the summary (:code:`flows.npz` in the log directory by default).
+    interval : float
+        The length of the intervals in seconds.
+
+    Returns
+    -------
+    str
+        The path of the summary.
+    """
+    if output is None:
+        output = os.path.join(directory, FLOW_SUMMARY_FILE_NAME)
+
+    files = collections.defaultdict(list)
+    for capture_file in find_capture_files(directory):
+        files[capture_file.interface].append(capture_file)
+
+    summarizer = FlowSummarizer(interval)
+    for capture_files in files.values():
+        readers = [PcapReader(capture_file) for capture_file in capture_files]
+        try:
+            readers = [reader for reader in readers if reader.linktype is not None]
+            if not readers:
+                continue
+            # The files of a ring buffer are merged in the order of their packets.
+            packets = heapq.merge(*readers, key=lambda packet: packet.timestamp)
+            summarizer.add_interface(capture_files[0].node, capture_files[0].ifname, readers[0].linktype, packets)
+        finally:
+            for reader in readers:
+                reader.close()
+
+    columns = summarizer.columns()
+    write_columns(output, columns)
+    logger.info('Summarized %d flows at %d interfaces into %s', len(columns['flows']['packets'][1]),
+                len(files), output)
+    return output
+
+def load_flow_summaries(paths):
+    """Load the flow summaries of several runs into NumPy arrays.
+
+    Example
+    -------
+    .. code-block:: python
+
+        summaries = load_flow_summaries(glob.glob('simulation-logs/*'))
+        flows = summaries['flows']
+        throughput = flows['bytes'] * 8 / ((flows['last'] - flows['first']) / 1e9)
+
+    Parameters
+    ----------
+    paths : iterable of str
+        The paths of the summaries or log directories.
+
+    Returns
+    -------
+    dict
+        The groups :code:`flows` and :code:`intervals` with their columns (see :func:`.load_columns`).
+    """
+    return load_columns(result_paths(paths, FLOW_SUMMARY_FILE_NAME))
+
+def load_flow_monitors(paths):
+    """Load the statistics of ns-3's FlowMonitor of several runs into NumPy arrays.
+
+    Parameters
+    ----------
+    paths : iterable of str
+        The paths of the statistics or log directories.
+
+    Returns
+    -------
+    dict
+        The group :code:`flow_monitor` with its columns (see :func:`.load_columns`).
+    """
+    return load_columns(result_paths(paths, FLOW_MONITOR_FILE_NAME))
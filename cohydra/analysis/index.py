@@ -0,0 +1,210 @@
+"""A sidecar index of a merged capture for querying packets by time, flow and node."""
+
+import ipaddress
+import json
+import mmap
+import os
+import struct
+
+from .pcap import Packet
+from .protocols import flow_key
+
+#: The magic bytes at the start and the end of an index file.
+MAGIC = b'CHYIDX01'
+
+# A record per packet: timestamp (ns), offset of the data in the capture, captured length,
+# flow (0 for packets without a flow, otherwise the flow's position + 1), interface.
+_RECORD = struct.Struct('<QQIIH')
+# The end of the file: number of records, length of the JSON footer, magic.
+_TRAILER = struct.Struct('<QQ8s')
+
+class IndexWriter:
+    """Writes the index of a merged capture while the capture is written.
+
+    Only the flow table is kept in memory, the records are written directly to the file.
+
+    Parameters
+    ----------
+    path : str
+        The path of the index file.
+    capture_path : str
+        The path of the indexed (pcapng) capture.
+    """
+
+    def __init__(self, path, capture_path):
+        #: The path of the index file.
+        self.path = path
+        self.__file = open(path, 'wb', buffering=1 << 20)
+        self.__file.write(MAGIC)
+        self.__capture = os.path.relpath(capture_path, os.path.dirname(os.path.abspath(path)))
+        self.__interfaces = []
+        self.__flows = {}
+        self.__count = 0
+
+    def add_interface(self, node, ifname, linktype):
+        """Add an interface in the order of the capture's interface IDs.
+
+        Parameters
+        ----------
+        node : str
+            The name of the node.
+        ifname : str
+            The name of the interface.
+        linktype : int
+            The link type of the interface's packets.
+        """
+        self.__interfaces.append({'node': node, 'ifname': ifname, 'linktype': linktype})
+
+    def add(self, interface, packet, offset):
+        """Add a packet (in the order of the capture).
+
+        Parameters
+        ----------
+        interface : int
+            The ID of the interface.
+        packet : :class:`.Packet`
+            The packet.
+        offset : int
+            The offset of the packet's data in the capture.
+        """
+        key = flow_key(self.__interfaces[interface]['linktype'], packet.data)
+        flow = 0
+        if key is not None:
+            flow = self.__flows.setdefault(key, len(self.__flows) + 1)
+        self.__file.write(_RECORD.pack(packet.timestamp, offset, len(packet.data), flow, interface))
+        self.__count += 1
+
+    def close(self):
+        """Write the footer and close the file."""
+        flows = [None] * len(self.__flows)
+        for (protocol, source, source_port, destination, destination_port), flow in self.__flows.items():
+            flows[flow - 1] = [protocol, str(ipaddress.ip_address(source)), source_port,
+                               str(ipaddress.ip_address(destination)), destination_port]
+        footer = json.dumps({
+            'capture': self.__capture,
+            'interfaces': self.__interfaces,
+            'flows': flows,
+        }).encode()
+        self.__file.write(footer)
+        self.__file.write(_TRAILER.pack(self.__count, len(footer), MAGIC))
+        self.__file.close()
+
+class PcapIndex:
+    """The index of a merged capture.
+
+    Both the index and the capture are memory-mapped. A query only touches the records
+    in the requested time range and the data of the matching packets.
+
+    Example
+    -------
+    .. code-block:: python
+
+        with PcapIndex('simulation-logs/2020-01-01-00-00-00/merged.pcapng.idx') as index:
+            for node, ifname, packet in index.query(start=10e9, end=20e9, nodes=['server']):
+                print(packet.timestamp, len(packet.data))
+
+    Parameters
+    ----------
+    path : str
+        The path of the index file.
+    """
+
+    def __init__(self, path):
+        #: The path of the index file.
+        self.path = path
+        with open(path, 'rb') as file:
+            self.__index = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.__index[:len(MAGIC)] != MAGIC or self.__index[-len(MAGIC):] != MAGIC:
+            self.__index.close()
+            raise ValueError(f'{path} is not an index of a capture.')
+        #: The number of packets.
+        self.count, footer_length, _ = _TRAILER.unpack_from(self.__index, len(self.__index) - _TRAILER.size)
+        footer_offset = len(MAGIC) + self.count * _RECORD.size
+        footer = json.loads(self.__index[footer_offset:footer_offset + footer_length].decode())
+
+        #: The interfaces as dicts with :code:`node`, :code:`ifname` and :code:`linktype`.
+        self.interfaces = footer['interfaces']
+        #: The flows as (protocol, source, source port, destination, destination port) tuples.
+        self.flows = [tuple(flow) for flow in footer['flows']]
+        #: The path of the capture.
+        self.capture_path = os.path.join(os.path.dirname(os.path.abspath(path)), footer['capture'])
+        with open(self.capture_path, 'rb') as file:
+            self.__capture = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __timestamp(self, position):
+        return struct.unpack_from('<Q', self.__index, len(MAGIC) + position * _RECORD.size)[0]
+
+    def __bisect(self, timestamp):
+        """Return the position of the first record at or after a timestamp."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.__timestamp(middle) < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def query(self, start=None, end=None, flow=None, nodes=None, bidirectional=True):
+        """Find packets.
+
+        Parameters
+        ----------
+        start : int
+            The first timestamp in nanoseconds.
+        end : int
+            The timestamp in nanoseconds to stop at (exclusive).
+        flow : tuple
+            The flow's protocol number, source address, source port, destination address
+            and destination port (e.g. :code:`(6, '10.0.0.1', 43512, '10.0.0.2', 80)`).
+        nodes : iterable of str
+            Only find packets captured at the interfaces of these nodes.
+        bidirectional : bool
+            Whether to find the packets in the flow's reverse direction, too.
+
+        Yields
+        ------
+        tuple
+            The node, interface name and :class:`.Packet` (the original length is unknown and
+            set to the captured length).
+        """
+        first = 0 if start is None else self.__bisect(int(start))
+        last = self.count if end is None else self.__bisect(int(end))
+
+        flows = None
+        if flow is not None:
+            protocol, source, source_port, destination, destination_port = flow
+            wanted = {(protocol, str(ipaddress.ip_address(source)), source_port,
+                       str(ipaddress.ip_address(destination)), destination_port)}
+            if bidirectional:
+                wanted.add((protocol, str(ipaddress.ip_address(destination)), destination_port,
+                            str(ipaddress.ip_address(source)), source_port))
+            flows = {i + 1 for i, known in enumerate(self.flows) if known in wanted}
+            if not flows:
+                return
+        interfaces = None
+        if nodes is not None:
+            nodes = set(nodes)
+            interfaces = {i for i, interface in enumerate(self.interfaces) if interface['node'] in nodes}
+
+        for position in range(first, last):
+            timestamp, offset, length, packet_flow, interface = _RECORD.unpack_from(
+                self.__index, len(MAGIC) + position * _RECORD.size)
+            if flows is not None and packet_flow not in flows:
+                continue
+            if interfaces is not None and interface not in interfaces:
+                continue
+            data = self.__capture[offset:offset + length]
+            yield (self.interfaces[interface]['node'], self.interfaces[interface]['ifname'],
+                   Packet(timestamp, data, length))
+
+    def close(self):
+        """Unmap the files."""
+        self.__index.close()
+        self.__capture.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
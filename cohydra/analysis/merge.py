@@ -0,0 +1,80 @@
+"""Merging the per-interface captures of a simulation."""
+
+import heapq
+import logging
+import os
+
+from .index import IndexWriter
+from .pcap import PcapError, PcapReader, PcapngWriter, find_capture_files
+
+logger = logging.getLogger(__name__)
+
+#: The file name of the merged capture in the log directory.
+MERGED_FILE_NAME = 'merged.pcapng'
+
+def _stream(interface, reader):
+    for packet in reader:
+        yield interface, packet
+
+def merge(directory, output=None, index=True):
+    """Merge the captures of all interfaces into one time-ordered pcapng file.
+
+    The captures are read in parallel and merged packet by packet,
+    so only one packet per capture file is kept in memory.
+    Each interface is named :code:`node.ifname` in the merged file.
+
+    Parameters
+    ----------
+    directory : str
+        The log directory of a simulation.
+    output : str
+        The path of the merged file (:code:`merged.pcapng` in the log directory by default).
+    index : bool
+        Whether to write an index (:code:`<output>.idx`) for :class:`.PcapIndex`.
+
+    Returns
+    -------
+    int
+        The number of packets.
+    """
+    if output is None:
+        output = os.path.join(directory, MERGED_FILE_NAME)
+
+    readers = []
+    interfaces = {}
+    try:
+        for capture_file in find_capture_files(directory):
+            reader = PcapReader(capture_file)
+            readers.append(reader)
+            if reader.linktype is None:
+                logger.warning('Skipping %s without a header', capture_file)
+                continue
+            known = interfaces.setdefault(capture_file.interface, (capture_file, reader.linktype, reader.snaplen))
+            if known[1] != reader.linktype:
+                raise PcapError(f'{capture_file} has another link type than {known[0]}.')
+
+        with open(output, 'wb', buffering=1 << 20) as file:
+            writer = PcapngWriter(file)
+            index_writer = IndexWriter(f'{output}.idx', output) if index else None
+            ids = {}
+            for name, (capture_file, linktype, snaplen) in interfaces.items():
+                ids[name] = writer.add_interface(name, linktype, snaplen)
+                if index_writer is not None:
+                    index_writer.add_interface(capture_file.node, capture_file.ifname, linktype)
+
+            streams = [_stream(ids[reader.capture_file.interface], reader)
+                       for reader in readers if reader.linktype is not None]
+            count = 0
+            for interface, packet in heapq.merge(*streams, key=lambda item: item[1].timestamp):
+                offset = writer.write(interface, packet)
+                if index_writer is not None:
+                    index_writer.add(interface, packet, offset)
+                count += 1
+            if index_writer is not None:
+                index_writer.close()
+    finally:
+        for reader in readers:
+            reader.close()
+
+    logger.info('Merged %d packets of %d interfaces into %s', count, len(interfaces), output)
+    return count
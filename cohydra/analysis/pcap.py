@@ -0,0 +1,303 @@
+"""Reading the PCAP files of a simulation and writing pcapng files."""
+
+import bz2
+import gzip
+import lzma
+import os
+import re
+import struct
+import subprocess
+
+from ..capture import COMPRESSION_EXTENSIONS
+
+#: The link type of Ethernet frames.
+LINKTYPE_ETHERNET = 1
+#: The link type of raw IP packets.
+LINKTYPE_RAW = 101
+#: The link type of IEEE 802.11 frames.
+LINKTYPE_IEEE802_11 = 105
+#: The link type of IEEE 802.11 frames with a radiotap header.
+LINKTYPE_RADIOTAP = 127
+#: The link type of raw IPv4 packets.
+LINKTYPE_IPV4 = 228
+#: The link type of raw IPv6 packets.
+LINKTYPE_IPV6 = 229
+
+# The magic numbers of PCAP files with microsecond and nanosecond timestamps.
+_MAGIC_MICROSECONDS = 0xa1b2c3d4
+_MAGIC_NANOSECONDS = 0xa1b23c4d
+
+# The (uncompressed) capture files of an interface: {node}.{ifname}.pcap, optionally with
+# the number of a ring buffer file (tcpdump -C) and the extension of a compression program.
+_FILE_PATTERN = re.compile(r'^(?P<name>.+)\.pcap(?P<number>\d*)(?P<extension>\.[a-z0-9]+)?$')
+
+_OPENERS = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+}
+
+class PcapError(Exception):
+    """A PCAP file could not be read."""
+
+class Packet:
+    """A packet read from a PCAP file.
+
+    Parameters
+    ----------
+    timestamp : int
+        The capture time in nanoseconds.
+    data : bytes
+        The captured bytes.
+    length : int
+        The original length of the packet.
+    """
+
+    __slots__ = ('timestamp', 'data', 'length')
+
+    def __init__(self, timestamp, data, length):
+        #: The capture time in nanoseconds.
+        self.timestamp = timestamp
+        #: The captured bytes.
+        self.data = data
+        #: The original length of the packet.
+        self.length = length
+
+class CaptureFile:
+    """A capture file of an interface.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+    node : str
+        The name of the node.
+    ifname : str
+        The name of the interface.
+    compression : str
+        The file extension of the compression (e.g. :code:`'.gz'`), if the file is compressed.
+    """
+
+    def __init__(self, path, node, ifname, compression=None):
+        #: The path of the file.
+        self.path = path
+        #: The name of the node.
+        self.node = node
+        #: The name of the interface.
+        self.ifname = ifname
+        #: The file extension of the compression.
+        self.compression = compression
+
+    @property
+    def interface(self):
+        """str: The name of the interface including the node (:code:`node.ifname`)."""
+        return f'{self.node}.{self.ifname}'
+
+    def open(self):
+        """Open the (decompressed) file for reading."""
+        if self.compression is None:
+            return open(self.path, 'rb')
+        if self.compression in _OPENERS:
+            return _OPENERS[self.compression](self.path, 'rb')
+        programs = {value: key for key, value in COMPRESSION_EXTENSIONS.items()}
+        if self.compression in programs:
+            return _DecompressedFile(programs[self.compression], self.path)
+        raise PcapError(f'Unknown compression of {self.path}.')
+
+    def __str__(self):
+        return self.path
+
+class _DecompressedFile:
+    """A file decompressed by an external program (e.g. :code:`zstd`)."""
+
+    def __init__(self, program, path):
+        self.process = subprocess.Popen([program, '-dc', path], # pylint: disable=consider-using-with
+                                        stdout=subprocess.PIPE)
+
+    def read(self, size=-1):
+        return self.process.stdout.read(size)
+
+    def close(self):
+        self.process.stdout.close()
+        self.process.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def find_capture_files(directory):
+    """Find the capture files of the interfaces in a log directory.
+
+    Besides the plain PCAP files of ns-3, the ring buffer and compressed files written
+    according to a :class:`.CapturePolicy` are found.
+
+    *Note:* ns-3 timestamps the packets with the simulation time, :code:`tcpdump` with the
+    wall clock time. Do not mix both in one analysis.
+
+    Parameters
+    ----------
+    directory : str
+        The log directory of a simulation.
+
+    Returns
+    -------
+    list of :class:`CaptureFile`
+        The capture files sorted by path.
+    """
+    files = []
+    for file_name in sorted(os.listdir(directory)):
+        match = _FILE_PATTERN.match(file_name)
+        if match is None:
+            continue
+        node, _, ifname = match.group('name').rpartition('.')
+        if not node:
+            continue
+        files.append(CaptureFile(os.path.join(directory, file_name), node, ifname, match.group('extension')))
+    return files
+
+class PcapReader:
+    """A streaming reader of a (classic) PCAP file.
+
+    Only one packet is kept in memory at a time.
+
+    Parameters
+    ----------
+    capture_file : :class:`CaptureFile`
+        The file to read.
+    """
+
+    def __init__(self, capture_file):
+        #: The file to read.
+        self.capture_file = capture_file
+        #: The link type of the packets.
+        self.linktype = None
+        #: The maximum length of the captured packets.
+        self.snaplen = None
+
+        self.__file = capture_file.open()
+        self.__record_header = None
+        header = self.__read(24)
+        if header is None:
+            # A capture killed before writing the header.
+            self.close()
+            return
+
+        for byte_order in ('<', '>'):
+            magic, = struct.unpack(f'{byte_order}I', header[:4])
+            if magic in (_MAGIC_MICROSECONDS, _MAGIC_NANOSECONDS):
+                break
+        else:
+            self.close()
+            raise PcapError(f'{capture_file} is not a PCAP file.')
+
+        self.__resolution = 1000 if magic == _MAGIC_MICROSECONDS else 1
+        self.__record_header = struct.Struct(f'{byte_order}IIII')
+        _, _, _, _, self.snaplen, self.linktype = struct.unpack(f'{byte_order}HHiIII', header[4:])
+
+    def __read(self, size):
+        data = self.__file.read(size) if self.__file is not None else b''
+        if len(data) < size:
+            # A truncated packet at the end of a capture which has not been stopped cleanly.
+            return None
+        return data
+
+    def __iter__(self):
+        while self.__record_header is not None:
+            header = self.__read(self.__record_header.size)
+            if header is None:
+                break
+            seconds, fraction, caplen, length = self.__record_header.unpack(header)
+            data = self.__read(caplen)
+            if data is None:
+                break
+            yield Packet(seconds * 1000000000 + fraction * self.__resolution, data, length)
+        self.close()
+
+    def close(self):
+        """Close the file."""
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+class PcapngWriter:
+    """A writer of pcapng files.
+
+    Unlike classic PCAP files, a pcapng file may contain packets of several interfaces
+    with different link types. The timestamps are written with nanosecond resolution.
+
+    Parameters
+    ----------
+    file : file object
+        The binary file to write to.
+    """
+
+    _ENHANCED_PACKET_HEADER = struct.Struct('<IIIIIII')
+
+    def __init__(self, file):
+        self.__file = file
+        self.__interfaces = 0
+        #: The number of bytes written.
+        self.offset = 0
+        # Section header block: byte order magic, version 1.0, unknown section length.
+        self.__write_block(0x0a0d0d0a, struct.pack('<IHHq', 0x1a2b3c4d, 1, 0, -1))
+
+    @staticmethod
+    def __option(code, value):
+        padding = -len(value) % 4
+        return struct.pack('<HH', code, len(value)) + value + b'\0' * padding
+
+    def __write_block(self, block_type, body):
+        length = 12 + len(body)
+        self.__file.write(struct.pack('<II', block_type, length) + body + struct.pack('<I', length))
+        self.offset += length
+
+    def add_interface(self, name, linktype, snaplen=0):
+        """Add an interface.
+
+        Parameters
+        ----------
+        name : str
+            The name of the interface.
+        linktype : int
+            The link type of the interface's packets.
+        snaplen : int
+            The maximum length of the captured packets.
+
+        Returns
+        -------
+        int
+            The ID of the interface in the file.
+        """
+        options = self.__option(2, name.encode()) + self.__option(9, b'\x09') + self.__option(0, b'')
+        self.__write_block(0x00000001, struct.pack('<HHI', linktype, 0, snaplen) + options)
+        self.__interfaces += 1
+        return self.__interfaces - 1
+
+    def write(self, interface, packet):
+        """Write a packet.
+
+        Parameters
+        ----------
+        interface : int
+            The ID of the interface.
+        packet : :class:`Packet`
+            The packet.
+
+        Returns
+        -------
+        int
+            The offset of the packet's data in the file.
+        """
+        caplen = len(packet.data)
+        padding = -caplen % 4
+        length = self._ENHANCED_PACKET_HEADER.size + caplen + padding + 4
+        self.__file.write(self._ENHANCED_PACKET_HEADER.pack(
+            0x00000006, length, interface, packet.timestamp >> 32, packet.timestamp & 0xffffffff,
+            caplen, packet.length))
+        self.__file.write(packet.data)
+        self.__file.write(b'\0' * padding + struct.pack('<I', length))
+        data_offset = self.offset + self._ENHANCED_PACKET_HEADER.size
+        self.offset += length
+        return data_offset
@@ -0,0 +1,172 @@
+"""Parsing the IP and transport headers of captured packets."""
+
+import struct
+
+from .pcap import LINKTYPE_ETHERNET, LINKTYPE_IEEE802_11, LINKTYPE_IPV4, LINKTYPE_IPV6, LINKTYPE_RADIOTAP, \
+    LINKTYPE_RAW
+
+#: The protocol number of TCP.
+PROTOCOL_TCP = 6
+#: The protocol number of UDP.
+PROTOCOL_UDP = 17
+
+# The protocols with ports.
+_PORT_PROTOCOLS = (PROTOCOL_TCP, PROTOCOL_UDP, 132)
+
+class IPPacket:
+    """The headers of an IP packet.
+
+    Parameters
+    ----------
+    protocol : int
+        The transport protocol number.
+    source : bytes
+        The packed source address.
+    destination : bytes
+        The packed destination address.
+    transport : int
+        The offset of the transport header in the captured bytes
+        (:code:`None` for fragments other than the first one).
+    end : int
+        The offset of the end of the IP packet (according to its header, it may not be captured completely).
+    """
+
+    __slots__ = ('protocol', 'source', 'destination', 'transport', 'end')
+
+    def __init__(self, protocol, source, destination, transport, end):
+        #: The transport protocol number.
+        self.protocol = protocol
+        #: The packed source address.
+        self.source = source
+        #: The packed destination address.
+        self.destination = destination
+        #: The offset of the transport header.
+        self.transport = transport
+        #: The offset of the end of the IP packet.
+        self.end = end
+
+def _network_offset(linktype, data):
+    """Return the ethertype and offset of the network layer."""
+    if linktype == LINKTYPE_ETHERNET:
+        offset = 12
+        ethertype, = struct.unpack_from('>H', data, offset)
+        # VLAN tags
+        while ethertype in (0x8100, 0x88a8):
+            offset += 4
+            ethertype, = struct.unpack_from('>H', data, offset)
+        return ethertype, offset + 2
+    if linktype in (LINKTYPE_IEEE802_11, LINKTYPE_RADIOTAP):
+        offset = 0
+        if linktype == LINKTYPE_RADIOTAP:
+            offset, = struct.unpack_from('<H', data, 2)
+        frame_control, flags = data[offset], data[offset + 1]
+        subtype = frame_control >> 4
+        # Only unprotected data frames carry IP packets.
+        if (frame_control >> 2) & 3 != 2 or flags & 0x40:
+            return None, None
+        header_length = 24
+        if flags & 3 == 3:
+            header_length += 6
+        if subtype & 8:
+            header_length += 2
+            if flags & 0x80:
+                header_length += 4
+        offset += header_length
+        if data[offset:offset + 3] != b'\xaa\xaa\x03':
+            return None, None
+        ethertype, = struct.unpack_from('>H', data, offset + 6)
+        return ethertype, offset + 8
+    if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+        return {4: 0x0800, 6: 0x86dd}.get(data[0] >> 4), 0
+    return None, None
+
+def parse_ip(linktype, data):
+    """Parse the IP header of a packet.
+
+    Parameters
+    ----------
+    linktype : int
+        The link type of the packet.
+    data : bytes
+        The captured bytes.
+
+    Returns
+    -------
+    :class:`IPPacket`
+        The headers or :code:`None`, if the packet is no IP packet (or truncated).
+    """
+    try:
+        ethertype, offset = _network_offset(linktype, data)
+        if ethertype == 0x0800:
+            header_length = (data[offset] & 0x0f) * 4
+            total_length, _, fragment = struct.unpack_from('>HHH', data, offset + 2)
+            transport = offset + header_length if fragment & 0x1fff == 0 else None
+            return IPPacket(data[offset + 9], data[offset + 12:offset + 16], data[offset + 16:offset + 20],
+                            transport, offset + total_length)
+        if ethertype == 0x86dd:
+            payload_length, = struct.unpack_from('>H', data, offset + 4)
+            # Extension headers are not followed.
+            return IPPacket(data[offset + 6], data[offset + 8:offset + 24], data[offset + 24:offset + 40],
+                            offset + 40, offset + 40 + payload_length)
+    except (IndexError, struct.error):
+        # Truncated by the snap length
+        pass
+    return None
+
+def ports(packet, data):
+    """Return the source and destination port of a packet (:code:`(0, 0)` if there are none).
+
+    Parameters
+    ----------
+    packet : :class:`IPPacket`
+        The parsed IP headers.
+    data : bytes
+        The captured bytes.
+    """
+    if packet.protocol in _PORT_PROTOCOLS and packet.transport is not None and len(data) >= packet.transport + 4:
+        return struct.unpack_from('>HH', data, packet.transport)
+    return 0, 0
+
+def flow_key(linktype, data):
+    """Return the 5-tuple of a packet.
+
+    Parameters
+    ----------
+    linktype : int
+        The link type of the packet.
+    data : bytes
+        The captured bytes.
+
+    Returns
+    -------
+    tuple
+        The protocol number, source address, source port, destination address and destination port
+        (the addresses as packed bytes, the ports are :code:`0` for protocols without ports)
+        or :code:`None`, if the packet is no IP packet.
+    """
+    packet = parse_ip(linktype, data)
+    if packet is None:
+        return None
+    source_port, destination_port = ports(packet, data)
+    return packet.protocol, packet.source, source_port, packet.destination, destination_port
+
+def tcp_header(packet, data):
+    """Parse the TCP header of a packet.
+
+    Parameters
+    ----------
+    packet : :class:`IPPacket`
+        The parsed IP headers of a TCP packet.
+    data : bytes
+        The captured bytes.
+
+    Returns
+    -------
+    tuple
+        The sequence number, acknowledgement number, flags and payload length
+        or :code:`None`, if the header has not been captured.
+    """
+    if packet.transport is None or len(data) < packet.transport + 14:
+        return None
+    sequence, acknowledgement, offset, flags = struct.unpack_from('>IIBB', data, packet.transport + 4)
+    return sequence, acknowledgement, flags, max(0, packet.end - packet.transport - (offset >> 4) * 4)
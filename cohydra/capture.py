@@ -0,0 +1,205 @@
+"""Packet capture of the channels' interfaces."""
+
+import logging
+import signal
+import subprocess
+
+from .context import defer
+
+logger = logging.getLogger(__name__)
+
+#: The file extensions of common compression programs.
+COMPRESSION_EXTENSIONS = {
+    'gzip': '.gz',
+    'bzip2': '.bz2',
+    'xz': '.xz',
+    'zstd': '.zst',
+    'lz4': '.lz4',
+}
+
+class CapturePolicy:
+    """The CapturePolicy decides which interfaces are captured and how.
+
+    Without any limits, ns-3 writes a PCAP file for every interface in promiscuous mode.
+    For long runs, this writes a lot of data and the disk I/O competes with the realtime scheduler.
+    With a snap length, a ring buffer or compression, :code:`tcpdump` captures on the interface's
+    tap device instead (i.e. the packets from and to the node, not the whole channel).
+
+    A policy can be set on the :class:`.Scenario`, a :class:`.Network` or a single channel
+    (see :meth:`.Network.connect`). The most specific one is used.
+
+    Example
+    -------
+    .. code-block:: python
+
+        scenario = Scenario(capture=CapturePolicy(snaplen=96, ring_size=100, ring_files=10))
+        net.connect(node1, node2, capture=CapturePolicy.off())
+
+    Parameters
+    ----------
+    enabled : bool
+        Whether to capture at all.
+    nodes : iterable of :class:`.Node` or str
+        Only capture the interfaces of these nodes (or node names). :code:`None` captures all nodes.
+    snaplen : int
+        Only capture the first bytes of every packet.
+    ring_size : int
+        Start a new file after this many megabytes.
+    ring_files : int
+        Keep at most this many files (requires :code:`ring_size`).
+        The oldest file is overwritten, when the limit is reached.
+    compress : str
+        Compress the files on the fly with this program (e.g. :code:`'gzip'` or :code:`'zstd'`).
+        With a ring buffer, every completed file is compressed.
+    """
+
+    def __init__(self, enabled=True, nodes=None, snaplen=None, ring_size=None, ring_files=None, compress=None):
+        if ring_files is not None and ring_size is None:
+            raise ValueError('A ring buffer needs a maximum file size (ring_size).')
+        #: Whether to capture at all.
+        self.enabled = enabled
+        #: The names of the nodes to capture (:code:`None` for all).
+        self.nodes = None
+        if nodes is not None:
+            self.nodes = {node if isinstance(node, str) else node.name for node in nodes}
+        #: The snap length in bytes.
+        self.snaplen = snaplen
+        #: The maximum size of a file in megabytes.
+        self.ring_size = ring_size
+        #: The maximum number of files.
+        self.ring_files = ring_files
+        #: The compression program.
+        self.compress = compress
+
+    @staticmethod
+    def off():
+        """Return a policy that does not capture anything."""
+        return CapturePolicy(enabled=False)
+
+    def captures(self, node):
+        """Return whether the interfaces of a node are captured.
+
+        Parameters
+        ----------
+        node : :class:`.Node`
+            The node.
+        """
+        return self.enabled and (self.nodes is None or node.name in self.nodes)
+
+    def uses_ns3(self):
+        """Return whether ns-3's full promiscuous capture is used."""
+        return self.snaplen is None and self.ring_size is None and self.compress is None
+
+    def file_path(self, path):
+        """Return the path of the capture file (with the extension of the compression).
+
+        Parameters
+        ----------
+        path : str
+            The path of the uncompressed PCAP file.
+        """
+        if self.compress is None or self.ring_size is not None:
+            # tcpdump adds the extension to the completed files of a ring buffer.
+            return path
+        return path + COMPRESSION_EXTENSIONS.get(self.compress, '')
+
+    def tcpdump_command(self, device, path):
+        """Return the tcpdump command for capturing a device.
+
+        Without a ring buffer, compressed captures are written to stdout (for piping them into
+        the compression program).
+
+        Parameters
+        ----------
+        device : str
+            The name of the network device.
+        path : str
+            The path of the PCAP file.
+
+        Returns
+        -------
+        list of str
+            The command.
+        """
+        command = ['tcpdump', '-i', device, '-U', '-n', '-q']
+        if self.snaplen is not None:
+            command += ['-s', str(self.snaplen)]
+        if self.ring_size is not None:
+            command += ['-C', str(self.ring_size)]
+            if self.ring_files is not None:
+                command += ['-W', str(self.ring_files)]
+            if self.compress is not None:
+                command += ['-z', self.compress]
+        elif self.compress is not None:
+            return command + ['-w', '-']
+        return command + ['-w', path]
+
+class Capture:
+    """A tcpdump capture of an interface on the host.
+
+    The interface's tap device is captured. Interfaces without a tap device
+    (e.g. of a :class:`.NetemChannel`) are captured at the host's end of the VETH pair.
+
+    Parameters
+    ----------
+    policy : :class:`CapturePolicy`
+        The policy to capture with.
+    interface : :class:`.Interface`
+        The interface to capture.
+    path : str
+        The path of the PCAP file.
+    """
+
+    def __init__(self, policy, interface, path):
+        #: The policy to capture with.
+        self.policy = policy
+        #: The interface to capture.
+        self.interface = interface
+        #: The path of the PCAP file.
+        self.path = path
+        #: The tcpdump process.
+        self.process = None
+        #: The compression process (if not compressed by tcpdump itself).
+        self.compressor = None
+
+    @property
+    def device(self):
+        """str: The name of the network device on the host (:code:`None` if there is none)."""
+        return self.interface.host_device
+
+    def start(self):
+        """Start capturing (the device has to exist)."""
+        if self.device is None:
+            logger.warning('Cannot capture %s of %s: there is no device on the host.',
+                           self.interface.ifname, self.interface.node.name)
+            return
+        command = self.policy.tcpdump_command(self.device, self.path)
+        logger.debug('Capture %s: %s', self.device, ' '.join(command))
+        if command[-1] != '-':
+            self.process = subprocess.Popen(command, stdin=subprocess.DEVNULL, # pylint: disable=consider-using-with
+                                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            with open(self.path, 'wb') as file:
+                self.process = subprocess.Popen(command, stdin=subprocess.DEVNULL, # pylint: disable=consider-using-with
+                                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                self.compressor = subprocess.Popen([self.policy.compress], # pylint: disable=consider-using-with
+                                                   stdin=self.process.stdout, stdout=file)
+            # Only the compressor reads the pipe.
+            self.process.stdout.close()
+        defer(f'stop capture of {self.device}', self.stop)
+
+    def stop(self):
+        """Stop capturing (and flush the compression)."""
+        if self.process is None:
+            return
+        # tcpdump flushes its buffer on SIGINT. The compressor finishes at the end of the pipe.
+        self.process.send_signal(signal.SIGINT)
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        if self.compressor is not None:
+            self.compressor.wait()
+            self.compressor = None
+        self.process = None
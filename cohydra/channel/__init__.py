@@ -1,4 +1,12 @@
 """Channels are used to connect nodes."""
-from .channel import Channel
-from .csma import CSMAChannel
-from .wifi import WiFiChannel
+from ..util import lazy_attributes
+
+# The ns-3 modules of a channel type are loaded when it is used.
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'Channel': '.channel',
+    'CSMAChannel': '.csma',
+    'WiFiChannel': '.wifi',
+    'NetemChannel': '.netem',
+})
+
+__all__ = ['Channel', 'CSMAChannel', 'WiFiChannel', 'NetemChannel']
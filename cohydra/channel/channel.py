@@ -1,8 +1,11 @@
 """Abstract Channel class."""
 import logging
+import os
 
 from ns import network as ns_net
 
+from ..capture import Capture, CapturePolicy
+
 logger = logging.getLogger(__name__)
 
 class Channel:
@@ -29,6 +32,10 @@ class Channel:
         #: All Interfaces (~network cards) on this channel.
         self.interfaces = []
 
+        #: The :class:`.CapturePolicy` of this channel.
+        #: If :code:`None`, the policy of the network or scenario is used.
+        self.capture_policy = None
+
         logger.debug('Creating container with %d nodes', len(nodes))
         #: A container with all ns-3 internal nodes.
         self.ns3_nodes_container = ns_net.NodeContainer()
@@ -56,3 +63,29 @@ class Channel:
             The simulation to prepare the channel for.
         """
         raise NotImplementedError
+
+    def enable_capture(self, simulation, pcap_helper=None):
+        """Capture the interfaces according to the capture policy.
+
+        Parameters
+        ----------
+        simulation : :class:`.Simulation`
+            The simulation to capture.
+        pcap_helper
+            The ns-3 helper to enable the PCAP output with (if the channel is simulated by ns-3).
+        """
+        distribution = simulation.scenario.distribution
+        if distribution is not None and distribution.channel_host(self) is not distribution.local:
+            # The channel is captured by the host simulating it.
+            return
+        policy = self.capture_policy or self.network.capture_policy or simulation.scenario.capture_policy \
+            or CapturePolicy()
+        for interface in self.interfaces:
+            if not policy.captures(interface.node):
+                continue
+            path = os.path.join(simulation.log_directory, interface.pcap_file_name)
+            if pcap_helper is not None and policy.uses_ns3():
+                pcap_helper.EnablePcap(path, interface.ns3_device, True, True)
+            else:
+                # The devices on the host exist after the nodes have been prepared.
+                simulation.captures.append(Capture(policy, interface, policy.file_path(path)))
@@ -2,7 +2,6 @@
 
 import logging
 import ipaddress
-import os
 
 from ns import core, csma, internet, network as ns_net
 
@@ -67,6 +66,4 @@ class CSMAChannel(Channel):
             self.interfaces.append(interface)
 
     def prepare(self, simulation):
-        for interface in self.interfaces:
-            pcap_log_path = os.path.join(simulation.log_directory, interface.pcap_file_name)
-            self.csma_helper.EnablePcap(pcap_log_path, interface.ns3_device, True, True)
+        self.enable_capture(simulation, self.csma_helper)
@@ -0,0 +1,140 @@
+"""Wired channel emulated by the Linux kernel."""
+
+import logging
+import ipaddress
+
+from pyroute2 import IPRoute
+from ns import core, network as ns_net
+
+from .channel import Channel
+from ..context import defer
+from ..interface import Interface
+from ..netlink import NetlinkSession
+
+logger = logging.getLogger(__name__)
+
+class NetemInterface(Interface):
+    """An interface on a :class:`NetemChannel`.
+
+    All interfaces of the channel share the channel's bridge. There is no tap device and no ns-3 device.
+
+    Parameters
+    ----------
+    channel : :class:`NetemChannel`
+        The channel the interface is connected to.
+    """
+
+    def __init__(self, channel, node, address, mac_address=None):
+        super().__init__(node=node, ns3_device=None, address=address, mac_address=mac_address)
+        #: The channel the interface is connected to.
+        self.channel = channel
+        self.tap_bridged = False
+
+    @property
+    def bridge_name(self):
+        return self.channel.bridge_name
+
+    def setup_bridge(self):
+        """Nothing to do, the bridge is created by the channel."""
+
+    def connect_tap_to_bridge(self, bridge_name=None, tap_mode="ConfigureLocal"):
+        """Nothing to do, the channel does not use ns-3."""
+
+    def setup_veth_container_end(self, ifname, ipr=None):
+        """Setup the VETH in a container and add the channel's queueing disciplines.
+
+        The delay and rate are applied to the packets sent by the container.
+        """
+        if ipr is None:
+            ipr = IPRoute()
+        super().setup_veth_container_end(ifname, ipr=ipr)
+
+        index = ipr.link_lookup(ifname=ifname)[0]
+        logger.debug('Add netem (delay %dus) and tbf (rate %dbit) to %s', self.channel.delay_us,
+                     self.channel.rate_bps, ifname)
+        ipr.tc('add', 'netem', index, handle='1:', delay=self.channel.delay_us)
+        ipr.tc('add', 'tbf', index, parent='1:', handle='10:', rate=f'{self.channel.rate_bps}bit',
+               burst=self.channel.burst, latency='50ms')
+
+class NetemChannel(Channel):
+    """The NetemChannel connects nodes with a Linux bridge instead of ns-3.
+
+    Packets between containers on a :class:`.CSMAChannel` pass a tap device, ns-3's
+    :code:`TapBridge` and the CSMA model, which limits the throughput.
+    This channel emulates :code:`delay` and :code:`speed` with the kernel's
+    :code:`netem` and :code:`tbf` queueing disciplines on the containers' interfaces.
+    Use it for simple wired links with :code:`Network.connect(..., channel_type=NetemChannel)`.
+
+    The semantics differ slightly from :class:`.CSMAChannel`: every node may send with
+    :code:`speed` (instead of sharing one collision domain).
+
+    *Warning:* Only nodes with an IP stack (:class:`.DockerNode` and :class:`.LXDNode`) and
+    IPv4 networks are supported. The interfaces are captured with :code:`tcpdump` on the host
+    (see :class:`.CapturePolicy`) and :func:`.Node.go_offline` has no effect on this channel.
+
+    Parameters
+    ----------
+    delay : str
+        A time for delay in the channel.
+    speed : str
+        The channel's transmission speed.
+    """
+    __counter = 0
+
+    def __init__(self, network, nodes, delay="0ms", speed="100Mbps"):
+        super().__init__(network, nodes)
+
+        #: A unique number identifying the channel.
+        self.number = NetemChannel.__counter
+        NetemChannel.__counter += 1
+
+        #: The channel's delay.
+        self.delay = delay
+        #: The channel's speed for transmitting.
+        #:
+        #: Valid values e.g. are :code:`'100Mbps'` or :code:`'64kbps'`.
+        self.speed = speed
+
+        # Use ns-3's parsers for the same semantics as the CSMAChannel.
+        #: The delay in microseconds.
+        self.delay_us = int(core.Time(self.delay).GetMicroSeconds())
+        #: The speed in bits per second.
+        self.rate_bps = int(ns_net.DataRate(self.speed).GetBitRate())
+        #: The bucket size of the token bucket filter in bytes (10ms at full rate).
+        self.burst = max(1600, self.rate_bps // 8 // 100)
+
+        if self.network.network.version != 4:
+            raise ValueError('The NetemChannel only supports IPv4 networks.')
+
+        logger.info('Set IP addresses on nodes')
+        for node in nodes:
+            if not node.wants_ip_stack():
+                raise ValueError(f'The NetemChannel does not support node {node.name}.')
+            ip_address = self.network.address_helper.NewAddress()
+            netmask = network.network.prefixlen
+            address = ipaddress.ip_interface(f'{ip_address}/{netmask}')
+
+            interface = NetemInterface(self, node=node, address=address)
+            node.add_interface(interface)
+            self.interfaces.append(interface)
+
+    @property
+    def bridge_name(self):
+        """str: The name of the channel's bridge."""
+        return f'br-ns3-n{self.number}'
+
+    def prepare(self, simulation):
+        session = NetlinkSession.get()
+        logger.debug('Create bridge %s', self.bridge_name)
+        session.add(self.bridge_name, 'bridge')
+        # Removing the bridge releases the remaining ports, so it does not have to wait for the nodes.
+        defer(f'remove bridge {self.bridge_name}', self.remove_bridge)
+        for interface in self.interfaces:
+            interface.bridge_created = True
+        session.set(self.bridge_name, state='up')
+        self.enable_capture(simulation)
+
+    def remove_bridge(self):
+        """Destroy the channel's bridge."""
+        logger.debug('Remove bridge %s', self.bridge_name)
+        NetlinkSession.get().remove(self.bridge_name)
@@ -1,7 +1,6 @@
 """Wireless channel."""
 import ipaddress
 import logging
-import os
 
 from enum import Enum, unique
 from ns import core, internet, network as ns_net, wifi, wave, propagation
@@ -258,6 +257,4 @@ class WiFiChannel(Channel):
 
 
     def prepare(self, simulation):
-        for interface in self.interfaces:
-            pcap_log_path = os.path.join(simulation.log_directory, interface.pcap_file_name)
-            self.wifi_phy_helper.EnablePcap(pcap_log_path, interface.ns3_device, True, True)
+        self.enable_capture(simulation, self.wifi_phy_helper)
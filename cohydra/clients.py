@@ -0,0 +1,73 @@
+"""Shared clients for the container runtimes.
+
+Every client keeps its own connection pool to the daemon. Therefore, all parts of
+cohydra share one long-lived client per runtime instead of creating new ones.
+"""
+
+import logging
+import threading
+
+import docker
+
+logger = logging.getLogger(__name__)
+
+#: The default size of the docker connection pool.
+DEFAULT_DOCKER_POOL_SIZE = docker.constants.DEFAULT_MAX_POOL_SIZE
+
+_lock = threading.Lock()
+_docker_client = None
+_docker_pool_size = DEFAULT_DOCKER_POOL_SIZE
+_lxd_client = None
+
+def docker_client():
+    """Return the shared docker client.
+
+    The client is configured from the environment (like :func:`docker.from_env`).
+
+    Returns
+    -------
+    :class:`docker.DockerClient`
+        The shared client.
+    """
+    global _docker_client # pylint: disable=global-statement,invalid-name
+    with _lock:
+        if _docker_client is None:
+            logger.debug('Connecting to docker (pool size %d)', _docker_pool_size)
+            _docker_client = docker.from_env(max_pool_size=_docker_pool_size)
+        return _docker_client
+
+def set_docker_pool_size(size):
+    """Set the number of connections the shared docker client keeps open.
+
+    Every container's log stream holds a connection during the whole simulation.
+    If the size changes, the client is replaced by a new one.
+
+    Parameters
+    ----------
+    size : int
+        The maximum number of pooled connections.
+    """
+    global _docker_client, _docker_pool_size # pylint: disable=global-statement,invalid-name
+    with _lock:
+        if size == _docker_pool_size:
+            return
+        _docker_pool_size = size
+        if _docker_client is not None:
+            logger.debug('Resizing docker connection pool to %d', size)
+            _docker_client = docker.from_env(max_pool_size=size)
+
+def lxd_client():
+    """Return the shared LXD client.
+
+    Returns
+    -------
+    :class:`pylxd.Client`
+        The shared client.
+    """
+    global _lxd_client # pylint: disable=global-statement,invalid-name
+    with _lock:
+        if _lxd_client is None:
+            # LXD is optional, so pylxd is only loaded when used.
+            import pylxd # pylint: disable=import-outside-toplevel
+            _lxd_client = pylxd.Client()
+        return _lxd_client
@@ -2,9 +2,19 @@
 the simulation and is thereful useful in combination with a :class:`.Workflow`.
 """
 
-from .base import CommandExecutor
-from .local import LocalCommandExecutor
-from .console import ConsoleCommandExecutor
-from .docker import DockerCommandExecutor
-from .lxd import LXDCommandExecutor
-from .ssh import SSHCommandExecutor
+from ..util import lazy_attributes
+
+# The clients (docker, pylxd, paramiko) are loaded when the executor type is used.
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'CommandExecutor': '.base',
+    'LocalCommandExecutor': '.local',
+    'ConsoleCommandExecutor': '.console',
+    'DockerCommandExecutor': '.docker',
+    'LXDCommandExecutor': '.lxd',
+    'SSHCommandExecutor': '.ssh',
+})
+
+__all__ = [
+    'CommandExecutor', 'LocalCommandExecutor', 'ConsoleCommandExecutor',
+    'DockerCommandExecutor', 'LXDCommandExecutor', 'SSHCommandExecutor',
+]
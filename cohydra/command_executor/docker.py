@@ -3,6 +3,7 @@ import logging
 from docker.models.containers import Container
 from docker.utils.socket import frames_iter_no_tty
 
+from ..clients import docker_client
 from . import util
 from .base import CommandExecutor
 
@@ -13,12 +14,15 @@ class DockerCommandExecutor(CommandExecutor):
     ----------
     name : str
         The name of the command executor.
-    container : str
-        The container to run the commands in.
+    container : :class:`docker.models.containers.Container` or str
+        The container (or its name) to run the commands in.
+        Names are resolved with the shared docker client.
     """
 
     def __init__(self, name, container: Container):
         super().__init__(name)
+        if isinstance(container, str):
+            container = docker_client().containers.get(container)
         #:The container to run the commands in.
         self.container = container
 
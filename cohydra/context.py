@@ -2,7 +2,9 @@
 
 import logging
 import collections
+import contextlib
 import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 logger = logging.getLogger(__name__)
 
@@ -81,6 +83,21 @@ class Context:
         """Add an error (to be implemented)."""
         self.fails += 1
 
+    @contextlib.contextmanager
+    def attach(self):
+        """Make the context the current context of the calling thread.
+
+        This is used by worker threads, which defer items into a context that was
+        entered by another thread. In contrast to :code:`with context:`, leaving the
+        block does not cleanup the context.
+        """
+        Context.__stack.push(self)
+        try:
+            yield self
+        finally:
+            assert Context.__stack.pop() is self, \
+                'Invalid context stack, not the same number of push and pop operations'
+
     def __enter__(self):
         Context.__stack.push(self)
         return self
@@ -115,6 +132,22 @@ class DeferredItem:
         self.args = args
         #: Keyword arguments to be passed to the callable.
         self.kwargs = kwargs
+        #: Items that have to be cleaned up before this item.
+        self.dependencies = set()
+
+    def after(self, *items):
+        """Clean this item up only after other items have been cleaned up.
+
+        This is only relevant for contexts cleaning up concurrently (see :class:`.ParallelContext`).
+        Otherwise, the items are cleaned up in reverse order of their deferral.
+
+        Parameters
+        ----------
+        items : list of :class:`.DeferredItem`
+            The items to clean up before this item.
+        """
+        self.dependencies.update(item for item in items if item is not None and item is not self)
+        return self
 
     def cancel(self):
         """Cancel the execution of the item."""
@@ -194,3 +227,85 @@ class SimpleContext(Context):
     def __exit__(self, exc_type, exc_value, exc_traceback):
         super().__exit__(exc_type, exc_value, exc_traceback)
         self.cleanup()
+
+class ParallelContext(SimpleContext):
+    """The parallel context executes independent deferred items concurrently.
+
+    Dependencies between items are declared with :func:`.DeferredItem.after`.
+    Items without declared dependencies are considered independent of each other.
+
+    .. code-block:: python
+
+        with ParallelContext(max_workers=32):
+            with scenario as simulation:
+                simulation.simulate(simulation_time=60)
+
+    Parameters
+    ----------
+    max_workers : int
+        The maximum number of items to cleanup concurrently.
+    """
+    def __init__(self, max_workers=16):
+        super().__init__()
+        #: The maximum number of items being cleaned up concurrently.
+        self.max_workers = max_workers
+        #: Guards the failure accounting.
+        self.lock = threading.Lock()
+
+    def add_error(self, err: Exception):
+        with self.lock:
+            super().add_error(err)
+
+    def cancel(self, item):
+        logger.debug('Removed deferred item: %s', item)
+        try:
+            self.dequeue.remove(item)
+        except ValueError:
+            # The item is already being cleaned up.
+            pass
+
+    def cleanup(self):
+        while self.dequeue:
+            items = list(self.dequeue)
+            self.dequeue.clear()
+            logger.info('Cleanup %d items with up to %d workers', len(items), self.max_workers)
+            self.__cleanup(items)
+
+    def __cleanup(self, items):
+        """Cleanup items concurrently, respecting their dependencies.
+
+        Parameters
+        ----------
+        items : list of :class:`.DeferredItem`
+            The items in the order a :class:`.SimpleContext` would cleanup them.
+        """
+        pending = set(items)
+        waiting = {item: item.dependencies & pending for item in items}
+        dependents = collections.defaultdict(list)
+        for item, dependencies in waiting.items():
+            for dependency in dependencies:
+                dependents[dependency].append(item)
+
+        queue = collections.deque(items)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='cleanup') as executor:
+            def submit_ready():
+                for item in list(queue):
+                    if not waiting[item]:
+                        queue.remove(item)
+                        logger.debug('Cleanup deferred item: %s', item)
+                        running[executor.submit(item.cleanup)] = item
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = running.pop(future)
+                    for dependent in dependents[item]:
+                        waiting[dependent].discard(item)
+                submit_ready()
+
+        if queue:
+            logger.warning('Cyclic dependencies between deferred items, cleanup %d items one by one', len(queue))
+            for item in queue:
+                item.cleanup()
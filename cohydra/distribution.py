@@ -0,0 +1,231 @@
+"""Distribute the nodes of a scenario over several hosts."""
+
+import logging
+import os
+
+from .command_executor.base import CommandExecutor
+
+logger = logging.getLogger(__name__)
+
+#: The environment variable with the name of the local host.
+HOST_VARIABLE = 'COHYDRA_HOST'
+#: The environment variable with all hosts (:code:`name=address,name=address,...`).
+HOSTS_VARIABLE = 'COHYDRA_HOSTS'
+#: The largest VXLAN network identifier (24 bits).
+MAX_VNI = (1 << 24) - 1
+
+class Host:
+    """A host running a share of the scenario.
+
+    Parameters
+    ----------
+    name : str
+        The name of the host.
+    address : str
+        The IP address the other hosts reach the host at (the tunnel endpoint).
+    """
+
+    def __init__(self, name, address):
+        #: The name of the host.
+        self.name = name
+        #: The IP address of the tunnel endpoint.
+        self.address = address
+
+    def __str__(self):
+        return f'{self.name} ({self.address})'
+
+class RemoteNodeError(Exception):
+    """A command was executed on a node running on another host."""
+
+class RemoteCommandExecutor(CommandExecutor):
+    """The command executor of nodes running on other hosts.
+
+    The workflows run on the coordinator, which cannot reach the containers of other hosts.
+    Executing a command raises a :class:`RemoteNodeError` instead of failing obscurely.
+
+    Parameters
+    ----------
+    name : str
+        The name of the node.
+    host : :class:`Host`
+        The host running the node.
+    """
+
+    def __init__(self, name, host):
+        super().__init__(name)
+        #: The host running the node.
+        self.host = host
+
+    def execute(self, command, user=None, shell=None, stdout_logfile=None, stderr_logfile=None):
+        raise RemoteNodeError(f'{self.name} runs on the host {self.host}. Workflows cannot execute '
+                              'commands on nodes of other hosts.')
+
+class Distribution:
+    """The Distribution assigns the nodes of a scenario to hosts.
+
+    The same scenario script runs on every host, each one with a different local host.
+    A host starts only the containers of its nodes. Every channel is simulated by ns-3 on
+    one host, by default the host of the channel's first node. If a node's interface is on a
+    channel of another host, its bridges on both hosts are connected by a VXLAN tunnel
+    instead of a tap device. The VNI of the tunnel is derived from the position of the channel
+    in the scenario and of the interface in the channel, so the scenario has to be built
+    in the same order on all hosts.
+
+    Each host captures only the channels it simulates and writes its logs to a subdirectory
+    of the simulation's log directory named after the host.
+
+    The first host is the coordinator. Workflows and mobility inputs only run there.
+    Thus, channels depending on positions (WiFi) should be simulated on the coordinator.
+    Workflows can only execute commands on the coordinator's nodes. Executing a command on
+    a node of another host raises a :class:`RemoteNodeError` (see :class:`RemoteCommandExecutor`).
+
+    *Warning:* The tunnel adds 50 bytes of overhead. Make sure the hosts' links allow
+    frames larger than the containers' MTU. The hosts start simulating independently.
+
+    Example
+    -------
+    .. code-block:: python
+
+        distribution = Distribution([Host('a', '192.168.0.1'), Host('b', '192.168.0.2')], local='a')
+        scenario = Scenario(distribution=distribution)
+        ...
+        distribution.assign(node, 'b')
+
+    Parameters
+    ----------
+    hosts : list of :class:`Host`
+        All hosts. The first one is the coordinator.
+    local : str
+        The name of the host the script runs on.
+    """
+
+    def __init__(self, hosts, local):
+        if not hosts:
+            raise ValueError('Please specify at least one host.')
+        #: The hosts by name.
+        self.hosts = {host.name: host for host in hosts}
+        if local not in self.hosts:
+            raise ValueError(f'Unknown local host "{local}".')
+        #: The host the script runs on.
+        self.local = self.hosts[local]
+        #: The coordinator.
+        self.coordinator = hosts[0]
+
+        self.__node_hosts = {}
+        self.__channel_hosts = {}
+
+    @staticmethod
+    def from_environment():
+        """Create a distribution from the environment variables.
+
+        :code:`COHYDRA_HOSTS` contains all hosts (e.g. :code:`a=192.168.0.1,b=192.168.0.2`)
+        and :code:`COHYDRA_HOST` the name of the local host.
+
+        Returns
+        -------
+        :class:`Distribution`
+            The distribution or :code:`None`, if the variables are not set.
+        """
+        if HOSTS_VARIABLE not in os.environ or HOST_VARIABLE not in os.environ:
+            return None
+        hosts = []
+        for entry in os.environ[HOSTS_VARIABLE].split(','):
+            name, _, address = entry.partition('=')
+            hosts.append(Host(name.strip(), address.strip()))
+        return Distribution(hosts, os.environ[HOST_VARIABLE])
+
+    def assign(self, node, host):
+        """Run a node on a host (nodes run on the coordinator by default).
+
+        Parameters
+        ----------
+        node : :class:`.Node`
+            The node.
+        host : str
+            The name of the host.
+        """
+        self.__node_hosts[node] = self.hosts[host]
+
+    def assign_channel(self, channel, host):
+        """Simulate a channel on a host.
+
+        Parameters
+        ----------
+        channel : :class:`.Channel`
+            The channel.
+        host : str
+            The name of the host.
+        """
+        self.__channel_hosts[channel] = self.hosts[host]
+
+    def node_host(self, node):
+        """Return the host of a node."""
+        return self.__node_hosts.get(node, self.coordinator)
+
+    def channel_host(self, channel):
+        """Return the host simulating a channel."""
+        if channel in self.__channel_hosts:
+            return self.__channel_hosts[channel]
+        if not channel.interfaces:
+            return self.coordinator
+        return self.node_host(channel.interfaces[0].node)
+
+    def is_local(self, node):
+        """Return whether a node runs on the local host."""
+        return self.node_host(node) is self.local
+
+    def setup_remote_nodes(self, nodes):
+        """Give the nodes of other hosts a :class:`RemoteCommandExecutor`.
+
+        Parameters
+        ----------
+        nodes : iterable of :class:`.Node`
+            All nodes of the scenario.
+        """
+        for node in nodes:
+            if not self.is_local(node):
+                node.command_executor = RemoteCommandExecutor(node.name, self.node_host(node))
+
+    def is_coordinator(self):
+        """Return whether the local host is the coordinator."""
+        return self.local is self.coordinator
+
+    def setup_tunnels(self, channels):
+        """Connect the interfaces to channels simulated on other hosts.
+
+        On the channel's host, the interface's bridge and tap device are set up without the node.
+        On the node's host, the interface is not connected to ns-3.
+        The bridges are connected with a VXLAN tunnel.
+
+        Parameters
+        ----------
+        channels : iterable of :class:`.Channel`
+            All channels of the scenario (in the order of the scenario).
+        """
+        # Every interface of the scenario gets its own VNI, the same on all hosts.
+        vni = 0
+        for channel in channels:
+            channel_host = self.channel_host(channel)
+            for interface in channel.interfaces:
+                vni += 1
+                node_host = self.node_host(interface.node)
+                if node_host is channel_host:
+                    continue
+                if vni > MAX_VNI:
+                    raise ValueError(f'Too many interfaces for VXLAN tunnels (the VNI of {interface.node.name} '
+                                     f'would be {vni}, the maximum is {MAX_VNI}).')
+                if not interface.node.wants_host_bridge() or not interface.tap_bridged:
+                    raise ValueError(f'{interface.node.name} has to run on the host of its channel '
+                                     f'({channel_host.name}).')
+                if channel_host is self.local:
+                    logger.info('Tunnel %s of %s to %s (VNI %d)', interface.ifname, interface.node.name, node_host,
+                                vni)
+                    interface.setup_bridge()
+                    interface.connect_tap_to_bridge()
+                    interface.setup_tunnel(vni, node_host.address, self.local.address)
+                elif node_host is self.local:
+                    logger.info('Tunnel %s of %s to %s (VNI %d)', interface.ifname, interface.node.name,
+                                channel_host, vni)
+                    interface.tap_bridged = False
+                    interface.setup_bridge()
+                    interface.setup_tunnel(vni, channel_host.address, self.local.address)
@@ -0,0 +1,94 @@
+"""Integration of ns-3's FlowMonitor."""
+
+import logging
+import os
+
+from ns import flow_monitor, internet, network as ns_net
+
+from .analysis.columns import write_columns
+
+logger = logging.getLogger(__name__)
+
+class FlowMonitor:
+    """The FlowMonitor collects per-flow statistics of ns-3's IP stack.
+
+    It is installed on all nodes which got an IP stack from a :class:`.CSMAChannel` or :class:`.WiFiChannel`.
+    The statistics are written to :code:`flow-monitor.npz` in the log directory
+    (see :func:`.load_flow_monitors`).
+
+    *Warning:* The containers' packets are bridged through the tap devices and bypass ns-3's IP stack.
+    Thus, only flows routed or sent by ns-3 itself are monitored. Use the PCAP summary
+    (:func:`.analysis.flows.summarize`) for the containers' flows. Only IPv4 is supported.
+    """
+
+    def __init__(self):
+        #: The ns-3 helper, which owns the classifier.
+        self.helper = flow_monitor.FlowMonitorHelper()
+        #: The ns-3 FlowMonitor (once installed).
+        self.monitor = None
+
+    def install(self, nodes):
+        """Install the monitor on the nodes with an IP stack.
+
+        Parameters
+        ----------
+        nodes : iterable of :class:`.Node`
+            The nodes of the scenario.
+        """
+        container = ns_net.NodeContainer()
+        for node in nodes:
+            if node.ns3_node.GetObject(internet.Ipv4.GetTypeId()) is None:
+                continue
+            if any(interface.address is not None and interface.address.version == 6
+                   for interface in node.interfaces.values()):
+                raise Exception(f'The FlowMonitor does not support the IPv6 addresses of {node.name}.')
+            container.Add(node.ns3_node)
+        logger.info('Installing FlowMonitor on %d nodes', container.GetN())
+        self.monitor = self.helper.Install(container)
+
+    def write(self, directory, name='flow-monitor'):
+        """Write the statistics to a directory.
+
+        This has to be called before the simulator is destroyed.
+
+        Parameters
+        ----------
+        directory : str
+            The path to the directory to put the file in.
+        name : str
+            The file name (without extension).
+        """
+        if self.monitor is None:
+            return
+        self.monitor.CheckForLostPackets()
+        classifier = self.helper.GetClassifier()
+        columns = {
+            'flow_id': ('u4', []), 'protocol': ('u2', []), 'source': ('U', []), 'source_port': ('u2', []),
+            'destination': ('U', []), 'destination_port': ('u2', []), 'tx_packets': ('u8', []),
+            'rx_packets': ('u8', []), 'lost_packets': ('u8', []), 'tx_bytes': ('u8', []), 'rx_bytes': ('u8', []),
+            'first_tx': ('f8', []), 'last_rx': ('f8', []), 'delay_sum': ('f8', []), 'jitter_sum': ('f8', []),
+            'times_forwarded': ('u8', []),
+        }
+        for flow_id, stats in self.monitor.GetFlowStats():
+            flow = classifier.FindFlow(flow_id)
+            for column, value in (
+                    ('flow_id', flow_id),
+                    ('protocol', flow.protocol),
+                    ('source', str(flow.sourceAddress)),
+                    ('source_port', flow.sourcePort),
+                    ('destination', str(flow.destinationAddress)),
+                    ('destination_port', flow.destinationPort),
+                    ('tx_packets', stats.txPackets),
+                    ('rx_packets', stats.rxPackets),
+                    ('lost_packets', stats.lostPackets),
+                    ('tx_bytes', stats.txBytes),
+                    ('rx_bytes', stats.rxBytes),
+                    ('first_tx', stats.timeFirstTxPacket.GetSeconds()),
+                    ('last_rx', stats.timeLastRxPacket.GetSeconds()),
+                    ('delay_sum', stats.delaySum.GetSeconds()),
+                    ('jitter_sum', stats.jitterSum.GetSeconds()),
+                    ('times_forwarded', stats.timesForwarded)):
+                columns[column][1].append(value)
+
+        write_columns(os.path.join(directory, f'{name}.npz'), {'flow_monitor': columns})
+        logger.info('FlowMonitor: %d flows', len(columns['flow_id'][1]))
@@ -0,0 +1,325 @@
+"""Acquiring container images before the simulation starts.
+
+Pulling and building images is the slowest part of preparing a simulation.
+The distinct images of all nodes are therefore acquired concurrently before any
+container is started. This can also be used on its own, e.g. for prewarming CI hosts:
+
+.. code-block:: python
+
+    from cohydra.images import DockerBuild, DockerImage, acquire_images
+
+    acquire_images([DockerImage('httpd:2.4'), DockerBuild('./docker/ping')])
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import docker
+
+from .clients import docker_client, lxd_client
+
+logger = logging.getLogger(__name__)
+
+#: The image label storing the digest of the build context.
+CONTEXT_DIGEST_LABEL = 'cohydra.context-digest'
+
+#: Images built (or found) in this process by context digest.
+_built_images = {}
+#: Locks per context digest, so that nodes sharing a context build only once.
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+def build_context_digest(build_dir, dockerfile='Dockerfile'):
+    """Calculate a digest of a docker build context.
+
+    The digest covers the relative path, the executable bit and the content of every file
+    in the context directory as well as the Dockerfile (which may be located outside).
+
+    Parameters
+    ----------
+    build_dir : str
+        The context directory.
+    dockerfile : str
+        The path to the Dockerfile (relative to the context directory or absolute).
+
+    Returns
+    -------
+    str
+        The hex digest.
+    """
+    digest = hashlib.sha256()
+    dockerfile_path = os.path.join(build_dir, dockerfile)
+    digest.update(os.path.relpath(dockerfile_path, build_dir).encode())
+    with open(dockerfile_path, 'rb') as file:
+        digest.update(hashlib.sha256(file.read()).digest())
+
+    for root, dirs, files in os.walk(build_dir):
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            digest.update(os.path.relpath(path, build_dir).encode())
+            digest.update(b'x' if os.access(path, os.X_OK) else b'-')
+            file_digest = hashlib.sha256()
+            with open(path, 'rb') as file:
+                for chunk in iter(lambda: file.read(1 << 16), b''): # pylint: disable=cell-var-from-loop
+                    file_digest.update(chunk)
+            digest.update(file_digest.digest())
+    return digest.hexdigest()
+
+def build_image(client, build_dir, dockerfile='Dockerfile'):
+    """Build an image or reuse an image that has been built from the same context.
+
+    Images are labeled with the digest of their build context (see :func:`build_context_digest`).
+    If an image with the same digest exists, the build is skipped.
+
+    Parameters
+    ----------
+    client : :class:`docker.DockerClient`
+        The client to use.
+    build_dir : str
+        The context directory.
+    dockerfile : str
+        The path to the Dockerfile.
+
+    Returns
+    -------
+    :class:`docker.models.images.Image`
+        The image.
+    """
+    digest = build_context_digest(build_dir, dockerfile)
+    with _build_locks_lock:
+        lock = _build_locks.setdefault(digest, threading.Lock())
+
+    with lock:
+        if digest in _built_images:
+            return _built_images[digest]
+
+        images = client.images.list(filters={'label': f'{CONTEXT_DIGEST_LABEL}={digest}'})
+        if images:
+            logger.info('Using cached docker image for %s/%s', build_dir, dockerfile)
+            image = images[0]
+        else:
+            logger.info('Building docker image: %s/%s', build_dir, dockerfile)
+            image = client.images.build(
+                path=build_dir,
+                dockerfile=dockerfile,
+                rm=True,
+                nocache=False,
+                labels={CONTEXT_DIGEST_LABEL: digest},
+            )[0]
+        _built_images[digest] = image
+        return image
+
+class ImageSource:
+    """An ImageSource describes where the image of a node comes from.
+
+    Sources with the same :attr:`key` are acquired only once per process.
+    """
+
+    __results = {}
+    __locks = {}
+    __locks_lock = threading.Lock()
+
+    @property
+    def key(self):
+        """A hashable key identifying the image.
+
+        Returns
+        -------
+        tuple
+            The key.
+        """
+        raise NotImplementedError
+
+    def fetch(self):
+        """Pull or build the image.
+
+        *Warning:* Do not call this function manually, use :func:`acquire` instead.
+
+        Returns
+        -------
+        object
+            The backend specific image object.
+        """
+        raise NotImplementedError
+
+    def acquire(self):
+        """Acquire the image unless it has already been acquired by this process.
+
+        Returns
+        -------
+        object
+            The backend specific image object.
+        """
+        key = self.key
+        with ImageSource.__locks_lock:
+            lock = ImageSource.__locks.setdefault(key, threading.Lock())
+        with lock:
+            if key not in ImageSource.__results:
+                ImageSource.__results[key] = self.fetch()
+            return ImageSource.__results[key]
+
+    def __eq__(self, other):
+        return isinstance(other, ImageSource) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+class DockerImage(ImageSource):
+    """A docker image from a registry.
+
+    Parameters
+    ----------
+    name : str
+        The name of the image (e.g. :code:`httpd:2.4`).
+    pull : bool
+        Whether to always pull the image, even if it exists locally.
+    """
+
+    def __init__(self, name, pull=False):
+        #: The name of the image.
+        self.name = name
+        #: Enforce pulling the image from a registry.
+        self.pull = pull
+
+    @property
+    def key(self):
+        return ('docker', self.name, self.pull)
+
+    def fetch(self):
+        client = docker_client()
+        if not self.pull:
+            try:
+                return client.images.get(self.name)
+            except docker.errors.ImageNotFound:
+                pass
+
+        repo, tag = docker.utils.parse_repository_tag(self.name)
+        tag = tag or 'latest'
+        logger.info('Pulling docker image: %s, tag %s', repo, tag)
+        return client.images.pull(repo, tag=tag)
+
+    def __str__(self):
+        return self.name
+
+class DockerBuild(ImageSource):
+    """A docker image built from a local context.
+
+    Parameters
+    ----------
+    build_dir : str
+        The context directory (relative path possible) to execute the build in.
+    dockerfile : str
+        The (absolute or relative) path to the Dockerfile.
+    """
+
+    def __init__(self, build_dir, dockerfile='Dockerfile'):
+        #: The context to build the image in.
+        self.build_dir = build_dir
+        #: The path to the Dockerfile.
+        self.dockerfile = dockerfile
+
+    @property
+    def key(self):
+        build_dir = os.path.abspath(self.build_dir)
+        return ('docker-build', build_dir, os.path.join(build_dir, self.dockerfile))
+
+    def fetch(self):
+        return build_image(docker_client(), self.build_dir, self.dockerfile)
+
+    def __str__(self):
+        return f'{self.build_dir}/{self.dockerfile}'
+
+class LXDImage(ImageSource):
+    """A LXD image identified by its alias.
+
+    Parameters
+    ----------
+    alias : str
+        The alias of the image.
+    server : str
+        The simplestreams server to fetch the image from, if it is not found locally.
+    """
+
+    def __init__(self, alias, server='https://images.linuxcontainers.org'):
+        #: The alias of the image.
+        self.alias = alias
+        #: The server to fetch the image from.
+        self.server = server
+
+    @property
+    def key(self):
+        return ('lxd', self.alias, self.server)
+
+    def fetch(self):
+        import pylxd # pylint: disable=import-outside-toplevel
+        client = lxd_client()
+        try:
+            return client.images.get_by_alias(self.alias)
+        except pylxd.exceptions.NotFound:
+            pass
+
+        logger.info('Fetching LXD image "%s" from %s', self.alias, self.server)
+        image = client.images.create_from_simplestreams(self.server, self.alias)
+        image.add_alias(self.alias, '')
+        return image
+
+    def __str__(self):
+        return f'{self.alias} ({self.server})'
+
+class AcquireError(Exception):
+    """Acquiring one or more images failed.
+
+    Parameters
+    ----------
+    errors : list of tuple
+        The failed :class:`.ImageSource` and the exception raised while acquiring it.
+    """
+
+    def __init__(self, errors):
+        names = ', '.join(str(source) for source, _ in errors)
+        super().__init__(f'Failed to acquire {len(errors)} image(s): {names}')
+        #: The failed sources and their exceptions.
+        self.errors = errors
+
+def acquire_images(sources, max_workers=4):
+    """Acquire distinct images concurrently.
+
+    Parameters
+    ----------
+    sources : iterable of :class:`.ImageSource`
+        The images to acquire. :code:`None` entries and duplicates are skipped.
+    max_workers : int
+        The maximum number of images to pull or build concurrently.
+    """
+    sources = list(dict.fromkeys(source for source in sources if source is not None))
+    if not sources:
+        return
+
+    logger.info('Acquiring %d images with %d workers.', len(sources), max_workers)
+    start = time.monotonic()
+
+    def acquire(source):
+        source_start = time.monotonic()
+        source.acquire()
+        return time.monotonic() - source_start
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='images') as executor:
+        futures = {executor.submit(acquire, source): source for source in sources}
+        for done, future in enumerate(as_completed(futures), start=1):
+            source = futures[future]
+            err = future.exception()
+            if err is not None:
+                logger.error('[%d/%d] Failed to acquire image %s: %s', done, len(sources), source, err)
+                errors.append((source, err))
+            else:
+                logger.info('[%d/%d] Acquired image %s (%.1fs)', done, len(sources), source, future.result())
+
+    logger.info('Acquired images in %.1fs.', time.monotonic() - start)
+    if errors:
+        raise AcquireError(errors)
@@ -3,9 +3,14 @@ import logging
 from pyroute2 import IPRoute
 from ns import core, tap_bridge, network as ns_net
 from .context import defer
+from .netlink import NetlinkSession
+from .util import ns3_lock
 
 logger = logging.getLogger(__name__)
 
+#: The UDP port of VXLAN tunnels between hosts.
+VXLAN_PORT = 4789
+
 class Interface:
     """The Interface resembles a network card.
 
@@ -46,6 +51,19 @@ class Interface:
             allocated_mac = ns_net.Mac48Address.Allocate()
             checker = ns_net.MakeMac48AddressChecker()
             self.mac_address = ns_net.Mac48AddressValue(allocated_mac).SerializeToString(checker)
+        #: Whether the bridge has been created on the host.
+        self.bridge_created = False
+        #: Whether the tap device has been created on the host.
+        self.tap_created = False
+        #: Whether the VETH pair has been created on the host.
+        self.veth_created = False
+        #: Whether the interface is connected to ns-3 via a tap device on its bridge.
+        self.tap_bridged = True
+        #: The ns-3 tap bridge device (after :func:`connect_tap_to_bridge`).
+        self.tap_bridge = None
+        #: The deferred teardowns of the host links by kind (:code:`bridge`, :code:`tap`, :code:`veth`,
+        #: :code:`vxlan`).
+        self.teardowns = {}
 
     def __interface_name(self, prefix):
         """Return the name of the interface.
@@ -95,6 +113,46 @@ class Interface:
         """
         return self.__interface_name('veth')
 
+    @property
+    def veth_peer_name(self):
+        """Return a unique name for the internal side of the VETH pair, while it is on the host.
+
+        Returns
+        -------
+        str
+            A VETH peer name.
+        """
+        return self.__interface_name('vp')
+
+    @property
+    def tunnel_name(self):
+        """Return a unique name for a VXLAN tunnel.
+
+        Returns
+        -------
+        str
+            A tunnel name.
+        """
+        return self.__interface_name('vx')
+
+    @property
+    def host_device(self):
+        """Return the network device on the host carrying the interface's packets.
+
+        This is the tap device or, if the interface is not connected to ns-3 by a tap device
+        (e.g. on a :class:`.NetemChannel`), the host's end of the VETH pair.
+
+        Returns
+        -------
+        str
+            A device name or :code:`None`, if there is no device on the host.
+        """
+        if self.tap_created:
+            return self.tap_name
+        if not self.tap_bridged:
+            return self.veth_name
+        return None
+
     @property
     def pcap_file_name(self):
         """Return the name for the PCAP log file.
@@ -106,26 +164,59 @@ class Interface:
         """
         return f'{self.node.name}.{self.ifname}.pcap'
 
+    def defer_teardown(self, kind, name, func):
+        """Defer the teardown of a host link.
+
+        The bridge is removed only after all other links of this interface.
+
+        Parameters
+        ----------
+        kind : str
+            The kind of link (:code:`bridge`, :code:`tap`, :code:`veth` or :code:`vxlan`).
+        name : str
+            The name of the deferred item.
+        func : callable
+            The teardown function.
+
+        Returns
+        -------
+        :class:`.DeferredItem`
+            The deferred item.
+        """
+        item = defer(name, func)
+        self.teardowns[kind] = item
+        bridge = self.teardowns.get('bridge')
+        if bridge is not None:
+            bridge.after(*self.teardowns.values())
+        return item
+
     def setup_bridge(self):
-        """Setup a bridge for adding a tap later on."""
-        ipr = IPRoute()
+        """Setup a bridge for adding a tap later on.
+
+        Nothing is done, if the bridge has already been created by :func:`setup_host_links`.
+        """
+        if self.bridge_created:
+            return
+        session = NetlinkSession.get()
 
         logger.debug('Create bridge %s', self.bridge_name)
-        ipr.link('add', ifname=self.bridge_name, kind='bridge')
-        defer(f'remove bridge {self.bridge_name}', self.remove_bridge)
+        session.add(self.bridge_name, 'bridge')
+        self.bridge_created = True
+        self.defer_teardown('bridge', f'remove bridge {self.bridge_name}', self.remove_bridge)
 
-        ipr.link('set', ifname=self.bridge_name, state='up')
+        session.set(self.bridge_name, state='up')
 
     def remove_bridge(self):
         """Destroy the bridge."""
-        ipr = IPRoute()
-
         logger.debug('Remove bridge %s', self.bridge_name)
-        ipr.link('del', ifname=self.bridge_name)
+        NetlinkSession.get().remove(self.bridge_name)
+        self.bridge_created = False
 
     def connect_tap_to_bridge(self, bridge_name=None, tap_mode="ConfigureLocal"):
         """Connect a ns-3 tap device to the bridge.
 
+        The tap device is only created, if it has not already been created by :func:`setup_host_links`.
+
         Parameters
         ----------
         bridge_name : str
@@ -133,48 +224,85 @@ class Interface:
         tap_mode : str
             The ns-3 mode for the tap bridge. Either ConfigureLocal or UseLocal.
         """
+        if not self.tap_bridged:
+            return
         if bridge_name is None:
             bridge_name = self.bridge_name
 
-        ipr = IPRoute()
-
-        logger.debug('Connect %s to bridge %s via %s', self.node.name, bridge_name, self.tap_name)
-        ipr.link('add', ifname=self.tap_name, kind='tuntap', mode='tap')
-        defer(f'disconnect ns3 node {self.node.name}', self.disconnect_tap_from_bridge)
+        if not self.tap_created:
+            session = NetlinkSession.get()
 
-        ipr.link('set', ifname=self.tap_name, state='up')
+            logger.debug('Connect %s to bridge %s via %s', self.node.name, bridge_name, self.tap_name)
+            session.add(self.tap_name, 'tuntap', mode='tap')
+            self.tap_created = True
+            self.defer_teardown('tap', f'disconnect ns3 node {self.node.name}', self.disconnect_tap_from_bridge)
 
-        ipr.link('set', ifname=self.tap_name, master=ipr.link_lookup(ifname=bridge_name)[0])
+            session.set(self.tap_name, master=session.lookup(bridge_name), state='up')
 
         logger.debug("Adding TapBridge for %s.", self.node.name)
-        tap_helper = tap_bridge.TapBridgeHelper()
-        # ConfigureLocal is used to prevent the TAP / bridged device to use a "learned" MAC address.
-        # So, we can set the CSMA and WiFiNetDevice address to something we control.
-        # Otherwise, WiFi ACK misses happen.
-        if tap_mode == "ConfigureLocal":
-            tap_helper.SetAttribute('Mode', core.StringValue('ConfigureLocal'))
-            tap_helper.SetAttribute('DeviceName', core.StringValue(self.tap_name))
-            tap_helper.SetAttribute('MacAddress', ns_net.Mac48AddressValue(ns_net.Mac48Address.Allocate()))
-            tap_helper.Install(self.node.ns3_node, self.ns3_device)
-        elif tap_mode == "UseLocal":
-            tap_helper.SetAttribute("Mode", core.StringValue("UseLocal"))
-            tap_helper.SetAttribute("DeviceName", core.StringValue(self.tap_name))
-            tap_helper.Install(self.node.ns3_node, self.ns3_device)
-        else:
-            logger.error("Unsupported TAP-Mode %s.", tap_mode)
+        with ns3_lock:
+            tap_helper = tap_bridge.TapBridgeHelper()
+            # ConfigureLocal is used to prevent the TAP / bridged device to use a "learned" MAC address.
+            # So, we can set the CSMA and WiFiNetDevice address to something we control.
+            # Otherwise, WiFi ACK misses happen.
+            if tap_mode == "ConfigureLocal":
+                tap_helper.SetAttribute('Mode', core.StringValue('ConfigureLocal'))
+                tap_helper.SetAttribute('DeviceName', core.StringValue(self.tap_name))
+                tap_helper.SetAttribute('MacAddress', ns_net.Mac48AddressValue(ns_net.Mac48Address.Allocate()))
+                self.tap_bridge = tap_helper.Install(self.node.ns3_node, self.ns3_device)
+            elif tap_mode == "UseLocal":
+                tap_helper.SetAttribute("Mode", core.StringValue("UseLocal"))
+                tap_helper.SetAttribute("DeviceName", core.StringValue(self.tap_name))
+                self.tap_bridge = tap_helper.Install(self.node.ns3_node, self.ns3_device)
+            else:
+                logger.error("Unsupported TAP-Mode %s.", tap_mode)
 
 
     def disconnect_tap_from_bridge(self):
         """Disconnect the (tap) interface and delete it."""
-        ipr = IPRoute()
-
         logger.debug('Disconnect %s from bridge via %s', self.node.name, self.tap_name)
-        ipr.link('del', ifname=self.tap_name)
+        NetlinkSession.get().remove(self.tap_name)
+        self.tap_created = False
+
+    def setup_tunnel(self, vni, remote, local=None):
+        """Connect the bridge to the bridge of this interface on another host.
+
+        A VXLAN tunnel is added to the bridge.
+
+        Parameters
+        ----------
+        vni : int
+            The VXLAN network identifier. Both hosts have to use the same one for the interface.
+        remote : str
+            The IP address of the other host.
+        local : str
+            The local IP address to send from.
+        """
+        session = NetlinkSession.get()
+
+        logger.debug('Create tunnel %s to %s on bridge %s', self.tunnel_name, remote, self.bridge_name)
+        options = {
+            'vxlan_id': vni,
+            'vxlan_group': remote,
+            'vxlan_port': VXLAN_PORT,
+        }
+        if local is not None:
+            options['vxlan_local'] = local
+        session.add(self.tunnel_name, 'vxlan', **options)
+        self.defer_teardown('vxlan', f'remove tunnel {self.tunnel_name}', self.remove_tunnel)
+        session.set(self.tunnel_name, master=session.lookup(self.bridge_name), state='up')
+
+    def remove_tunnel(self):
+        """Delete the VXLAN tunnel."""
+        logger.debug('Remove tunnel %s', self.tunnel_name)
+        NetlinkSession.get().remove(self.tunnel_name)
 
     def setup_veth_pair(self, peer):
         """Setup a VETH pair for containers.
 
         This function also connects the external site of the pair to the bridge.
+        If the pair has already been created by :func:`setup_host_links`,
+        only its internal side is moved (and renamed) according to :code:`peer`.
 
         Parameters
         ----------
@@ -182,25 +310,94 @@ class Interface:
             Options for the internal side of the VETH pair.
             This can e.g. contain the network namespace (see :class:`.DockerNode` for example).
         """
-        ipr = IPRoute()
+        session = NetlinkSession.get()
+
+        if self.veth_created:
+            logger.debug('Move veth peer %s to %s', self.veth_peer_name, peer.get('ifname'))
+            session.move(self.veth_peer_name, **peer)
+            return
 
         logger.debug('Create veth pair %s on bridge %s', self.veth_name, self.bridge_name)
         peer['address'] = self.mac_address
-        ipr.link('add', ifname=self.veth_name, peer=peer, kind='veth')
-        ipr.link('set', ifname=self.veth_name, master=ipr.link_lookup(ifname=self.bridge_name)[0])
-        ipr.link('set', ifname=self.veth_name, state='up')
+        session.add(self.veth_name, 'veth', peer=peer)
+        self.veth_created = True
+        self.defer_teardown('veth', f'remove veth pair {self.veth_name}', self.remove_veth_pair)
+        session.set(self.veth_name, master=session.lookup(self.bridge_name), state='up')
+
+    def remove_veth_pair(self):
+        """Delete the VETH pair (both ends).
 
-    def setup_veth_container_end(self, ifname):
+        Nothing is done, if the kernel already deleted the pair together with the container's network namespace.
+        """
+        logger.debug('Remove veth pair %s', self.veth_name)
+        NetlinkSession.get().remove(self.veth_name, missing_ok=True)
+        self.veth_created = False
+
+    def setup_veth_container_end(self, ifname, ipr=None):
         """Setup the VETH in a container.
 
+        This has to be called within the container's network namespace.
+        Therefore, it does not use the shared :class:`.NetlinkSession`.
+
         Parameters
         ----------
         ifname : str
             The interface name within the container.
+        ipr : :class:`pyroute2.IPRoute`
+            A socket opened within the container's network namespace.
+            If not specified, a new one is opened.
         """
-        ipr = IPRoute()
+        if ipr is None:
+            ipr = IPRoute()
 
         logger.debug('Bind veth %s to %s at %s', self.veth_name, ifname, self.address)
         index = ipr.link_lookup(ifname=ifname)[0]
         ipr.addr('add', index=index, address=str(self.address.ip), mask=self.address.network.prefixlen)
         ipr.link('set', index=index, state='up')
+
+def setup_host_links(interfaces, veth_interfaces=()):
+    """Create the bridges, tap devices and VETH pairs of many interfaces at once.
+
+    The links are created on the shared :class:`.NetlinkSession`, and the indices of
+    all new links are resolved with one dump instead of one lookup per link.
+    Afterwards, :func:`Interface.setup_bridge` and :func:`Interface.connect_tap_to_bridge`
+    only install the ns-3 part and :func:`Interface.setup_veth_pair` only moves the
+    internal side of the pair into the container.
+
+    Parameters
+    ----------
+    interfaces : list of :class:`.Interface`
+        The interfaces to create the bridges and taps for.
+    veth_interfaces : list of :class:`.Interface`
+        The interfaces to create the VETH pairs for. Their bridges have to exist
+        or be created by this call.
+    """
+    interfaces = [interface for interface in interfaces if interface.tap_bridged
+                  and not interface.bridge_created and not interface.tap_created]
+    veth_interfaces = [interface for interface in veth_interfaces if not interface.veth_created]
+    if not interfaces and not veth_interfaces:
+        return
+    session = NetlinkSession.get()
+
+    logger.debug('Create bridges and taps for %d interfaces and %d veth pairs', len(interfaces),
+                 len(veth_interfaces))
+    for interface in interfaces:
+        session.add(interface.bridge_name, 'bridge')
+        interface.bridge_created = True
+        interface.defer_teardown('bridge', f'remove bridge {interface.bridge_name}', interface.remove_bridge)
+        session.add(interface.tap_name, 'tuntap', mode='tap')
+        interface.tap_created = True
+        interface.defer_teardown('tap', f'disconnect ns3 node {interface.node.name}',
+                                 interface.disconnect_tap_from_bridge)
+    for interface in veth_interfaces:
+        session.add(interface.veth_name, 'veth',
+                    peer={'ifname': interface.veth_peer_name, 'address': interface.mac_address})
+        interface.veth_created = True
+        interface.defer_teardown('veth', f'remove veth pair {interface.veth_name}', interface.remove_veth_pair)
+
+    session.refresh()
+    for interface in interfaces:
+        session.set(interface.bridge_name, state='up')
+        session.set(interface.tap_name, master=session.lookup(interface.bridge_name), state='up')
+    for interface in veth_interfaces:
+        session.set(interface.veth_name, master=session.lookup(interface.bridge_name), state='up')
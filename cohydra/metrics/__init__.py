@@ -0,0 +1,11 @@
+"""Live metrics of a simulation."""
+from .buffer import MetricsBuffer
+from .exporter import MetricsExporter
+from .line_protocol import format_line
+from .resources import ResourceSampler, load_resources
+from .sinks import Sink, FileSink, InfluxDBSink
+from .sources import Source, ContainerResources, InterfaceCounters, MobilityInputSteps, NodePositions, RealtimeLag
+
+__all__ = ['MetricsBuffer', 'MetricsExporter', 'format_line', 'Sink', 'FileSink', 'InfluxDBSink', 'Source',
+           'ContainerResources', 'InterfaceCounters', 'MobilityInputSteps', 'NodePositions', 'RealtimeLag',
+           'ResourceSampler', 'load_resources']
@@ -0,0 +1,100 @@
+"""A bounded buffer batching metrics for the sinks."""
+
+import collections
+import threading
+
+class MetricsBuffer:
+    """The MetricsBuffer collects lines until a sink writes them in batches.
+
+    The buffer is bounded. When a sink is slower than the sampling (or unreachable),
+    the buffer fills up and rejects further samples. The :class:`.MetricsExporter` then
+    samples less often, until the sink caught up (backpressure).
+
+    Parameters
+    ----------
+    capacity : int
+        The maximum number of buffered lines.
+    batch_size : int
+        The maximum number of lines per write.
+    """
+
+    def __init__(self, capacity=100000, batch_size=5000):
+        #: The maximum number of buffered lines.
+        self.capacity = capacity
+        #: The maximum number of lines per write.
+        self.batch_size = batch_size
+        #: Whether the buffer has been closed (no further lines are accepted).
+        self.closed = False
+
+        self.__lines = collections.deque()
+        self.__dropped = 0
+        self.__condition = threading.Condition()
+
+    def __len__(self):
+        return len(self.__lines)
+
+    @property
+    def dropped(self):
+        """int: The number of rejected (or otherwise lost) lines."""
+        with self.__condition:
+            return self.__dropped
+
+    def drop(self, count):
+        """Count lines, which have been lost after they were taken (e.g. the sink failed).
+
+        Parameters
+        ----------
+        count : int
+            The number of lines.
+        """
+        with self.__condition:
+            self.__dropped += count
+
+    def offer(self, lines):
+        """Add the lines of a sample, if there is enough space.
+
+        Parameters
+        ----------
+        lines : list of str
+            The lines.
+
+        Returns
+        -------
+        bool
+            Whether the lines have been added. Otherwise, they are dropped.
+        """
+        with self.__condition:
+            if self.closed or len(self.__lines) + len(lines) > self.capacity:
+                self.__dropped += len(lines)
+                return False
+            self.__lines.extend(lines)
+            if len(self.__lines) >= self.batch_size:
+                self.__condition.notify()
+            return True
+
+    def take(self, timeout):
+        """Remove a batch of lines.
+
+        Waits until a complete batch is available, the timeout elapsed or the buffer is closed.
+
+        Parameters
+        ----------
+        timeout : float
+            The maximum time to wait in seconds.
+
+        Returns
+        -------
+        list of str
+            The lines (empty, if there are none).
+        """
+        with self.__condition:
+            if len(self.__lines) < self.batch_size and not self.closed:
+                self.__condition.wait(timeout)
+            count = min(self.batch_size, len(self.__lines))
+            return [self.__lines.popleft() for _ in range(count)]
+
+    def close(self):
+        """Stop accepting lines and wake up the waiting sink."""
+        with self.__condition:
+            self.closed = True
+            self.__condition.notify_all()
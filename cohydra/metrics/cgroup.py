@@ -0,0 +1,82 @@
+"""Resource usage of containers from their control groups."""
+
+import os
+
+#: The mount point of the control groups.
+CGROUP_ROOT = '/sys/fs/cgroup'
+
+class Cgroup:
+    """The control group of a process (e.g. a container's init process).
+
+    Both the unified hierarchy (cgroup v2) and the legacy :code:`cpuacct` and :code:`memory`
+    controllers (cgroup v1) are supported.
+
+    Parameters
+    ----------
+    pid : int
+        The ID of the process.
+    """
+
+    def __init__(self, pid):
+        #: The ID of the process.
+        self.pid = pid
+        #: Whether the control group is in the unified hierarchy.
+        self.unified = False
+        #: The path of the CPU usage (:code:`cpu.stat` or :code:`cpuacct.usage`).
+        self.cpu_path = None
+        #: The path of the memory usage (:code:`memory.current` or :code:`memory.usage_in_bytes`).
+        self.memory_path = None
+
+        unified_path = None
+        with open(f'/proc/{pid}/cgroup') as file:
+            for entry in file:
+                _, controllers, path = entry.rstrip('\n').split(':', 2)
+                controllers = controllers.split(',')
+                if controllers == ['']:
+                    unified_path = CGROUP_ROOT + path
+                elif 'cpuacct' in controllers:
+                    self.cpu_path = os.path.join(CGROUP_ROOT, 'cpuacct' + path, 'cpuacct.usage')
+                    if not os.path.exists(self.cpu_path):
+                        # cpu and cpuacct are often mounted together.
+                        self.cpu_path = os.path.join(CGROUP_ROOT, 'cpu,cpuacct' + path, 'cpuacct.usage')
+                elif 'memory' in controllers:
+                    self.memory_path = os.path.join(CGROUP_ROOT, 'memory' + path, 'memory.usage_in_bytes')
+
+        # In the hybrid mode, the legacy controllers are used.
+        if self.cpu_path is None and unified_path is not None:
+            self.unified = True
+            self.cpu_path = os.path.join(unified_path, 'cpu.stat')
+            self.memory_path = os.path.join(unified_path, 'memory.current')
+
+    def cpu_usage(self):
+        """Return the CPU time used by the control group in seconds (:code:`None` if unknown)."""
+        if self.cpu_path is None:
+            return None
+        with open(self.cpu_path) as file:
+            return self.parse_cpu(file.read())[0] / 1e6
+
+    def memory_usage(self):
+        """Return the memory used by the control group in bytes (:code:`None` if unknown)."""
+        if self.memory_path is None:
+            return None
+        with open(self.memory_path) as file:
+            return int(file.read())
+
+    def parse_cpu(self, text):
+        """Parse the content of the CPU usage file.
+
+        Parameters
+        ----------
+        text : str
+            The content of :attr:`cpu_path`.
+
+        Returns
+        -------
+        tuple of int
+            The total, user and system CPU time in microseconds.
+            cgroup v1 only reports the total time (user and system are :code:`0`).
+        """
+        if not self.unified:
+            return int(text) // 1000, 0, 0
+        values = dict(line.split() for line in text.splitlines())
+        return int(values['usage_usec']), int(values['user_usec']), int(values['system_usec'])
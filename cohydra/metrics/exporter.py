@@ -0,0 +1,190 @@
+"""The exporter sampling the metrics and writing them to a sink."""
+
+import logging
+import os
+import threading
+import time
+
+from .buffer import MetricsBuffer
+from .line_protocol import format_line
+from .sinks import FileSink, InfluxDBSink
+from .sources import ContainerResources, InterfaceCounters, MobilityInputSteps, NodePositions, RealtimeLag
+
+logger = logging.getLogger(__name__)
+
+#: The file name of the metrics in the log directory, if there is no InfluxDB.
+METRICS_FILE_NAME = 'metrics.lp'
+
+class MetricsExporter:
+    """The MetricsExporter writes live metrics of a simulation, e.g. to InfluxDB.
+
+    By default, the following metrics are sampled:
+
+    * :code:`cohydra_interface`: the counters of the interfaces' tap devices (see :class:`.InterfaceCounters`)
+    * :code:`cohydra_position`: the positions of the nodes
+    * :code:`cohydra_realtime`: the lag of the simulation behind the wall clock
+      (not for partitioned simulations, their lag is only written to the log directory per partition)
+    * :code:`cohydra_container`: the CPU and memory usage of the containers
+    * :code:`cohydra_mobility`: the step times of the mobility inputs (see :class:`.MobilityInputSteps`)
+    * :code:`cohydra_metrics`: the state of the exporter itself (buffered and dropped lines)
+
+    Sampling and writing happen in two threads of their own. Neither of them calls into ns-3,
+    so the simulation thread is not delayed. The samples are batched in a :class:`.MetricsBuffer`.
+
+    If no sink is given, the metrics are written to the InfluxDB container (:code:`ns3-influxdb`),
+    if it is running, or to :code:`metrics.lp` in the log directory otherwise.
+
+    Example
+    -------
+    .. code-block:: python
+
+        scenario = Scenario(metrics=MetricsExporter(interval=0.5))
+
+    Parameters
+    ----------
+    interval : float
+        The sampling interval in seconds.
+    sink : :class:`.Sink`
+        The destination of the metrics.
+    sources : list of :class:`.Source`
+        The sources to sample. By default, all nodes of the simulation are sampled.
+    capacity : int
+        The maximum number of buffered lines.
+    batch_size : int
+        The maximum number of lines per write.
+    flush_interval : float
+        The maximum time in seconds lines are buffered before being written.
+    """
+
+    #: The maximum factor the sampling interval is stretched by, when the buffer is full.
+    MAX_BACKOFF = 8
+
+    def __init__(self, interval=1.0, sink=None, sources=None, capacity=100000, batch_size=5000, flush_interval=1.0):
+        #: The sampling interval in seconds.
+        self.interval = interval
+        #: The destination of the metrics.
+        self.sink = sink
+        #: The sampled sources.
+        self.sources = sources
+        #: The buffer between sampling and writing.
+        self.buffer = MetricsBuffer(capacity=capacity, batch_size=batch_size)
+        #: The maximum time in seconds lines are buffered.
+        self.flush_interval = flush_interval
+
+        self.__stopped = threading.Event()
+        self.__threads = []
+
+    def __default_sources(self, simulation):
+        distribution = simulation.scenario.distribution
+        nodes = [node for node in simulation.scenario.nodes() if distribution is None or distribution.is_local(node)]
+        interfaces = [interface for channel in simulation.scenario.channels() for interface in channel.interfaces]
+        sources = [
+            InterfaceCounters(interfaces),
+            NodePositions(nodes),
+            ContainerResources(nodes),
+            MobilityInputSteps(simulation.scenario.mobility_inputs),
+        ]
+        if simulation.partitioner is None:
+            sources.append(RealtimeLag(simulation.realtime_monitor))
+        else:
+            # The coordinator does not run a simulator, the partitions measure the lag themselves.
+            logger.info('The realtime lag of partitioned simulations is not exported, '
+                        'see realtime-lag-partition-*.csv in the log directory.')
+        return sources
+
+    @staticmethod
+    def __default_sink(simulation):
+        influxdb = simulation.hosts.get('influxdb') if simulation.hosts is not None else None
+        if influxdb:
+            return InfluxDBSink(f'http://{influxdb[0]}:8086')
+        return FileSink(os.path.join(simulation.log_directory, METRICS_FILE_NAME))
+
+    def start(self, simulation=None):
+        """Start sampling and writing.
+
+        Parameters
+        ----------
+        simulation : :class:`.Simulation`
+            The simulation to choose the default sources and sink for.
+        """
+        if self.sources is None:
+            self.sources = self.__default_sources(simulation)
+        if self.sink is None:
+            self.sink = self.__default_sink(simulation)
+        logger.info('Exporting metrics every %.3fs to %s', self.interval, self.sink)
+
+        self.__stopped.clear()
+        self.__threads = [
+            threading.Thread(target=self.__sample, name='metrics-sampler', daemon=True),
+            threading.Thread(target=self.__write, name='metrics-writer', daemon=True),
+        ]
+        for thread in self.__threads:
+            thread.start()
+
+    def stop(self):
+        """Stop sampling and write the buffered metrics."""
+        self.__stopped.set()
+        if not self.__threads:
+            return
+        self.__threads[0].join()
+        self.buffer.close()
+        self.__threads[1].join()
+        self.__threads = []
+        self.sink.close()
+        if self.buffer.dropped:
+            logger.warning('%d metrics have been dropped, because the sink was too slow.', self.buffer.dropped)
+
+    def __sample(self):
+        interval = self.interval
+        due = time.monotonic()
+        while not self.__stopped.wait(max(0, due - time.monotonic())):
+            timestamp = time.time_ns()
+            lines = []
+            for source in self.sources:
+                try:
+                    lines.extend(source.sample(timestamp))
+                except Exception: # pylint: disable=broad-except
+                    logger.exception('Sampling %s failed', type(source).__name__)
+                # Release the GIL, so the simulation thread does not wait for the whole sample.
+                time.sleep(0)
+            lines.append(format_line('cohydra_metrics', {}, {
+                'buffered': len(self.buffer),
+                'dropped': self.buffer.dropped,
+                'interval': interval,
+            }, timestamp))
+
+            if self.buffer.offer(lines):
+                interval = self.interval
+            elif interval < self.interval * self.MAX_BACKOFF:
+                interval *= 2
+                logger.warning('The metrics buffer is full, sampling every %.3fs', interval)
+            # Do not try to catch up with missed samples.
+            due = max(due + interval, time.monotonic())
+
+    def __write(self):
+        available = True
+        while True:
+            batch = self.buffer.take(self.flush_interval)
+            if not batch:
+                if self.buffer.closed:
+                    break
+                continue
+            if not available:
+                self.buffer.drop(len(batch))
+                continue
+            delay = 0.5
+            while True:
+                try:
+                    self.sink.write(batch)
+                    break
+                except Exception as err: # pylint: disable=broad-except
+                    if self.__stopped.is_set():
+                        # Do not delay the teardown with the remaining batches.
+                        logger.warning('Dropping the buffered metrics: %s', err)
+                        self.buffer.drop(len(batch))
+                        available = False
+                        break
+                    logger.warning('Writing metrics to %s failed (retrying in %.1fs): %s', self.sink, delay, err)
+                    # The batch is kept, so the buffer fills up while the sink is unavailable.
+                    self.__stopped.wait(delay)
+                    delay = min(delay * 2, 30)
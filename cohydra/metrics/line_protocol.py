@@ -0,0 +1,42 @@
+"""Formatting of InfluxDB's line protocol."""
+
+def _escape(value, characters):
+    value = str(value).replace('\\', '\\\\')
+    for character in characters:
+        value = value.replace(character, '\\' + character)
+    return value
+
+def _field_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return f'{value}i'
+    if isinstance(value, float):
+        return repr(value)
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def format_line(measurement, tags, fields, timestamp):
+    """Format a point in InfluxDB's line protocol.
+
+    Parameters
+    ----------
+    measurement : str
+        The name of the measurement.
+    tags : dict
+        The tags of the point.
+    fields : dict
+        The fields of the point (integers, floats, booleans or strings). :code:`None` values are left out.
+    timestamp : int
+        The time of the point in nanoseconds since the epoch.
+
+    Returns
+    -------
+    str
+        The line (without line break).
+    """
+    line = _escape(measurement, ', ')
+    for key in sorted(tags):
+        line += f',{_escape(key, ",= ")}={_escape(tags[key], ",= ")}'
+    line += ' ' + ','.join(f'{_escape(key, ",= ")}={_field_value(value)}' for key, value in fields.items()
+                          if value is not None)
+    return f'{line} {timestamp}'
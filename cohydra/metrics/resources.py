@@ -0,0 +1,247 @@
+"""A high-resolution sampler of the containers' resource usage."""
+
+import csv
+import json
+import logging
+import os
+import struct
+import threading
+import time
+
+from .cgroup import Cgroup
+
+logger = logging.getLogger(__name__)
+
+#: The magic bytes at the start of a resource time series.
+MAGIC = b'CHYRES01'
+#: The file name of the time series in the log directory.
+RESOURCES_FILE_NAME = 'resources.bin'
+
+#: The fields of a sample: name, struct format and NumPy type.
+FIELDS = (
+    ('timestamp', 'q', '<i8'),
+    ('node', 'H', '<u2'),
+    ('cpu_usec', 'Q', '<u8'),
+    ('cpu_user_usec', 'Q', '<u8'),
+    ('cpu_system_usec', 'Q', '<u8'),
+    ('memory', 'Q', '<u8'),
+    ('rx_bytes', 'Q', '<u8'),
+    ('tx_bytes', 'Q', '<u8'),
+    ('rx_packets', 'Q', '<u8'),
+    ('tx_packets', 'Q', '<u8'),
+)
+
+_RECORD = struct.Struct('<' + ''.join(field[1] for field in FIELDS))
+
+class _NodeFiles:
+    """The open counter files of a container, which are read again with :func:`os.pread`."""
+
+    def __init__(self, pid):
+        self.cgroup = Cgroup(pid)
+        self.cpu = os.open(self.cgroup.cpu_path, os.O_RDONLY)
+        try:
+            self.memory = os.open(self.cgroup.memory_path, os.O_RDONLY)
+            try:
+                # The network namespace of the container's process
+                self.net = os.open(f'/proc/{pid}/net/dev', os.O_RDONLY)
+            except OSError:
+                os.close(self.memory)
+                raise
+        except (OSError, TypeError):
+            os.close(self.cpu)
+            raise
+
+    def read(self):
+        cpu, user, system = self.cgroup.parse_cpu(os.pread(self.cpu, 4096, 0).decode())
+        memory = int(os.pread(self.memory, 64, 0))
+        rx_bytes = tx_bytes = rx_packets = tx_packets = 0
+        for line in os.pread(self.net, 65536, 0).decode().splitlines()[2:]:
+            device, counters = line.split(':', 1)
+            if device.strip() == 'lo':
+                continue
+            counters = counters.split()
+            rx_bytes += int(counters[0])
+            rx_packets += int(counters[1])
+            tx_bytes += int(counters[8])
+            tx_packets += int(counters[9])
+        return cpu, user, system, memory, rx_bytes, tx_bytes, rx_packets, tx_packets
+
+    def close(self):
+        for descriptor in (self.cpu, self.memory, self.net):
+            os.close(descriptor)
+
+class ResourceSampler:
+    """The ResourceSampler records the resource usage of all containers in a binary time series.
+
+    A single thread samples the CPU time and memory usage from the containers' control groups
+    and the network counters from :code:`/proc/<container_pid>/net/dev` (summed over all interfaces
+    but the loopback). The files are opened once and read again for every sample, which is
+    much cheaper than Docker's stats API.
+
+    The samples are written to :code:`resources.bin` in the log directory: the magic bytes,
+    the length of a JSON header (4 bytes, little endian), the header with the node names
+    and fixed-size records (see :data:`FIELDS`). Use :func:`load_resources` to read it.
+
+    Parameters
+    ----------
+    nodes : iterable of :class:`.Node`
+        The nodes to sample. Nodes without a running container are ignored.
+    interval : float
+        The sampling interval in seconds.
+    """
+
+    def __init__(self, nodes, interval=0.1):
+        #: The sampled nodes.
+        self.nodes = [node for node in nodes if getattr(node, 'container_pid', None) is not None]
+        #: The sampling interval in seconds.
+        self.interval = interval
+        #: The path of the time series.
+        self.path = None
+        #: The number of samples (of all nodes).
+        self.samples = 0
+        #: The number of sampling rounds.
+        self.rounds = 0
+        #: The number of sampling rounds, which started too late.
+        self.overruns = 0
+        #: The total time spent sampling in seconds.
+        self.sampling_time = 0
+
+        self.__first = {}
+        self.__last = {}
+        self.__peak_memory = {}
+        self.__files = {}
+        self.__stopped = threading.Event()
+        self.__thread = None
+        self.__file = None
+
+    def start(self, directory):
+        """Start sampling.
+
+        Parameters
+        ----------
+        directory : str
+            The directory to write the time series to.
+        """
+        for index, node in enumerate(self.nodes):
+            try:
+                self.__files[index] = _NodeFiles(node.container_pid)
+            except (OSError, TypeError) as err:
+                # TypeError: the control group has no CPU or memory accounting.
+                logger.warning('Cannot sample the resources of %s: %s', node.name, err)
+
+        self.path = os.path.join(directory, RESOURCES_FILE_NAME)
+        header = json.dumps({
+            'nodes': [node.name for node in self.nodes],
+            'interval': self.interval,
+            'fields': [name for name, _, _ in FIELDS],
+        }).encode()
+        self.__file = open(self.path, 'wb', buffering=1 << 16)
+        self.__file.write(MAGIC + struct.pack('<I', len(header)) + header)
+
+        logger.info('Sampling the resources of %d containers every %.3fs', len(self.__files), self.interval)
+        self.__stopped.clear()
+        self.__thread = threading.Thread(target=self.__run, name='resource-sampler', daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """Stop sampling and close the time series."""
+        if self.__thread is None:
+            return
+        self.__stopped.set()
+        self.__thread.join()
+        self.__thread = None
+        self.__file.close()
+        for files in self.__files.values():
+            files.close()
+        self.__files = {}
+
+    def __run(self):
+        due = time.monotonic()
+        while not self.__stopped.wait(max(0, due - time.monotonic())):
+            started = time.monotonic()
+            timestamp = time.time_ns()
+            for index, files in list(self.__files.items()):
+                try:
+                    values = files.read()
+                except (OSError, ValueError, KeyError):
+                    # The container has been stopped.
+                    files.close()
+                    del self.__files[index]
+                    continue
+                self.__file.write(_RECORD.pack(timestamp, index, *values))
+                self.__last[index] = (timestamp, values)
+                self.__first.setdefault(index, (timestamp, values))
+                self.__peak_memory[index] = max(self.__peak_memory.get(index, 0), values[3])
+                self.samples += 1
+            finished = time.monotonic()
+            self.sampling_time += finished - started
+            self.rounds += 1
+
+            due += self.interval
+            if due < finished:
+                # Skip the missed rounds instead of sampling in a burst.
+                missed = int((finished - due) // self.interval) + 1
+                self.overruns += missed
+                due += missed * self.interval
+
+    def report(self, directory):
+        """Log a summary and write it to :code:`resources-summary.csv`.
+
+        Parameters
+        ----------
+        directory : str
+            The directory to write the summary to.
+        """
+        rows = []
+        for index, node in enumerate(self.nodes):
+            if index not in self.__first:
+                continue
+            (first_time, first), (last_time, last) = self.__first[index], self.__last[index]
+            duration = (last_time - first_time) / 1e9
+            rows.append([
+                node.name,
+                (last[0] - first[0]) / 1e6 / duration if duration > 0 else 0,
+                self.__peak_memory[index],
+                last[4] - first[4],
+                last[5] - first[5],
+            ])
+        if not rows:
+            return
+
+        with open(os.path.join(directory, 'resources-summary.csv'), 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['node', 'cpu_cores', 'peak_memory', 'rx_bytes', 'tx_bytes'])
+            writer.writerows(rows)
+
+        logger.info('Resource usage of %d containers (%d samples, %.3fms per round, %d overruns):', len(rows),
+                    self.samples, self.sampling_time / max(1, self.rounds) * 1e3, self.overruns)
+        for name, cores, memory, rx_bytes, tx_bytes in rows:
+            logger.info('  %-20s CPU %6.2f cores  memory %8.1f MiB  rx %10.1f MiB  tx %10.1f MiB', name, cores,
+                        memory / 2**20, rx_bytes / 2**20, tx_bytes / 2**20)
+
+def load_resources(path):
+    """Load a resource time series into a NumPy array.
+
+    Parameters
+    ----------
+    path : str
+        The path of the time series (or the log directory).
+
+    Returns
+    -------
+    tuple
+        The node names and a structured NumPy array of the samples. The :code:`node`
+        field is the position of the sample's node in the names.
+    """
+    import numpy # pylint: disable=import-outside-toplevel
+
+    if os.path.isdir(path):
+        path = os.path.join(path, RESOURCES_FILE_NAME)
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is no resource time series.')
+        length, = struct.unpack('<I', file.read(4))
+        header = json.loads(file.read(length).decode())
+    dtype = numpy.dtype([(name, numpy_type) for name, _, numpy_type in FIELDS])
+    samples = numpy.fromfile(path, dtype=dtype, offset=len(MAGIC) + 4 + length)
+    return header['nodes'], samples
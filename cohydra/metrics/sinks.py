@@ -0,0 +1,102 @@
+"""Destinations of the metrics."""
+
+import logging
+import urllib.error
+import urllib.parse
+import urllib.request
+
+logger = logging.getLogger(__name__)
+
+class Sink:
+    """A destination of metrics in InfluxDB's line protocol."""
+
+    def write(self, lines):
+        """Write a batch of lines.
+
+        Raises an exception, if the lines should be written again later.
+
+        Parameters
+        ----------
+        lines : list of str
+            The lines.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Release the sink's resources."""
+
+class InfluxDBSink(Sink):
+    """Writes metrics to an InfluxDB (1.x) via HTTP.
+
+    The example InfluxDB container (:code:`ns3-influxdb`) creates the database :code:`metrics`.
+
+    Parameters
+    ----------
+    url : str
+        The URL of the InfluxDB (e.g. :code:`http://172.17.0.2:8086`).
+    database : str
+        The name of the database.
+    username : str
+        The user to authenticate as.
+    password : str
+        The password of the user.
+    timeout : float
+        The timeout of a write in seconds.
+    """
+
+    def __init__(self, url, database='metrics', username=None, password=None, timeout=5):
+        params = {'db': database, 'precision': 'ns'}
+        if username is not None:
+            params['u'] = username
+            params['p'] = password
+        #: The URL of the InfluxDB.
+        self.url = url
+        #: The timeout of a write in seconds.
+        self.timeout = timeout
+        self.__write_url = f'{url.rstrip("/")}/write?{urllib.parse.urlencode(params)}'
+
+    def write(self, lines):
+        request = urllib.request.Request(self.__write_url, data='\n'.join(lines).encode(), method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as err:
+            if not 400 <= err.code < 500:
+                raise
+            # The points are invalid, writing them again does not help.
+            logger.error('InfluxDB rejected %d points: %s', len(lines), err.read().decode(errors='replace'))
+
+    def __str__(self):
+        return f'InfluxDB at {self.url}'
+
+class FileSink(Sink):
+    """Appends metrics to a file in InfluxDB's line protocol.
+
+    The file can be imported later, e.g. with :code:`influx -import`
+    (after adding the :code:`# DML` header) or Telegraf's file input.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+    """
+
+    def __init__(self, path):
+        #: The path of the file.
+        self.path = path
+        self.__file = None
+
+    def write(self, lines):
+        if self.__file is None:
+            self.__file = open(self.path, 'a')
+        self.__file.write('\n'.join(lines))
+        self.__file.write('\n')
+        self.__file.flush()
+
+    def close(self):
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __str__(self):
+        return f'file {self.path}'
@@ -0,0 +1,188 @@
+"""Sources of metrics, which are sampled outside of the ns-3 thread."""
+
+from .cgroup import Cgroup
+from .line_protocol import format_line
+
+class Source:
+    """A source of metrics.
+
+    Sources are sampled by the :class:`.MetricsExporter` in its own thread.
+    They must not call into ns-3, so the simulation is not delayed.
+    """
+
+    def sample(self, timestamp):
+        """Sample the metrics.
+
+        Parameters
+        ----------
+        timestamp : int
+            The time of the sample in nanoseconds since the epoch.
+
+        Returns
+        -------
+        list of str
+            The points in InfluxDB's line protocol.
+        """
+        raise NotImplementedError
+
+class InterfaceCounters(Source):
+    """The packet and byte counters of the interfaces' tap devices (or VETH pairs) on the host.
+
+    The kernel counts every frame passing ns-3's TapBridge, so the counters are read
+    from :code:`/proc/net/dev` (once per sample for all devices) instead of tracing
+    the ns-3 devices in the simulation thread.
+
+    Parameters
+    ----------
+    interfaces : iterable of :class:`.Interface`
+        The interfaces.
+    """
+
+    #: The sampled counters and their columns in :code:`/proc/net/dev`.
+    COUNTERS = (('rx_bytes', 0), ('rx_packets', 1), ('rx_dropped', 3),
+                ('tx_bytes', 8), ('tx_packets', 9), ('tx_dropped', 11))
+
+    def __init__(self, interfaces):
+        #: The interfaces.
+        self.interfaces = list(interfaces)
+
+    def sample(self, timestamp):
+        with open('/proc/net/dev') as file:
+            # Skip the two header lines.
+            devices = {}
+            for line in file.read().splitlines()[2:]:
+                device, counters = line.split(':', 1)
+                devices[device.strip()] = counters
+        lines = []
+        for interface in self.interfaces:
+            device = interface.host_device
+            # The device may not have been created yet or may already be removed.
+            counters = devices.get(device)
+            if counters is None:
+                continue
+            counters = counters.split()
+            fields = {counter: int(counters[column]) for counter, column in self.COUNTERS}
+            tags = {'node': interface.node.name, 'interface': interface.ifname, 'device': device}
+            lines.append(format_line('cohydra_interface', tags, fields, timestamp))
+        return lines
+
+class NodePositions(Source):
+    """The positions of the nodes.
+
+    Parameters
+    ----------
+    nodes : iterable of :class:`.Node`
+        The nodes.
+    """
+
+    def __init__(self, nodes):
+        #: The nodes.
+        self.nodes = list(nodes)
+
+    def sample(self, timestamp):
+        lines = []
+        for node in self.nodes:
+            x, y, z = node.position # pylint: disable=invalid-name
+            lines.append(format_line('cohydra_position', {'node': node.name},
+                                     {'x': float(x), 'y': float(y), 'z': float(z)}, timestamp))
+        return lines
+
+class RealtimeLag(Source):
+    """The lag of the simulation behind the wall clock measured by the :class:`.RealtimeMonitor`.
+
+    Parameters
+    ----------
+    monitor : :class:`.RealtimeMonitor`
+        The monitor.
+    """
+
+    def __init__(self, monitor):
+        #: The monitor.
+        self.monitor = monitor
+        self.__last = None
+
+    def sample(self, timestamp):
+        samples = self.monitor.samples
+        if not samples or samples[-1] is self.__last:
+            return []
+        self.__last = samples[-1]
+        simulation_time, _, lag, rate = self.__last
+        fields = {'lag': lag, 'simulation_time': simulation_time, 'clock_rate': float(rate)}
+        return [format_line('cohydra_realtime', {}, fields, timestamp)]
+
+class ContainerResources(Source):
+    """The CPU and memory usage of the containers (:class:`.DockerNode` and :class:`.LXDNode`).
+
+    Parameters
+    ----------
+    nodes : iterable of :class:`.Node`
+        The nodes. Nodes without a container are ignored.
+    """
+
+    def __init__(self, nodes):
+        #: The nodes with containers.
+        self.nodes = [node for node in nodes if hasattr(node, 'container_pid')]
+        self.__cgroups = {}
+
+    def __cgroup(self, pid):
+        cgroup = self.__cgroups.get(pid)
+        if cgroup is None:
+            cgroup = self.__cgroups[pid] = Cgroup(pid)
+        return cgroup
+
+    def sample(self, timestamp):
+        lines = []
+        for node in self.nodes:
+            pid = node.container_pid
+            if pid is None:
+                continue
+            try:
+                cgroup = self.__cgroup(pid)
+                fields = {'cpu': cgroup.cpu_usage(), 'memory': cgroup.memory_usage()}
+            except FileNotFoundError:
+                # The container is not running (anymore).
+                self.__cgroups.pop(pid, None)
+                continue
+            lines.append(format_line('cohydra_container', {'node': node.name}, fields, timestamp))
+        return lines
+
+class MobilityInputSteps(Source):
+    """The step times of the mobility inputs (e.g. :class:`.SUMOMobilityInput`).
+
+    Each sample reports the number of steps and the last and maximum step time since the previous sample.
+
+    Parameters
+    ----------
+    mobility_inputs : iterable of :class:`.MobilityInput`
+        The mobility inputs. Inputs without step times are ignored.
+    """
+
+    def __init__(self, mobility_inputs):
+        #: The mobility inputs with step times.
+        self.mobility_inputs = [mobility_input for mobility_input in mobility_inputs
+                                if hasattr(mobility_input, 'step_times')]
+        self.__counts = {}
+
+    def sample(self, timestamp):
+        lines = []
+        for mobility_input in self.mobility_inputs:
+            step_times = mobility_input.step_times
+            count = len(step_times)
+            previous = self.__counts.get(mobility_input, 0)
+            if previous > count:
+                # The input has been prepared again.
+                previous = 0
+            if count == previous:
+                continue
+            self.__counts[mobility_input] = count
+            recent = step_times[previous:count]
+            fields = {
+                'steps': count,
+                'step_time': recent[-1],
+                'step_time_max': max(recent),
+                'late_steps': getattr(mobility_input, 'late_steps', None),
+                'skipped_steps': getattr(mobility_input, 'skipped_steps', None),
+            }
+            tags = {'input': getattr(mobility_input, 'label', mobility_input.name)}
+            lines.append(format_line('cohydra_mobility', tags, fields, timestamp))
+        return lines
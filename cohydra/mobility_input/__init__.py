@@ -1,2 +1,11 @@
 """MobilityInputs describe how external simulation interfaces move nodes."""
-from .sumo import SUMOMobilityInput
+from ..util import lazy_attributes
+
+# SUMO's TraCI is loaded when the mobility input is used.
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'SUMOMobilityInput': '.sumo',
+    'Trace': '.trace',
+    'TraceMobilityInput': '.trace',
+})
+
+__all__ = ['SUMOMobilityInput', 'Trace', 'TraceMobilityInput']
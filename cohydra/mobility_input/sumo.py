@@ -1,5 +1,8 @@
 """SUMO co-simulation."""
 
+import array
+import csv
+import itertools
 import logging
 import os
 import sys
@@ -12,11 +15,17 @@ if 'SUMO_HOME' in os.environ:
     os.environ['PATH'] += os.pathsep + os.path.join(SUMO_HOME, 'bin')
 
 import traci
+from traci import constants
+from ns import core
 
+from ..node.base import set_positions
 from .mobility_input import MobilityInput
 
 logger = logging.getLogger(__name__)
 
+# Guards TraCI's global table of connections (by label).
+_traci_lock = threading.Lock()
+
 class SUMOMobilityInput(MobilityInput):
     """SUMOMobilityInput is an interface to the SUMO simulation environment.
 
@@ -32,6 +41,20 @@ class SUMOMobilityInput(MobilityInput):
         For instructions on how to use cohydra without Docker,
         please refer to :ref:`Local Installation Without Docker` and :ref:`Install SUMO On Simulation Host`.
 
+    The positions of the mapped vehicles and persons are retrieved via TraCI variable subscriptions.
+    Hence, they arrive with the response of :code:`simulationStep` and a step takes a single
+    round trip to SUMO, regardless of the number of mapped nodes. Vehicles are subscribed when they
+    depart, nodes keep their last position after their vehicle arrived. Junctions do not move,
+    their positions are only retrieved once.
+
+    In the ``deadline`` and ``simulator`` step modes, the next step is requested from SUMO as soon as the
+    positions of the current step have been applied. Thus, the positions are ready when the step is due.
+
+    Every input uses a TraCI connection of its own (see ``label``), so several SUMO instances
+    (e.g. an urban and a highway scenario) can be stepped concurrently by their own threads.
+    The duration of each step is recorded in :attr:`step_times`, summarized at the end and
+    written to :code:`<label>-steps.csv` in the log directory.
+
     Parameters
     ----------
     name : str
@@ -49,12 +72,44 @@ class SUMOMobilityInput(MobilityInput):
     steplength : float
         The length of each simulation step in seconds (default: 1).
         It only has effect in the local mode.
+    step_mode : str
+        How the steps are timed:
+
+        * ``deadline``: A thread steps at absolute deadlines (start time plus a multiple of the step length),
+          so the time spent stepping does not accumulate as drift. The deadlines follow changes of
+          the clock rate of a :class:`.TimeDilation`.
+        * ``simulator``: The steps are triggered by events scheduled in ns-3 and thus locked to the
+          simulation clock (including the lag of the realtime scheduler).
+          This is not supported for partitioned simulations, they fall back to ``deadline``.
+        * ``sleep``: A thread sleeps for a step length after each step (the drifting legacy behavior).
+    late_policy : str
+        What happens if SUMO could not compute a step in time:
+
+        * ``catch-up``: The missed steps are applied one after another, as fast as possible.
+          In the ``simulator`` mode, the simulation waits for SUMO.
+        * ``skip``: SUMO jumps over the missed steps with a single :code:`simulationStep` and
+          their positions are not applied.
+    label : str
+        The label of the TraCI connection (default: a unique label).
     """
 
+    #: The object types, which can be mapped to nodes.
+    OBJECT_TYPES = ('vehicle', 'person', 'junction')
+    #: The supported step modes.
+    STEP_MODES = ('deadline', 'simulator', 'sleep')
+    #: The supported policies for late steps.
+    LATE_POLICIES = ('catch-up', 'skip')
+
+    __labels = itertools.count()
+
     def __init__(self, name="SUMO External Simulation", steps=1000,
                  sumo_host='localhost', sumo_port=8813, sumo_cmd="sumo",
-                 config_path=None, step_length=1):
+                 config_path=None, step_length=1, step_mode='deadline', late_policy='catch-up', label=None):
         super().__init__(name)
+        if step_mode not in self.STEP_MODES:
+            raise ValueError(f'Unknown step mode {step_mode}')
+        if late_policy not in self.LATE_POLICIES:
+            raise ValueError(f'Unknown late policy {late_policy}')
         #: The host on which the SUMO simulation is running.
         #:
         #: When running on a devcontainer, this is probably ``localhost``.
@@ -71,58 +126,326 @@ class SUMOMobilityInput(MobilityInput):
         self.steps = steps
         #: The length of every simulation step
         self.step_length = step_length
+        #: How the steps are timed.
+        self.step_mode = step_mode
+        #: What happens to late steps.
+        self.late_policy = late_policy
         #: The number of steps to simulate in SUMO.
         self.step_counter = 0
+        #: The number of steps, which were not ready in time.
+        self.late_steps = 0
+        #: The number of steps, which were skipped.
+        self.skipped_steps = 0
+        #: The time dilation of the simulation (if any).
+        self.time_dilation = None
+        #: The label of the TraCI connection.
+        self.label = label if label is not None else f'sumo-{next(self.__labels)}'
+        #: The TraCI connection of this input.
+        self.connection = None
+        #: The wall clock durations of the steps in seconds
+        #: (the TraCI round trip and the processing of the results).
+        self.step_times = array.array('d')
+
+        # The subscribed nodes and the nodes waiting for their objects to appear in SUMO
+        # (by object type and SUMO ID).
+        self.__subscribed = {'vehicle': {}, 'person': {}}
+        self.__pending = {'vehicle': {}, 'person': {}}
+        self.__subscribed_all = False
+        self.__step_length = step_length
+        self.__simulation = None
+        self.__stopped = threading.Event()
+        # The prefetching in the simulator mode.
+        self.__requested = threading.Event()
+        self.__ready = threading.Event()
+        self.__request_steps = 1
+        self.__prefetched = None
+        self.__missed = 0
 
     def prepare(self, simulation):
         """Connect to SUMO server."""
         logger.info('Starting SUMO for simulation "%s".', self.name)
-        if self.config_path is None:
-            traci.init(host=self.sumo_host, port=self.sumo_port)
-        else:
-            traci.start([self.sumo_cmd, "--step-length", str(self.step_length), '-c', self.config_path])
+        with _traci_lock:
+            if self.config_path is None:
+                traci.init(host=self.sumo_host, port=self.sumo_port, label=self.label)
+            else:
+                traci.start([self.sumo_cmd, "--step-length", str(self.step_length), '-c', self.config_path],
+                            label=self.label)
+            self.connection = traci.getConnection(self.label)
+        self.step_times = array.array('d')
         self.step_counter = 0
+        self.time_dilation = simulation.time_dilation
+        self.__simulation = simulation
+        self.__subscribed_all = False
+        self.__stopped.clear()
 
     def start(self):
         """Start a thread stepping through the sumo simulation."""
-        logger.info('Starting SUMO stepping for %s.', self.name)
-        def run_sumo():
-            try:
-                while self.step_counter < self.steps:
-                    traci.simulationStep()
+        step_mode = self.step_mode
+        if step_mode == 'simulator' and getattr(self.__simulation, 'partitioner', None) is not None:
+            logger.warning('%s cannot be stepped by a partitioned simulation, using deadlines instead.', self.name)
+            step_mode = 'deadline'
+        logger.info('Starting SUMO stepping for %s (%s).', self.name, step_mode)
 
-                    # Update positions:
-                    for node in self.node_mapping:
-                        x, y, z = self.__get_position_of_node(node)
-                        node.set_position(x, y, z)
+        self.__step_length = self.connection.simulation.getDeltaT()
+        sim_start = core.Simulator.Now().GetSeconds()
 
-                    self.step_counter = self.step_counter + 1
-                    time.sleep(traci.simulation.getDeltaT())
+        def run_sumo():
+            try:
+                if step_mode == 'deadline':
+                    self.__run_deadline(sim_start)
+                elif step_mode == 'simulator':
+                    self.__run_prefetch()
+                else:
+                    while self.step_counter < self.steps and not self.__stopped.is_set():
+                        self.step()
+                        time.sleep(self.__wall_step_length())
             except traci.exceptions.FatalTraCIError:
                 logger.warning('Something went wrong with SUMO for %s. Maybe the connection was closed.', self.name)
+            finally:
+                self.__stopped.set()
+                # Do not keep the simulation waiting for a step.
+                self.__ready.set()
+
+        if step_mode == 'simulator':
+            self.__request(1)
+            core.Simulator.Schedule(core.Seconds(self.__step_length), self.__step_event)
 
         thread = threading.Thread(target=run_sumo)
         thread.start()
 
+    def step(self):
+        """Advance SUMO by one step and move the mapped nodes accordingly."""
+        self.__apply(self.__advance())
+
+    def __wall_step_length(self):
+        """Return the wall clock duration of a step at the current clock rate."""
+        if self.time_dilation is None:
+            return self.__step_length
+        return self.time_dilation.wall_duration(self.__step_length)
+
+    def __run_deadline(self, sim_start):
+        """Apply each step at its deadline and compute the next one in the meantime.
+
+        The deadline is derived from the simulation time of the step at every step,
+        so a changed clock rate applies to the following steps.
+
+        Parameters
+        ----------
+        sim_start : float
+            The simulation time in seconds, when the stepping started.
+        """
+        wall_start = time.monotonic()
+        if self.time_dilation is not None:
+            # Anchor the dilated clock now, if the simulation has not done it yet.
+            self.time_dilation.expected_wall_time(sim_start)
+        first_step = self.step_counter
+        updates = self.__advance()
+        while not self.__stopped.is_set():
+            sim_time = sim_start + (self.step_counter - first_step) * self.__step_length
+            if self.time_dilation is None:
+                due = wall_start + sim_time - sim_start
+            else:
+                due = self.time_dilation.expected_wall_time(sim_time)
+            delay = due - time.monotonic()
+            if delay > 0:
+                if self.__stopped.wait(delay):
+                    break
+            else:
+                # The skipped steps (if any) are added to the step counter by the next advance.
+                self.__late(-delay, self.__wall_step_length())
+            self.__apply(updates)
+            if self.step_counter >= self.steps:
+                break
+            updates = self.__advance(1 + self.__missed)
+            self.__missed = 0
+
+    def __run_prefetch(self):
+        """Compute the steps requested by :meth:`__step_event`."""
+        while True:
+            self.__requested.wait()
+            self.__requested.clear()
+            if self.__stopped.is_set():
+                break
+            self.__prefetched = self.__advance(self.__request_steps)
+            self.__ready.set()
+
+    def __request(self, steps):
+        self.__request_steps = steps
+        self.__ready.clear()
+        self.__requested.set()
+
+    def __step_event(self):
+        """Apply a step in the simulation thread."""
+        if self.__stopped.is_set():
+            return
+        if not self.__ready.is_set():
+            self.__late(self.__step_length, self.__step_length)
+            if self.late_policy == 'skip':
+                core.Simulator.Schedule(core.Seconds(self.__step_length), self.__step_event)
+                return
+            # The simulation waits for SUMO.
+            self.__ready.wait()
+            if self.__stopped.is_set():
+                return
+
+        updates = self.__prefetched
+        if self.step_counter < self.steps:
+            # SUMO computes the next step while the positions are applied.
+            self.__request(1 + self.__missed)
+            self.__missed = 0
+            core.Simulator.Schedule(core.Seconds(self.__step_length), self.__step_event)
+        self.__apply(updates)
+
+    def __late(self, lateness, step_length):
+        """Count a late step (and the steps to skip)."""
+        self.late_steps += 1
+        if self.late_policy == 'skip':
+            missed = int(lateness // step_length)
+            self.__missed += missed
+            self.skipped_steps += missed
+        if self.late_steps == 1 or self.late_steps % 100 == 0:
+            logger.warning('SUMO could not keep up with the simulation for %s (%d late steps).',
+                           self.name, self.late_steps)
+
+    def __advance(self, steps=1):
+        """Advance SUMO and return the new positions of the nodes.
+
+        Parameters
+        ----------
+        steps : int
+            The number of steps to advance (with a single :code:`simulationStep`).
+            It is limited to the remaining number of steps.
+
+        Returns
+        -------
+        dict
+            The positions by node.
+        """
+        steps = min(steps, self.steps - self.step_counter)
+        if steps <= 0:
+            return {}
+        started = time.monotonic()
+        updates = {}
+        if not self.__subscribed_all:
+            self.__subscribe(updates)
+        if steps == 1:
+            self.connection.simulationStep()
+        else:
+            time_now = self.connection.simulation.getSubscriptionResults()[constants.VAR_TIME]
+            self.connection.simulationStep(time_now + steps * self.__step_length)
+        self.step_counter = self.step_counter + steps
+
+        # Subscribe the objects, which appeared in this step.
+        if steps == 1:
+            results = self.connection.simulation.getSubscriptionResults()
+            departed = results.get(constants.VAR_DEPARTED_VEHICLES_IDS, ())
+            for sumo_id in departed:
+                if sumo_id in self.__pending['vehicle']:
+                    self.__subscribe_object('vehicle', sumo_id, updates)
+        elif self.__pending['vehicle']:
+            # Only the departures of the last skipped step are reported.
+            for sumo_id in set(self.connection.vehicle.getIDList()).intersection(self.__pending['vehicle']):
+                self.__subscribe_object('vehicle', sumo_id, updates)
+        if self.__pending['person']:
+            # There is no departure subscription for persons in all SUMO versions.
+            for sumo_id in set(self.connection.person.getIDList()).intersection(self.__pending['person']):
+                self.__subscribe_object('person', sumo_id, updates)
+
+        for obj_type, domain in (('vehicle', self.connection.vehicle), ('person', self.connection.person)):
+            subscribed = self.__subscribed[obj_type]
+            if not subscribed:
+                continue
+            for sumo_id, variables in domain.getAllSubscriptionResults().items():
+                position = variables[constants.VAR_POSITION3D]
+                for node in subscribed.get(sumo_id, ()):
+                    updates[node] = position
+        self.step_times.append(time.monotonic() - started)
+        return updates
+
+    @staticmethod
+    def __apply(updates):
+        if updates:
+            set_positions(list(updates), list(updates.values()))
+
+    def __subscribe(self, updates):
+        """Subscribe the positions of all mapped objects."""
+        for obj_type in self.__pending:
+            self.__subscribed[obj_type].clear()
+            self.__pending[obj_type].clear()
+        self.connection.simulation.subscribe([constants.VAR_DEPARTED_VEHICLES_IDS, constants.VAR_TIME])
+        self.__subscribed_all = True
+
+        for node, (sumo_id, obj_type) in self.node_mapping.items():
+            if obj_type == 'junction':
+                # Junction has no support for 3D positions
+                x, y = self.connection.junction.getPosition(sumo_id) # pylint: disable=invalid-name
+                updates[node] = (x, y, 0.0)
+            else:
+                self.__pending[obj_type].setdefault(sumo_id, []).append(node)
+
+        for obj_type in self.__pending:
+            for sumo_id in list(self.__pending[obj_type]):
+                try:
+                    self.__subscribe_object(obj_type, sumo_id, updates)
+                except traci.exceptions.TraCIException:
+                    # The object has not departed yet.
+                    pass
+
+    def __subscribe_object(self, obj_type, sumo_id, updates):
+        domain = self.connection.vehicle if obj_type == 'vehicle' else self.connection.person
+        domain.subscribe(sumo_id, [constants.VAR_POSITION3D])
+        nodes = self.__pending[obj_type].pop(sumo_id)
+        self.__subscribed[obj_type][sumo_id] = nodes
+        position = domain.getSubscriptionResults(sumo_id)[constants.VAR_POSITION3D]
+        for node in nodes:
+            updates[node] = position
+
     def add_node_to_mapping(self, node, sumo_vehicle_id, obj_type="vehicle"):
+        """Map a node to an object in SUMO.
+
+        Parameters
+        ----------
+        node : :class:`.Node`
+            The node to move.
+        sumo_vehicle_id : str
+            The ID of the object in SUMO.
+        obj_type : str
+            The type of the object: ``vehicle``, ``person`` or ``junction``.
+        """
+        if obj_type not in self.OBJECT_TYPES:
+            raise ValueError(f'Unknown type {obj_type}')
         self.node_mapping[node] = (sumo_vehicle_id, obj_type)
 
-    def __get_position_of_node(self, node):
-        if node not in self.node_mapping:
-            raise "Unknown node "+str(node.name)
-        if self.node_mapping[node][1] == "person":
-            return traci.person.getPosition3D(self.node_mapping[node][0])
-        if self.node_mapping[node][1] == "vehicle":
-            return traci.vehicle.getPosition3D(self.node_mapping[node][0])
-        if self.node_mapping[node][1] == "junction":
-            # Junction has no support for 3D positions
-            x, y = traci.junction.getPosition(self.node_mapping[node][0])
-            return x, y, 0.0
-        raise "Unknown type " + str(self.node_mapping[node][1])
+    def __write_step_times(self):
+        """Log a summary of the step times and write them to the log directory."""
+        if not self.step_times:
+            return
+        step_times = sorted(self.step_times)
+        logger.info('%s: %d steps, step time p50 %.2fms, p99 %.2fms, max %.2fms, %d late, %d skipped.',
+                    self.name, len(step_times), step_times[len(step_times) // 2] * 1e3,
+                    step_times[int(len(step_times) * 0.99)] * 1e3, step_times[-1] * 1e3,
+                    self.late_steps, self.skipped_steps)
+        log_directory = getattr(self.__simulation, 'log_directory', None)
+        if log_directory is None:
+            return
+        with open(os.path.join(log_directory, f'{self.label}-steps.csv'), 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['step', 'step_time'])
+            writer.writerows((step, f'{step_time:.6f}') for step, step_time in enumerate(self.step_times))
 
     def destroy(self):
         """Stop SUMO."""
         logger.info('Trying to close SUMO for %s.', self.name)
         # Trigger abort of loop.
         self.step_counter = self.steps
-        traci.close()
+        self.__stopped.set()
+        self.__requested.set()
+        self.__ready.set()
+        self.__write_step_times()
+        if self.connection is not None:
+            # Closing the connection by its label also removes the label from TraCI's connections,
+            # so the input can be prepared again (e.g. for another simulation).
+            with _traci_lock:
+                traci.switch(self.label)
+                traci.close()
+            self.connection = None
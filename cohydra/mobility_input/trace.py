@@ -0,0 +1,388 @@
+"""Replay of recorded trajectories."""
+
+import array
+import bisect
+import csv
+import io
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import xml.etree.ElementTree as ElementTree
+
+from ns import core, mobility
+
+from .mobility_input import MobilityInput
+
+logger = logging.getLogger(__name__)
+
+#: The magic bytes at the start of a compiled trace.
+MAGIC = b'CHYTRC01'
+#: The supported trace formats.
+TRACE_FORMATS = ('csv', 'ns2', 'fcd')
+
+# The size and modification time of the source, the length of the JSON header.
+_HEADER = struct.Struct('<QqI')
+# A waypoint consists of its time, x, y and z (as doubles in native byte order).
+_WAYPOINT_SIZE = 4
+
+_NS2_POSITION = re.compile(r'^\$node_\((?P<id>[^)]+)\)\s+set\s+(?P<axis>[XYZ])_\s+(?P<value>\S+)')
+_NS2_SETDEST = re.compile(r'^\$ns_\s+at\s+(?P<time>\S+)\s+"\$node_\((?P<id>[^)]+)\)\s+setdest\s+'
+                          r'(?P<x>\S+)\s+(?P<y>\S+)\s+(?P<speed>\S+)"')
+
+def _detect_format(path):
+    name = path.lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith('.xml'):
+        return 'fcd'
+    return 'ns2'
+
+def _parse_csv(file):
+    """Read a CSV file with the columns :code:`time`, :code:`id`, :code:`x`, :code:`y` and (optionally) :code:`z`."""
+    waypoints = {}
+    reader = csv.DictReader(io.TextIOWrapper(file, newline=''))
+    for row in reader:
+        points = waypoints.get(row['id'])
+        if points is None:
+            points = waypoints[row['id']] = array.array('d')
+        points.extend((float(row['time']), float(row['x']), float(row['y']), float(row.get('z') or 0)))
+    return waypoints
+
+def _parse_fcd(file):
+    """Read SUMO's floating car data output (:code:`--fcd-output`)."""
+    waypoints = {}
+    for _, element in ElementTree.iterparse(file):
+        if element.tag != 'timestep':
+            continue
+        time = float(element.get('time'))
+        for child in element:
+            points = waypoints.get(child.get('id'))
+            if points is None:
+                points = waypoints[child.get('id')] = array.array('d')
+            points.extend((time, float(child.get('x')), float(child.get('y')), float(child.get('z', 0))))
+        # Do not keep the whole document in memory.
+        element.clear()
+    return waypoints
+
+def _parse_ns2(file):
+    """Read an ns-2 movement file (initial positions and :code:`setdest` commands)."""
+    initial = {}
+    commands = []
+    for line in io.TextIOWrapper(file):
+        line = line.strip()
+        match = _NS2_SETDEST.match(line)
+        if match:
+            commands.append((float(match['time']), match['id'], float(match['x']), float(match['y']),
+                             float(match['speed'])))
+            continue
+        match = _NS2_POSITION.match(line)
+        if match:
+            initial.setdefault(match['id'], [0.0, 0.0, 0.0])['XYZ'.index(match['axis'])] = float(match['value'])
+    commands.sort(key=lambda command: command[0])
+
+    waypoints = {}
+    # The last waypoint and the pending arrival (if moving) of every node.
+    current = {}
+    arrivals = {}
+    def add(node_id, waypoint):
+        if current[node_id][0] < waypoint[0] or node_id not in waypoints:
+            waypoints.setdefault(node_id, array.array('d')).extend(waypoint)
+        current[node_id] = waypoint
+
+    for node_id, (x, y, z) in initial.items(): # pylint: disable=invalid-name
+        current[node_id] = (0.0, x, y, z)
+        add(node_id, current[node_id])
+
+    for time, node_id, x, y, speed in commands: # pylint: disable=invalid-name
+        if node_id not in current:
+            current[node_id] = (0.0, 0.0, 0.0, 0.0)
+            add(node_id, current[node_id])
+        arrival = arrivals.pop(node_id, None)
+        if arrival is not None and arrival[0] <= time:
+            add(node_id, arrival)
+            arrival = None
+        start = current[node_id]
+        if arrival is not None:
+            # Stop the ongoing movement where the node is now.
+            fraction = (time - start[0]) / (arrival[0] - start[0])
+            add(node_id, (time, *(a + (b - a) * fraction for a, b in zip(start[1:], arrival[1:]))))
+        else:
+            # The node stood still until now.
+            add(node_id, (time, *start[1:]))
+        _, start_x, start_y, start_z = current[node_id]
+        distance = math.hypot(x - start_x, y - start_y)
+        if speed > 0 and distance > 0:
+            arrivals[node_id] = (time + distance / speed, x, y, start_z)
+
+    for node_id, arrival in arrivals.items():
+        add(node_id, arrival)
+    return waypoints
+
+_PARSERS = {'csv': _parse_csv, 'fcd': _parse_fcd, 'ns2': _parse_ns2}
+
+def _sorted_by_time(points):
+    times = points[::_WAYPOINT_SIZE]
+    if all(a <= b for a, b in zip(times, times[1:])):
+        return points
+    rows = sorted(tuple(points[i:i + _WAYPOINT_SIZE]) for i in range(0, len(points), _WAYPOINT_SIZE))
+    return array.array('d', (value for row in rows for value in row))
+
+class Trace:
+    """The waypoints of all objects in a trace, backed by a memory-mapped cache.
+
+    A trace is parsed once and compiled into a binary cache file (next to the trace by default).
+    Later runs map the cache into memory, so only the waypoints of the replayed objects are read.
+    The cache is rebuilt when the trace changes.
+
+    Parameters
+    ----------
+    path : str
+        The path of the trace.
+    trace_format : str
+        The format of the trace (``csv``, ``ns2`` or ``fcd``). By default, it is derived from the extension.
+    cache_path : str
+        The path of the cache. ``None`` puts it next to the trace, ``False`` disables the cache.
+    """
+
+    def __init__(self, path, trace_format=None, cache_path=None):
+        if trace_format is None:
+            trace_format = _detect_format(path)
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError(f'Unknown trace format {trace_format}')
+        #: The path of the trace.
+        self.path = path
+        #: The format of the trace.
+        self.trace_format = trace_format
+        #: The path of the cache (if any).
+        self.cache_path = f'{path}.cache' if cache_path is None else cache_path or None
+
+        self.__ids = None
+        self.__offsets = None
+        self.__mmap = None
+        self.__values = None
+
+    def open(self):
+        """Load the trace from the cache or compile it."""
+        stat = os.stat(self.path)
+        source = (stat.st_size, stat.st_mtime_ns)
+        buffer = None
+        if self.cache_path is not None and os.path.exists(self.cache_path) and os.path.getsize(self.cache_path):
+            with open(self.cache_path, 'rb') as file:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            if not self.__load(buffer, source):
+                buffer.close()
+                buffer = None
+        if buffer is None:
+            logger.info('Compiling the trace %s.', self.path)
+            compiled = self.__compile(source)
+            buffer = self.__write_cache(compiled)
+            if buffer is None:
+                buffer = compiled
+            self.__load(buffer, source)
+        self.__mmap = buffer
+        return self
+
+    def close(self):
+        """Release the memory-mapped cache."""
+        if self.__values is not None:
+            self.__values.release()
+            self.__values = None
+        if isinstance(self.__mmap, mmap.mmap):
+            self.__mmap.close()
+        self.__mmap = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def ids(self):
+        """list of str: The IDs of the objects in the trace."""
+        return list(self.__ids)
+
+    def waypoints(self, trace_id):
+        """Return the waypoints of an object.
+
+        Parameters
+        ----------
+        trace_id : str
+            The ID of the object.
+
+        Returns
+        -------
+        memoryview
+            The waypoints as a flat sequence of time, x, y and z (in seconds and meters), sorted by time.
+        """
+        index = self.__ids.get(trace_id)
+        if index is None:
+            raise KeyError(f'{trace_id} is not part of the trace {self.path}')
+        start, end = self.__offsets[index], self.__offsets[index + 1]
+        return self.__values[start * _WAYPOINT_SIZE:end * _WAYPOINT_SIZE]
+
+    def __load(self, buffer, source):
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            return False
+        size, mtime, length = _HEADER.unpack_from(buffer, len(MAGIC))
+        if (size, mtime) != source:
+            return False
+        header_start = len(MAGIC) + _HEADER.size
+        header = json.loads(bytes(buffer[header_start:header_start + length]).decode())
+        self.__ids = {trace_id: index for index, trace_id in enumerate(header['ids'])}
+        self.__offsets = header['offsets']
+        self.__values = memoryview(buffer)[header['data']:].cast('d')
+        return True
+
+    def __compile(self, source):
+        with open(self.path, 'rb') as file:
+            waypoints = _PARSERS[self.trace_format](file)
+        ids = sorted(waypoints)
+        offsets = [0]
+        for trace_id in ids:
+            offsets.append(offsets[-1] + len(waypoints[trace_id]) // _WAYPOINT_SIZE)
+
+        header = {'ids': ids, 'offsets': offsets, 'data': 0}
+        prefix = len(MAGIC) + _HEADER.size
+        # The waypoints are aligned to 8 bytes, so they can be accessed in place.
+        encoded = json.dumps(header).encode()
+        header['data'] = (prefix + len(encoded) + 16 + 7) // 8 * 8
+        encoded = json.dumps(header).encode().ljust(header['data'] - prefix)
+
+        compiled = bytearray(MAGIC + _HEADER.pack(*source, len(encoded)) + encoded)
+        for trace_id in ids:
+            compiled += _sorted_by_time(waypoints[trace_id]).tobytes()
+        logger.info('The trace contains %d waypoints of %d objects.', offsets[-1], len(ids))
+        return compiled
+
+    def __write_cache(self, compiled):
+        if self.cache_path is None:
+            return None
+        try:
+            with open(self.cache_path, 'wb') as file:
+                file.write(compiled)
+            with open(self.cache_path, 'rb') as file:
+                return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except OSError as err:
+            logger.warning('Cannot cache the trace in %s: %s', self.cache_path, err)
+            return None
+
+def position_at(waypoints, time):
+    """Interpolate the position of an object at a point in time.
+
+    Parameters
+    ----------
+    waypoints : sequence of float
+        The waypoints (see :meth:`Trace.waypoints`).
+    time : float
+        The time in seconds.
+
+    Returns
+    -------
+    tuple
+        The position (x, y, z).
+    """
+    times = waypoints[::_WAYPOINT_SIZE]
+    index = bisect.bisect_right(times, time)
+    if index == 0:
+        return tuple(waypoints[1:_WAYPOINT_SIZE])
+    if index == len(times):
+        return tuple(waypoints[-3:])
+    before = waypoints[(index - 1) * _WAYPOINT_SIZE:index * _WAYPOINT_SIZE]
+    after = waypoints[index * _WAYPOINT_SIZE:(index + 1) * _WAYPOINT_SIZE]
+    fraction = (time - before[0]) / (after[0] - before[0])
+    return tuple(a + (b - a) * fraction for a, b in zip(before[1:], after[1:]))
+
+class TraceMobilityInput(MobilityInput):
+    """TraceMobilityInput replays recorded trajectories.
+
+    The trajectories are compiled into the waypoints of ns-3's :code:`WaypointMobilityModel`
+    before the simulation starts. Thus, ns-3 moves the nodes itself and no Python thread
+    updates positions during the simulation. In contrast to :class:`.SUMOMobilityInput`,
+    no SUMO server is needed.
+
+    Supported formats are:
+
+    * ``csv``: A header and the columns :code:`time`, :code:`id`, :code:`x`, :code:`y` and (optionally) :code:`z`.
+    * ``ns2``: ns-2 movement files (e.g. of BonnMotion or SUMO's :code:`traceExporter.py`).
+    * ``fcd``: SUMO's floating car data (:code:`sumo --fcd-output`).
+
+    The trace is compiled into a cache (see :class:`Trace`), which is memory-mapped in later runs.
+
+    *Note:* :attr:`.Node.position` only holds the initial position of a replayed node,
+    as the positions are not reported back from ns-3.
+
+    Example
+    -------
+    .. code-block:: python
+
+        trace = TraceMobilityInput('fcd.xml')
+        trace.add_node_to_mapping(car, 'veh0')
+        scenario.add_mobility_input(trace)
+
+    Parameters
+    ----------
+    path : str
+        The path of the trace.
+    name : str
+        The name of the MobilityInput.
+    trace_format : str
+        The format of the trace (``csv``, ``ns2`` or ``fcd``). By default, it is derived from the extension
+        (:code:`.csv`, :code:`.xml` or anything else for ns-2).
+    start_time : float
+        The time in the trace, which is replayed at the start of the simulation.
+    cache_path : str
+        The path of the compiled trace. ``None`` puts it next to the trace, ``False`` disables the cache.
+    """
+
+    def __init__(self, path, name='Trace Replay', trace_format=None, start_time=0, cache_path=None):
+        super().__init__(name)
+        #: The replayed trace.
+        self.trace = Trace(path, trace_format=trace_format, cache_path=cache_path)
+        #: The time in the trace, which is replayed at the start of the simulation.
+        self.start_time = start_time
+
+    def add_node_to_mapping(self, node, trace_id):
+        """Replay the trajectory of an object with a node.
+
+        Parameters
+        ----------
+        node : :class:`.Node`
+            The node to move.
+        trace_id : str
+            The ID of the object in the trace.
+        """
+        self.node_mapping[node] = str(trace_id)
+
+    def prepare(self, simulation):
+        """Compile the trajectories of the mapped nodes into waypoints."""
+        logger.info('Loading trace for "%s".', self.name)
+        self.trace.open()
+        count = 0
+        for node, trace_id in self.node_mapping.items():
+            waypoints = self.trace.waypoints(trace_id)
+            node.position = position_at(waypoints, self.start_time)
+            node.install_mobility_model('ns3::WaypointMobilityModel')
+            model = node.ns3_node.GetObject(mobility.WaypointMobilityModel.GetTypeId())
+            if model is None:
+                raise Exception(f'The node {node.name} has no ns3::WaypointMobilityModel to replay the trace with.')
+            model.AddWaypoint(mobility.Waypoint(core.Seconds(0), core.Vector(*node.position)))
+            for index in range(0, len(waypoints), _WAYPOINT_SIZE):
+                time, x, y, z = waypoints[index:index + _WAYPOINT_SIZE] # pylint: disable=invalid-name
+                if time <= self.start_time:
+                    continue
+                model.AddWaypoint(mobility.Waypoint(core.Seconds(time - self.start_time), core.Vector(x, y, z)))
+                count += 1
+            waypoints.release()
+        logger.info('Scheduled %d waypoints for %d nodes.', count, len(self.node_mapping))
+
+    def start(self):
+        """Nothing to do, ns-3 moves the nodes."""
+
+    def destroy(self):
+        """Release the trace."""
+        self.trace.close()
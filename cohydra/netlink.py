@@ -0,0 +1,120 @@
+"""A shared netlink session for setting up host interfaces."""
+
+import logging
+import threading
+
+from pyroute2 import IPRoute
+
+logger = logging.getLogger(__name__)
+
+class NetlinkSession:
+    """The NetlinkSession shares one netlink socket and caches interface indices.
+
+    Creating a socket per operation and looking up interfaces by name costs several
+    round trips per interface. The session avoids this by resolving the indices of
+    many new interfaces with a single dump.
+
+    *Warning:* The socket belongs to the network namespace of the thread that created it.
+    Use :func:`get` only for the host's namespace and a separate :class:`pyroute2.IPRoute`
+    within container namespaces.
+    """
+
+    __session = None
+    __session_lock = threading.Lock()
+
+    @staticmethod
+    def get():
+        """Return the shared session of the host's network namespace."""
+        with NetlinkSession.__session_lock:
+            if NetlinkSession.__session is None:
+                NetlinkSession.__session = NetlinkSession()
+            return NetlinkSession.__session
+
+    def __init__(self):
+        #: The netlink socket.
+        self.ipr = IPRoute()
+        #: Interface indices by name.
+        self.indices = {}
+        #: Serializes requests on the socket.
+        self.lock = threading.RLock()
+
+    def lookup(self, ifname):
+        """Return the index of an interface.
+
+        Parameters
+        ----------
+        ifname : str
+            The name of the interface.
+
+        Returns
+        -------
+        int
+            The interface index.
+        """
+        with self.lock:
+            if ifname not in self.indices:
+                self.indices[ifname] = self.ipr.link_lookup(ifname=ifname)[0]
+            return self.indices[ifname]
+
+    def refresh(self):
+        """Update the cached indices of all interfaces with a single dump."""
+        with self.lock:
+            self.indices = {link.get_attr('IFLA_IFNAME'): link['index'] for link in self.ipr.get_links()}
+
+    def add(self, ifname, kind, **kwargs):
+        """Create an interface.
+
+        Parameters
+        ----------
+        ifname : str
+            The name of the new interface.
+        kind : str
+            The kind of the interface, e.g. :code:`bridge`, :code:`tuntap` or :code:`veth`.
+        """
+        with self.lock:
+            self.ipr.link('add', ifname=ifname, kind=kind, **kwargs)
+
+    def set(self, ifname, **kwargs):
+        """Change an interface by its (cached) index.
+
+        Parameters
+        ----------
+        ifname : str
+            The name of the interface.
+        """
+        with self.lock:
+            self.ipr.link('set', index=self.lookup(ifname), **kwargs)
+
+    def move(self, ifname, **kwargs):
+        """Move an interface to another network namespace (e.g. with :code:`net_ns_fd`).
+
+        The interface can be renamed in the same request with :code:`ifname` in the keyword arguments.
+
+        Parameters
+        ----------
+        ifname : str
+            The name of the interface.
+        """
+        with self.lock:
+            self.ipr.link('set', index=self.lookup(ifname), **kwargs)
+            # The index is not valid outside of this namespace.
+            self.indices.pop(ifname, None)
+
+    def remove(self, ifname, missing_ok=False):
+        """Delete an interface.
+
+        Parameters
+        ----------
+        ifname : str
+            The name of the interface.
+        missing_ok : bool
+            Do nothing, if the interface does not exist (anymore).
+            The interface is looked up again, as the kernel may have deleted it meanwhile.
+        """
+        with self.lock:
+            if missing_ok:
+                self.indices.pop(ifname, None)
+                if not self.ipr.link_lookup(ifname=ifname):
+                    return
+            self.ipr.link('del', index=self.lookup(ifname))
+            self.indices.pop(ifname, None)
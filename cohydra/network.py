@@ -46,9 +46,11 @@ class Network:
     base : str
         The base / start for the IP-addresses of this network.
         An IPv4 example for this parameter could be :code:`"0.0.0.50"`.
+    capture : :class:`.CapturePolicy`
+        The capture policy of the network's channels.
     """
 
-    def __init__(self, network_address, netmask=None, base=None):
+    def __init__(self, network_address, netmask=None, base=None, capture=None):
         #: All the channels in the network.
         self.channels = list()
         if isinstance(network_address, str):
@@ -64,8 +66,10 @@ class Network:
         self.address_helper = network_address_helper(network_address, base)
         #: The color of the network's nodes in a visualization.
         self.color = None
+        #: The capture policy of the network's channels (if :code:`None`, the scenario's policy is used).
+        self.capture_policy = capture
 
-    def connect(self, *nodes, channel_type=CSMAChannel, **kwargs):
+    def connect(self, *nodes, channel_type=CSMAChannel, capture=None, **kwargs):
         """Connects to or more nodes on a single conection.
 
         This is comparable to inserting a cable between them.
@@ -77,12 +81,21 @@ class Network:
             The nodes to connect on one physical connection. These must be instances of subclasses of :class:`.Node`.
         channel_type : class
             The channel to use.
-            This can be one of :class:`.CSMAChannel` or :class:`.WiFiChannel`.
+            This can be one of :class:`.CSMAChannel`, :class:`.WiFiChannel` or :class:`.NetemChannel`.
+        capture : :class:`.CapturePolicy`
+            The capture policy of the channel (if :code:`None`, the network's policy is used).
+
+        Returns
+        -------
+        :class:`.Channel`
+            The new channel.
         """
         if len(nodes) < 2:
             raise ValueError('Please specify at least two nodes to connect.')
         channel = channel_type(self, nodes, **kwargs)
+        channel.capture_policy = capture
         self.channels.append(channel)
+        return channel
 
     def prepare(self, simulation, network_index):
         """Prepares the network by building the docker containers.
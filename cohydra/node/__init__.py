@@ -1,10 +1,17 @@
 """Nodes are the main components of simulating behaviour."""
-import logging
+from ..util import lazy_attributes
 
-from .base import Node
-from .switch import SwitchNode
-from .docker import DockerNode
-from .lxd import LXDNode
-from .external import ExternalNode
-from .interface import InterfaceNode
-from .ssh import SSHNode
+# The backends (and their clients) are loaded when the node type is used.
+__getattr__, __dir__ = lazy_attributes(__name__, {
+    'Node': '.base',
+    'set_positions': '.base',
+    'SwitchNode': '.switch',
+    'DockerNode': '.docker',
+    'LXDNode': '.lxd',
+    'ExternalNode': '.external',
+    'InterfaceNode': '.interface',
+    'SSHNode': '.ssh',
+})
+
+__all__ = ['Node', 'SwitchNode', 'DockerNode', 'LXDNode', 'ExternalNode', 'InterfaceNode', 'SSHNode',
+           'set_positions']
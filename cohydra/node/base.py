@@ -1,10 +1,63 @@
 """Base abstract class for a node."""
 import logging
+import sys
 
-from ns import core, csma, network, wifi, mobility
+from ns import core, network, mobility
+
+from ..visualization import Visualization
 
 logger = logging.getLogger(__name__)
 
+#: The context of events, which do not belong to a node (:code:`ns3::Simulator::NO_CONTEXT`).
+NO_CONTEXT = 0xffffffff
+
+def set_positions(nodes, positions):
+    """Set the positions of many nodes at once.
+
+    This is cheaper than calling :meth:`.Node.set_position` for every node:
+    The mobility models of all nodes are updated by a single event in the simulation thread
+    and the visualization is notified once for the whole batch (in the same event).
+    Nodes simulated by a :class:`.Partition` are forwarded to it in a single message.
+
+    Parameters
+    ----------
+    nodes : list of :class:`.Node`
+        The nodes.
+    positions : numpy.ndarray or list
+        The positions of the nodes, i.e. an array of the shape :code:`(len(nodes), 3)`
+        or :code:`(len(nodes), 2)` (then the z-positions are :code:`0`).
+    """
+    if hasattr(positions, 'tolist'):
+        # Convert a NumPy array to floats at once instead of element by element.
+        positions = positions.tolist()
+    if len(positions) != len(nodes):
+        raise ValueError(f'Got {len(positions)} positions for {len(nodes)} nodes.')
+
+    visualization = Visualization.get_visualization()
+    local = {}
+    partitions = {}
+    # The visualization is notified by the event below instead of once per node.
+    with visualization.suspended():
+        for node, position in zip(nodes, positions):
+            position = (position[0], position[1], position[2] if len(position) > 2 else 0)
+            node.position = position
+            if node.partition is None:
+                local[node] = position
+            else:
+                batch = partitions.setdefault(node.partition, ([], []))
+                batch[0].append(node)
+                batch[1].append(position)
+
+    if local:
+        def apply():
+            for node, (x, y, z) in local.items(): # pylint: disable=invalid-name
+                node.mobility_model.SetPosition(core.Vector(x, y, z))
+            visualization.set_node_positions(local)
+        # Mobility inputs run in threads of their own, so the event has to be scheduled thread-safely.
+        core.Simulator.ScheduleWithContext(NO_CONTEXT, core.Seconds(0), apply)
+    for partition, (partition_nodes, partition_positions) in partitions.items():
+        partition.forward_positions(partition_nodes, partition_positions)
+
 class Node:
     """A node represents a computer in the simulation.
 
@@ -34,14 +87,9 @@ class Node:
 
         #: The position of the node (used by wifi models and visualization)
         self.position = (0, 0, 0)
-
-        # Install mobility model for networks
-        mobility_helper = mobility.MobilityHelper()
-        mobility_helper.SetMobilityModel("ns3::ConstantPositionMobilityModel")
-        position_alloc = mobility.ListPositionAllocator()
-        position_alloc.Add(core.Vector(self.position[0], self.position[1], self.position[2]))
-        mobility_helper.SetPositionAllocator(position_alloc)
-        mobility_helper.Install(self.ns3_node)
+        # The mobility model is installed when the simulation is prepared (or when it is used first),
+        # so mobility inputs can install another model than the default one.
+        self.__mobility_model = None
 
         #: The color of the node used in the visualization.
         self.color = None
@@ -50,10 +98,14 @@ class Node:
         self.interfaces = dict()
         #: The command executor for running (shell) commands.
         self.command_executor = None
+        #: The :class:`.Partition` simulating the node in another process (if partitioned).
+        self.partition = None
 
     def set_position(self, x, y, z=0): # pylint: disable=invalid-name
         """Set the position of the node and updates the mobitlity model.
 
+        To move many nodes at once, use :func:`set_positions`.
+
         Parameters
         ----------
         x : float
@@ -64,8 +116,55 @@ class Node:
             The z-position.
         """
         self.position = (x, y, z)
-        mobility_model = self.ns3_node.GetObject(mobility.MobilityModel.GetTypeId())
-        mobility_model.SetPosition(core.Vector(self.position[0], self.position[1], self.position[2]))
+        if self.__mobility_model is not None:
+            self.__mobility_model.SetPosition(core.Vector(x, y, z))
+        if self.partition is not None:
+            self.partition.forward(self, 'set_position', x, y, z)
+
+    @property
+    def mobility_model(self):
+        """The ns-3 mobility model of the node.
+
+        A :code:`ns3::ConstantPositionMobilityModel` is installed on first use,
+        unless another model has been installed with :meth:`install_mobility_model`.
+        """
+        if self.__mobility_model is None:
+            self.install_mobility_model()
+        return self.__mobility_model
+
+    def install_mobility_model(self, type_name=None):
+        """Install the ns-3 mobility model of the node at its current position.
+
+        *Warning:* Do not call this function manually.
+            The simulation installs the default model and mobility inputs install their own.
+
+        Parameters
+        ----------
+        type_name : str
+            The ns-3 type of the model (e.g. :code:`ns3::WaypointMobilityModel`).
+            Without a type, the default model is installed, if the node has no model yet.
+
+        Returns
+        -------
+        ns.mobility.MobilityModel
+            The installed model.
+        """
+        if self.__mobility_model is not None:
+            if type_name is None:
+                return self.__mobility_model
+            raise Exception(f'The node {self.name} already has a mobility model.')
+        attached = self.ns3_node.GetObject(mobility.MobilityModel.GetTypeId())
+        if attached is not None:
+            raise Exception(f'The node {self.name} already has a {attached.GetInstanceTypeId().GetName()}, '
+                            'which was not installed with install_mobility_model.')
+        mobility_helper = mobility.MobilityHelper()
+        mobility_helper.SetMobilityModel(type_name or "ns3::ConstantPositionMobilityModel")
+        position_alloc = mobility.ListPositionAllocator()
+        position_alloc.Add(core.Vector(self.position[0], self.position[1], self.position[2]))
+        mobility_helper.SetPositionAllocator(position_alloc)
+        mobility_helper.Install(self.ns3_node)
+        self.__mobility_model = self.ns3_node.GetObject(mobility.MobilityModel.GetTypeId())
+        return self.__mobility_model
 
     def add_interface(self, interface, name=None, prefix='eth'):
         """Add an interface to the node.
@@ -107,6 +206,17 @@ class Node:
         """
         raise NotImplementedError
 
+    def image_source(self):
+        """The image the node is created from.
+
+        Returns
+        -------
+        :class:`.ImageSource`
+            The image to acquire before the node is prepared or :code:`None` if the node
+            does not need an image (or it has already been acquired).
+        """
+        return None
+
     def wants_ip_stack(self):
         """Indicates whether a IP stack shall be installed onto the node.
 
@@ -119,6 +229,32 @@ class Node:
         """
         raise NotImplementedError
 
+    def wants_host_bridge(self):
+        """Indicates whether every interface of the node gets its own bridge and tap on the host.
+
+        The bridges and taps of these nodes are created at once before the nodes are prepared
+        (see :func:`.interface.setup_host_links`).
+
+        Returns
+        -------
+        bool
+            :code:`True` if the node calls :func:`.Interface.setup_bridge` for all its interfaces.
+        """
+        return False
+
+    def wants_host_veth(self):
+        """Indicates whether every interface of the node is connected to its bridge by a VETH pair.
+
+        The pairs of these nodes are created on the host at once before the nodes are prepared
+        (see :func:`.interface.setup_host_links`) and moved into the nodes afterwards.
+
+        Returns
+        -------
+        bool
+            :code:`True` if the node calls :func:`.Interface.setup_veth_pair` for all its interfaces.
+        """
+        return False
+
     def execute_command(self, command, user=None):
         """Execute a command within the node.
 
@@ -134,16 +270,28 @@ class Node:
             raise NotImplementedError
         self.command_executor.execute(command, user=user)
 
+    @staticmethod
+    def __device_modules():
+        """Return the (already imported) ns-3 modules of the device types.
+
+        A device type can only be in use, if its module has been imported by a channel.
+        Thus, the modules (e.g. WiFi) are not loaded just for checking the type.
+        """
+        return sys.modules.get('ns.csma'), sys.modules.get('ns.wifi')
+
     def go_offline(self):
         """Disconnect the node from all channels."""
         n_devices = self.ns3_node.GetNDevices()
         logger.debug('Go offline: %s (%d devices)', self.name, n_devices)
+        if self.partition is not None and self.partition.forward(self, 'go_offline'):
+            return
+        csma, wifi = self.__device_modules()
         for device_index in range(0, n_devices):
             device = self.ns3_node.GetDevice(device_index)
-            if isinstance(device, csma.CsmaNetDevice):
+            if csma is not None and isinstance(device, csma.CsmaNetDevice):
                 device.SetSendEnable(False)
                 device.SetReceiveEnable(False)
-            elif isinstance(device, wifi.WifiNetDevice):
+            elif wifi is not None and isinstance(device, wifi.WifiNetDevice):
                 phy = device.GetPhy()
                 phy.SetRxGain(-10000)
                 phy.SetTxGain(-10000)
@@ -152,12 +300,15 @@ class Node:
         """Connect the node back to all channels."""
         n_devices = self.ns3_node.GetNDevices()
         logger.debug('Go online: %s (%d devices)', self.name, n_devices)
+        if self.partition is not None and self.partition.forward(self, 'go_online'):
+            return
+        csma, wifi = self.__device_modules()
         for device_index in range(0, n_devices):
             device = self.ns3_node.GetDevice(device_index)
-            if isinstance(device, csma.CsmaNetDevice):
+            if csma is not None and isinstance(device, csma.CsmaNetDevice):
                 device.SetSendEnable(True)
                 device.SetReceiveEnable(True)
-            elif isinstance(device, wifi.WifiNetDevice):
+            elif wifi is not None and isinstance(device, wifi.WifiNetDevice):
                 phy = device.GetPhy()
                 phy.SetRxGain(0)
                 phy.SetTxGain(0)
@@ -1,18 +1,25 @@
 """Docker containers in the simulation."""
 
+import hashlib
+import json
 import logging
 import os
 import threading
+import time
 
 from nsenter import Namespace
-import docker
 
+from ..clients import docker_client
 from ..context import defer
+from ..images import DockerBuild, DockerImage
 from ..command_executor import DockerCommandExecutor
 from .base import Node
 
 logger = logging.getLogger(__name__)
 
+#: The container label storing the hash of a warm container's specification.
+SPEC_HASH_LABEL = 'cohydra.spec-hash'
+
 def expand_volume_shorthand(key_value):
     """Expand a volume string to something the Docker runtime understands.
 
@@ -31,7 +38,7 @@ def expand_volume_shorthand(key_value):
         return (name_or_path, {'bind': spec, 'mode': 'rw'})
     return (name_or_path, spec)
 
-def log_to_file(container, log_path, stdout=False, stderr=False):
+def log_to_file(container, log_path, stdout=False, stderr=False, since=None):
     """Log the container's output.
 
     This opens a stream to the docker container's log output and writes it into a file.
@@ -44,11 +51,13 @@ def log_to_file(container, log_path, stdout=False, stderr=False):
         Whether stdout should be logged.
     stderr : bool
         Whether stderr should be logged.
+    since : int
+        Only log output after this UNIX timestamp.
     """
     log = logging.getLogger(container.name)
     log.debug('Write log to %s', log_path)
     with open(log_path, 'wb', 0) as log_file:
-        for line in container.logs(stdout=stdout, stderr=stderr, follow=True, stream=True):
+        for line in container.logs(stdout=stdout, stderr=stderr, follow=True, stream=True, since=since):
             log.log(logging.INFO if stdout else logging.ERROR, '%s', line.decode().strip())
             log_file.write(line)
         log.debug('Done logging')
@@ -86,10 +95,18 @@ class DockerNode(Node):
     environment_variables : dict or list
         A dictonary of environment variables or a list of environment variables.
         If a list is specified each item should be in the form :code:`'KEY=VALUE'`.
+    warm : bool
+        Keep the container running after the simulation and reuse it in the next simulation,
+        if its specification (image, command, resources, hosts, ...) did not change.
+        Only the network interfaces are detached and attached again.
+        Warm containers are removed by :code:`tools/cleanup`.
+    reset_command : str or list of str
+        A command to run inside a reused warm container instead of restarting it.
     """
 
     def __init__(self, name, docker_image=None, docker_build_dir=None, dockerfile='Dockerfile', pull=False,
-                 cpus=0.0, memory=None, command=None, volumes=None, exposed_ports=None, environment_variables=None):
+                 cpus=0.0, memory=None, command=None, volumes=None, exposed_ports=None, environment_variables=None,
+                 warm=False, reset_command=None):
         super().__init__(name)
         #: The docker image to use.
         self.docker_image = docker_image
@@ -118,6 +135,13 @@ class DockerNode(Node):
         self.container = None
         #: The PID of the container.
         self.container_pid = None
+        #: The deferred stop of the container.
+        self.container_teardown = None
+
+        #: Whether the container is kept running for the next simulation.
+        self.warm = warm
+        #: The command to run in a reused warm container.
+        self.reset_command = reset_command
 
         if docker_build_dir is None and docker_image is None:
             raise Exception('Please specify Docker image or build directory')
@@ -140,6 +164,12 @@ class DockerNode(Node):
     def wants_ip_stack(self):
         return True
 
+    def wants_host_bridge(self):
+        return True
+
+    def wants_host_veth(self):
+        return True
+
     def prepare(self, simulation):
         """This runs a setup on network interfaces and starts the container."""
         logger.info('Preparing node %s', self.name)
@@ -147,29 +177,20 @@ class DockerNode(Node):
         self.start_docker_container(simulation.log_directory, simulation.hosts)
         self.setup_host_interfaces()
 
-    def build_docker_image(self):
-        """Build the image for the container."""
-        client = docker.from_env()
+    def image_source(self):
         if self.docker_image is None:
-            logger.info('Building docker image: %s/%s', self.docker_build_dir, self.dockerfile)
-            self.docker_image = client.images.build(
-                path=self.docker_build_dir,
-                dockerfile=self.dockerfile,
-                rm=True,
-                nocache=False,
-            )[0]
-        elif isinstance(self.docker_image, str):
-            if not self.pull:
-                try:
-                    self.docker_image = client.images.get(self.docker_image)
-                except docker.errors.ImageNotFound:
-                    pass
-
-            if isinstance(self.docker_image, str):
-                repo, *tag = self.docker_image.split(':')
-                tag = tag[0] if not tag else 'latest'
-                logger.info('Pulling docker image: %s, tag %s', repo, tag)
-                self.docker_image = client.images.pull(repo, tag=tag)
+            return DockerBuild(self.docker_build_dir, self.dockerfile)
+        if isinstance(self.docker_image, str):
+            return DockerImage(self.docker_image, pull=self.pull)
+        return None
+
+    def build_docker_image(self):
+        """Build the image for the container.
+
+        If the image has already been acquired (see :func:`.images.acquire_images`), it is reused.
+        """
+        if self.docker_image is None or isinstance(self.docker_image, str):
+            self.docker_image = self.image_source().acquire()
 
         self.docker_image.tag(self.docker_image_tag)
 
@@ -186,19 +207,13 @@ class DockerNode(Node):
             A dictionary with hostnames as keys and IP addresses (a list) as value.
         """
         logger.info('Starting docker container: %s', self.name)
-        client = docker.from_env()
+        client = docker_client()
 
         extra_hosts = [f'{name}:{address}' for name, addresses in hosts.items() for address in addresses]
 
-        self.container = client.containers.run(
-            self.docker_image_tag,
+        options = dict(
             name=self.name,
             hostname=self.name,
-            labels={"created-by": "ns-3"},
-
-            remove=True,
-            auto_remove=True,
-            detach=True,
 
             privileged=True,
             nano_cpus=int(self.cpus * 1e9),
@@ -210,22 +225,100 @@ class DockerNode(Node):
             ports=self.exposed_ports,
             environment=self.environment_variables,
         )
-        defer(f'stop docker container {self.name}', self.stop_docker_container)
+        labels = {"created-by": "ns-3"}
+
+        since = None
+        if self.warm:
+            spec_hash = self.__spec_hash(options)
+            labels[SPEC_HASH_LABEL] = spec_hash
+            self.container = self.__find_warm_container(client, spec_hash)
+            since = int(time.time())
+
+        reused = self.container is not None
+        if not reused:
+            self.container = client.containers.run(
+                self.docker_image_tag,
+                labels=labels,
+
+                remove=not self.warm,
+                auto_remove=not self.warm,
+                detach=True,
+
+                **options,
+            )
+        self.container_teardown = defer(f'stop docker container {self.name}', self.stop_docker_container)
 
         for stream in ('stdout', 'stderr'):
             log_file_path = os.path.join(log_directory, f'{self.name}.{stream}.log')
-            threading.Thread(target=log_to_file, args=(self.container, log_file_path), kwargs={stream: True}).start()
+            # The log streams of warm containers do not end with the simulation.
+            threading.Thread(target=log_to_file, args=(self.container, log_file_path),
+                             kwargs={stream: True, 'since': since}, daemon=self.warm).start()
 
-        low_level_client = docker.APIClient()
-        self.container_pid = low_level_client.inspect_container(self.container.id)['State']['Pid']
+        # The attributes returned on creation are from before the container started.
+        self.container.reload()
+        self.container_pid = self.container.attrs['State']['Pid']
 
         self.command_executor = DockerCommandExecutor(self.name, self.container)
 
+        if reused and self.reset_command is not None:
+            logger.info('Resetting warm docker container: %s', self.name)
+            self.command_executor.execute(self.reset_command)
+
+    def __spec_hash(self, options):
+        """Calculate a hash of everything the container is created from.
+
+        Parameters
+        ----------
+        options : dict
+            The options to create the container with.
+
+        Returns
+        -------
+        str
+            The hex digest.
+        """
+        spec = json.dumps({'image': self.docker_image.id, **options}, sort_keys=True, default=str)
+        return hashlib.sha256(spec.encode()).hexdigest()
+
+    def __find_warm_container(self, client, spec_hash):
+        """Find a running warm container matching the specification.
+
+        Containers of this node with another specification are removed.
+
+        Parameters
+        ----------
+        client : :class:`docker.DockerClient`
+            The client to use.
+        spec_hash : str
+            The hash of the specification (see :func:`__spec_hash`).
+
+        Returns
+        -------
+        :class:`docker.models.containers.Container`
+            The container to reuse or :code:`None`.
+        """
+        containers = client.containers.list(all=True, filters={'name': self.name, 'label': 'created-by=ns-3'})
+        for container in containers:
+            if container.name != self.name:
+                continue
+            if container.status == 'running' and container.labels.get(SPEC_HASH_LABEL) == spec_hash:
+                logger.info('Reusing warm docker container: %s', self.name)
+                return container
+            logger.info('Removing outdated docker container: %s', self.name)
+            container.remove(force=True)
+        return None
+
     def stop_docker_container(self):
-        """Stop the container."""
+        """Stop the container.
+
+        Warm containers keep running, only their interfaces have been detached.
+        """
         if self.container is not None:
-            logger.info('Stopping docker container: %s', self.container.name)
-            self.container.stop(timeout=1)
+            if self.warm:
+                logger.info('Keeping warm docker container: %s', self.container.name)
+            else:
+                logger.info('Stopping docker container: %s', self.container.name)
+                self.container.stop(timeout=1)
             self.container = None
             self.container_pid = None
             self.command_executor = None
@@ -240,6 +333,11 @@ class DockerNode(Node):
                 'ifname': name,
                 "net_ns_fd": f"/proc/{self.container_pid}/ns/net"
             })
+            # The VETH pair of a warm container is removed by its teardown, as it would otherwise outlive the
+            # simulation in the running container. Otherwise, it is removed together with the container.
+            if not self.warm:
+                for item in interface.teardowns.values():
+                    item.after(self.container_teardown)
 
             # Get container's namespace and setup the interface in the container
             with Namespace(self.container_pid, 'net'):
@@ -1,8 +1,8 @@
 
 import logging
-from pyroute2 import IPRoute
 
 from ..command_executor import ConsoleCommandExecutor
+from ..netlink import NetlinkSession
 from .base import Node
 
 logger = logging.getLogger(__name__)
@@ -34,11 +34,14 @@ class InterfaceNode(Node):
 	def wants_ip_stack(self):
 		return False
 
+	def wants_host_bridge(self):
+		return True
+
 	def prepare(self, simulation):
 		"""This creates the bridge and connects the local NIC to the bridge.
 		"""
-		ipr = IPRoute()
+		session = NetlinkSession.get()
 		for interface in self.interfaces.values():
 			interface.setup_bridge()
 			interface.connect_tap_to_bridge(tap_mode="UseLocal")
-			ipr.link('set', ifname=self.ifname, master=ipr.link_lookup(ifname=interface.bridge_name)[0])
+			session.set(self.ifname, master=session.lookup(interface.bridge_name))
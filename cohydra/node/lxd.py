@@ -1,16 +1,29 @@
 """LXD containers in the simulation."""
 
+import hashlib
+import json
 import logging
+import threading
 
 from nsenter import Namespace
+from pyroute2 import IPRoute
 import pylxd
 
+from ..clients import lxd_client
 from ..context import defer
+from ..images import LXDImage
 from ..command_executor import LXDCommandExecutor
+from ..util import log_duration
 from .base import Node
 
 logger = logging.getLogger(__name__)
 
+#: The name prefix of template containers for :attr:`LXDNode.clone`.
+TEMPLATE_PREFIX = 'ns3-template-'
+
+_template_locks = {}
+_template_locks_lock = threading.Lock()
+
 def log_to_file(container, log_path, stdout=False, stderr=False):
     """Log the container's output.
 
@@ -46,10 +59,16 @@ class LXDNode(Node):
         The server to pull the image off if not found locally.
     custom_configuration : dict
         Additional configuration key-value-pairs to pass to LXD.
+    clone : bool
+        Create the container as a copy of a stopped template container instead of from the image.
+        The template is created once for every image and configuration and kept for later simulations.
+        Copies are copy-on-write on ZFS and btrfs storage pools, which makes creating many identical
+        containers much faster. Use :attr:`.Scenario.prepare_workers` to create the copies concurrently.
+        Templates are removed by :code:`tools/cleanup`.
     """
 
     def __init__(self, name, image=None, image_server='https://images.linuxcontainers.org',
-                 custom_configuration=None):
+                 custom_configuration=None, clone=False):
         super().__init__(name)
 
         #: The image's name being used.
@@ -57,6 +76,10 @@ class LXDNode(Node):
 
         #: The container instance.
         self.container = None
+        #: The deferred deletion of the container.
+        self.container_teardown = None
+        #: The PID of the container's init process.
+        self.container_pid = None
 
         #: Custom configuration values.
         self.custom_configuration = custom_configuration
@@ -69,20 +92,32 @@ class LXDNode(Node):
         #: Before fetching from the server, local images will be checked.
         self.image_server = image_server
 
+        #: Whether to create the container as a copy of a template.
+        self.clone = clone
+
     def wants_ip_stack(self):
         return True
 
+    def wants_host_bridge(self):
+        return True
+
+    def image_source(self):
+        return LXDImage(self.image, self.image_server)
+
     def prepare(self, simulation):
         """This runs a setup on network interfaces and starts the container."""
         logger.info('Preparing node %s', self.name)
-        self.create_container()
-        self.start_container(simulation.log_directory, simulation.hosts)
-        self.setup_host_interfaces()
+        with log_duration(logger, 'Creating LXD container %s', self.name):
+            self.create_container()
+        with log_duration(logger, 'Starting LXD container %s', self.name):
+            self.start_container(simulation.log_directory, simulation.hosts)
+        with log_duration(logger, 'Setting up %d interfaces of %s', len(self.interfaces), self.name):
+            self.setup_host_interfaces()
 
     def create_container(self):
         """Create the LXC container."""
         logger.info('Creating LXC container for: %s', self.name)
-        client = pylxd.Client()
+        client = lxd_client()
 
         config = {
             'name': self.name,
@@ -94,24 +129,65 @@ class LXDNode(Node):
 
         if isinstance(self.custom_configuration, dict):
             config.update(self.custom_configuration)
+        # Tag for removal with cleanup.
+        config['config'] = {**config.get('config', {}), 'user.created-by': 'ns-3'}
 
-        # Check whether image with alias exists locally.
+        # Make sure the image with alias exists locally (usually done by the simulation before).
         try:
-            client.images.get_by_alias(self.image)
-        except pylxd.exceptions.NotFound:
-            # Not found, so use the server.
-            logger.debug('Image "%s" not found locally, pulling from %s', self.image, self.image_server)
+            image = self.image_source().acquire()
+        except pylxd.exceptions.LXDAPIException:
+            image = None
+            # Not available, so let LXD use the server.
+            logger.debug('Image "%s" not available locally, pulling from %s', self.image, self.image_server)
             config['source'].update({
                 'protocol': 'simplestreams',
                 'server': self.image_server
             })
 
-        # Tag for removal with cleanup.
+        if self.clone and image is not None:
+            template = self.__template(client, config, image.fingerprint)
+            logger.debug('Copying LXC container %s from %s', self.name, template)
+            config = {
+                'name': self.name,
+                'source': {
+                    'type': 'copy',
+                    'source': template,
+                },
+                'config': config['config'],
+            }
+
         self.container = client.containers.create(config, wait=True)
-        self.container.config.update({
-            'user.created-by': 'ns-3'
-        })
-        self.container.save(wait=True)
+
+    @staticmethod
+    def __template(client, config, fingerprint):
+        """Return the name of the template container for a configuration.
+
+        The template is created (but not started), if it does not exist yet.
+
+        Parameters
+        ----------
+        client : :class:`pylxd.Client`
+            The client to use.
+        config : dict
+            The configuration to create the containers with.
+        fingerprint : str
+            The fingerprint of the image.
+
+        Returns
+        -------
+        str
+            The name of the template container.
+        """
+        spec = json.dumps({**config, 'name': None, 'fingerprint': fingerprint}, sort_keys=True, default=str)
+        name = TEMPLATE_PREFIX + hashlib.sha256(spec.encode()).hexdigest()[:16]
+
+        with _template_locks_lock:
+            lock = _template_locks.setdefault(name, threading.Lock())
+        with lock:
+            if not client.containers.exists(name):
+                logger.info('Creating LXC template container %s', name)
+                client.containers.create({**config, 'name': name}, wait=True)
+        return name
 
     def start_container(self, log_directory, hosts=None):
         """Start the LXC container.
@@ -127,8 +203,9 @@ class LXDNode(Node):
         """
         logger.info('Starting LXC container: %s', self.name)
 
-        defer(f'stop and delete LXD container {self.name}', self.delete_container)
+        self.container_teardown = defer(f'stop and delete LXD container {self.name}', self.delete_container)
         self.container.start(wait=True)
+        self.container_pid = self.container.state().pid
 
         # Add extra_hosts to hosts file.
         hosts_file_content = self.container.files.get('/etc/hosts').decode()
@@ -144,30 +221,38 @@ class LXDNode(Node):
             self.container.stop(timeout=-1, wait=True)
             self.container.delete(wait=True)
             self.container = None
+            self.container_pid = None
             self.command_executor = None
 
     def setup_host_interfaces(self):
         """Setup the interfaces (bridge, tap, VETH pair) on the host and connect
-            them to the container."""
+            them to the container.
+
+        All NICs are added to the container with a single configuration update.
+        """
+        devices = {}
         for name, interface in self.interfaces.items():
             logger.debug('Setting up interface %s on %s.', name, self.name)
             interface.setup_bridge()
             interface.connect_tap_to_bridge()
+            devices[name] = {
+                'name': name,
+                'type': 'nic',
+                'nictype': 'bridged',
+                'parent': interface.bridge_name,
+                'hwaddr': interface.mac_address,
+                'host_name': interface.veth_name,
+            }
+            for item in interface.teardowns.values():
+                item.after(self.container_teardown)
 
-            self.container.devices.update({
-                name: {
-                    'name': name,
-                    'type': 'nic',
-                    'nictype': 'bridged',
-                    'parent': interface.bridge_name,
-                    'hwaddr': interface.mac_address,
-                    'host_name': interface.veth_name,
-                }
-            })
-            self.container.save(wait=True)
-            container_state = pylxd.Client().api.containers[self.name].state.get().json()
-            pid = container_state['metadata']['pid']
+        if not devices:
+            return
+        self.container.devices.update(devices)
+        self.container.save(wait=True)
 
-            # Get container's namespace and setup the interface in the container
-            with Namespace(pid, 'net'):
-                interface.setup_veth_container_end(name)
+        # Get container's namespace and setup the interfaces in the container
+        with Namespace(self.container_pid, 'net'):
+            with IPRoute() as ipr:
+                for name, interface in self.interfaces.items():
+                    interface.setup_veth_container_end(name, ipr=ipr)
@@ -0,0 +1,297 @@
+"""Simulate independent parts of a scenario in separate ns-3 processes."""
+
+import logging
+import os
+import signal
+import threading
+from multiprocessing.connection import Pipe
+
+from ns import core
+
+from .node.base import set_positions
+
+logger = logging.getLogger(__name__)
+
+#: The start time for tap bridges of other partitions (never within a simulation).
+DISABLED_START = 1e9
+
+def connected_components(channels):
+    """Group channels into connected components of the node/channel graph.
+
+    Two channels are connected, if they share a node (e.g. a :class:`.SwitchNode`).
+
+    Parameters
+    ----------
+    channels : iterable of :class:`.Channel`
+        The channels.
+
+    Returns
+    -------
+    list of tuple
+        The nodes (list) and channels (list) of every component.
+    """
+    parents = {}
+
+    def find(node):
+        while parents[node] is not node:
+            parents[node] = parents[parents[node]]
+            node = parents[node]
+        return node
+
+    channels = list(channels)
+    for channel in channels:
+        nodes = [interface.node for interface in channel.interfaces]
+        for node in nodes:
+            parents.setdefault(node, node)
+        for node in nodes[1:]:
+            parents[find(node)] = find(nodes[0])
+
+    components = {}
+    for node in parents:
+        components.setdefault(find(node), ([], []))[0].append(node)
+    for channel in channels:
+        if channel.interfaces:
+            components[find(channel.interfaces[0].node)][1].append(channel)
+    return list(components.values())
+
+class Partition:
+    """A Partition is a part of the scenario simulated by its own ns-3 process.
+
+    Its nodes are not connected to nodes of other partitions.
+    The coordinator (the process running the :class:`.Simulation`) forwards changes
+    of the nodes (e.g. :meth:`.Node.go_offline`) to the partition's process.
+
+    Parameters
+    ----------
+    index : int
+        The number of the partition.
+    nodes : list of :class:`.Node`
+        The nodes simulated in the partition.
+    channels : list of :class:`.Channel`
+        The channels simulated in the partition.
+    """
+
+    def __init__(self, index, nodes, channels):
+        #: The number of the partition.
+        self.index = index
+        #: The nodes simulated in the partition.
+        self.nodes = nodes
+        #: The channels simulated in the partition.
+        self.channels = channels
+        #: The process ID of the worker.
+        self.pid = None
+        #: The coordinator's end of the control channel.
+        self.connection = None
+        self.__lock = threading.Lock()
+
+    def forward(self, node, method, *args):
+        """Call a method of a node in the partition's process.
+
+        Parameters
+        ----------
+        node : :class:`.Node`
+            The node.
+        method : str
+            The name of the method.
+
+        Returns
+        -------
+        bool
+            Whether the call has been forwarded (i.e. the partition's process is running).
+        """
+        return self.__send((node.name, method, args), f'call {method} on {node.name}')
+
+    def forward_positions(self, nodes, positions):
+        """Set the positions of several nodes in the partition's process (see :func:`.set_positions`).
+
+        Parameters
+        ----------
+        nodes : list of :class:`.Node`
+            The nodes.
+        positions : list of tuple
+            The positions of the nodes.
+
+        Returns
+        -------
+        bool
+            Whether the positions have been forwarded (i.e. the partition's process is running).
+        """
+        return self.__send((None, 'set_positions', ([node.name for node in nodes], positions)),
+                           f'set the positions of {len(nodes)} nodes')
+
+    def __send(self, message, description):
+        with self.__lock:
+            if self.connection is None:
+                return False
+            try:
+                self.connection.send(message)
+            except (BrokenPipeError, EOFError, OSError):
+                logger.warning('Partition %d is not running, cannot %s', self.index, description)
+            return True
+
+    def stop(self):
+        """Ask the partition's process to stop simulating."""
+        with self.__lock:
+            if self.connection is None:
+                return
+            try:
+                self.connection.send(None)
+            except (BrokenPipeError, EOFError, OSError):
+                pass
+
+    def close(self):
+        """Close the control channel."""
+        with self.__lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def __str__(self):
+        return f'partition {self.index} ({len(self.nodes)} nodes, {len(self.channels)} channels)'
+
+class Partitioner:
+    """The Partitioner runs the connected components of a scenario in separate ns-3 processes.
+
+    A scenario with several independent networks would otherwise be bound to the single thread
+    of one ns-3 simulator. After the simulation has been prepared, one process per partition is forked.
+    Each process simulates its partition with its own realtime scheduler.
+    The other parts of the model are copied into every process, but their tap devices are not opened.
+
+    The coordinator keeps running the workflows and mobility inputs.
+    :meth:`.Node.go_offline`, :meth:`.Node.go_online` and :meth:`.Node.set_position` are forwarded
+    to the process simulating the node.
+
+    *Warning:* This does not work with a :class:`.NetAnimVisualization`, which needs a single simulator.
+
+    Parameters
+    ----------
+    channels : iterable of :class:`.Channel`
+        The channels of the scenario.
+    max_partitions : int
+        The maximum number of processes. Components are distributed by their number of nodes.
+    """
+
+    def __init__(self, channels, max_partitions):
+        components = sorted(connected_components(channels), key=lambda component: len(component[0]), reverse=True)
+        count = min(max_partitions, len(components))
+        #: The partitions.
+        self.partitions = [Partition(i, [], []) for i in range(count)]
+        for nodes, component_channels in components:
+            partition = min(self.partitions, key=lambda partition: len(partition.nodes))
+            partition.nodes.extend(nodes)
+            partition.channels.extend(component_channels)
+
+        for partition in self.partitions:
+            logger.info('Created %s', partition)
+            for node in partition.nodes:
+                node.partition = partition
+
+    def start(self, worker):
+        """Fork a process for every partition.
+
+        Parameters
+        ----------
+        worker : callable
+            The function to run in the processes with the :class:`Partition` as argument.
+            It should run the simulation until stopped.
+
+        Raises
+        ------
+        Exception
+            If a partition could not be started. The partitions started so far are stopped.
+        """
+        partition = None
+        try:
+            for partition in self.partitions:
+                self.__fork(partition, worker)
+
+            # Wait until all partitions are simulating.
+            for partition in self.partitions:
+                partition.connection.recv()
+        except (EOFError, OSError) as err:
+            self.stop()
+            self.wait()
+            raise Exception(f'Failed to start {partition}: {err or "the process exited"}') from err
+
+    def __fork(self, partition, worker):
+        """Fork the process of a partition."""
+        connection, worker_connection = Pipe()
+        pid = os.fork()
+        if pid == 0:
+            connection.close()
+            status = 0
+            try:
+                self.__run_worker(partition, worker_connection, worker)
+            except BaseException: # pylint: disable=broad-except
+                logger.exception('Partition %d failed', partition.index)
+                status = 1
+            finally:
+                # Do not run the coordinator's teardowns in the worker.
+                os._exit(status) # pylint: disable=protected-access
+        worker_connection.close()
+        partition.pid = pid
+        partition.connection = connection
+        logger.debug('Started %s as process %d', partition, pid)
+
+    def __run_worker(self, partition, connection, worker):
+        """Run the worker of a partition in the forked process."""
+        # The coordinator stops the partitions on ctrl + C.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        own = set(partition.nodes)
+        nodes = {}
+        for other in self.partitions:
+            for node in other.nodes:
+                node.partition = None
+                if node not in own:
+                    for interface in node.interfaces.values():
+                        if interface.tap_bridge is not None:
+                            interface.tap_bridge.Start(core.Seconds(DISABLED_START))
+                else:
+                    nodes[node.name] = node
+
+        def control():
+            try:
+                while True:
+                    message = connection.recv()
+                    if message is None:
+                        break
+                    name, method, args = message
+                    if name is None:
+                        # A batch of positions (see Partition.forward_positions).
+                        names, positions = args
+                        set_positions([nodes[node_name] for node_name in names], positions)
+                    else:
+                        getattr(nodes[name], method)(*args)
+            except EOFError:
+                pass
+            logger.debug('Stopping partition %d', partition.index)
+            core.Simulator.Stop()
+
+        threading.Thread(target=control, daemon=True).start()
+        core.Simulator.Schedule(core.Seconds(0), lambda: connection.send(True))
+        worker(partition)
+
+    def stop(self):
+        """Stop all partitions."""
+        for partition in self.partitions:
+            partition.stop()
+
+    def wait(self):
+        """Wait for all processes to exit.
+
+        Returns
+        -------
+        list of :class:`Partition`
+            The partitions that failed.
+        """
+        failed = []
+        for partition in self.partitions:
+            if partition.pid is None:
+                continue
+            _, status = os.waitpid(partition.pid, 0)
+            if status != 0:
+                logger.error('%s exited with status %d', partition, status)
+                failed.append(partition)
+            partition.pid = None
+            partition.close()
+        return failed
@@ -0,0 +1,256 @@
+"""Instrumentation of ns-3's realtime scheduler and time-dilated simulations."""
+
+import csv
+import logging
+import os
+import time
+
+from ns import core
+
+logger = logging.getLogger(__name__)
+
+class RealtimeMonitor:
+    """The RealtimeMonitor samples how far the simulation lags behind the wall clock.
+
+    A sampling event is scheduled periodically in the simulation.
+    The realtime scheduler executes it when the wall clock reaches its simulation time,
+    or later if the simulator cannot keep up. The difference is the lag.
+    If the lag grows, all delays and data rates measured in the simulation are wrong.
+
+    The samples are written to the log directory:
+
+    * :code:`realtime-lag.csv` contains the time series (simulation time, wall time,
+      lag, jitter, i.e. the change of the lag since the previous sample, and clock rate).
+    * :code:`realtime-lag-histogram.csv` contains the histogram of the lag.
+
+    Parameters
+    ----------
+    interval : float
+        The sampling interval in (simulated) seconds.
+    threshold : float
+        A warning is logged, when the lag exceeds this threshold in seconds.
+    bin_width : float
+        The width of the histogram bins in seconds.
+    time_dilation : :class:`TimeDilation`
+        If the simulation is time-dilated, the lag is measured against the dilated clock.
+        An adaptive time dilation is adjusted to the measured lag.
+    """
+
+    def __init__(self, interval=0.1, threshold=0.1, bin_width=0.001, time_dilation=None):
+        #: The sampling interval in seconds.
+        self.interval = interval
+        #: The lag (in seconds) to warn at.
+        self.threshold = threshold
+        #: The width of a histogram bin in seconds.
+        self.bin_width = bin_width
+        #: The time dilation of the simulation (if any).
+        self.time_dilation = time_dilation
+
+        #: The samples as (simulation time, wall time, lag, clock rate) tuples.
+        self.samples = []
+        #: The number of samples per histogram bin.
+        self.histogram = {}
+
+        self.__wall_start = None
+        self.__sim_start = None
+        self.__lagging = False
+        self.__running = False
+
+    @property
+    def lag(self):
+        """float: The last measured lag in seconds (:code:`0` before the first sample)."""
+        if not self.samples:
+            return 0
+        return self.samples[-1][2]
+
+    @property
+    def max_lag(self):
+        """float: The maximum measured lag in seconds."""
+        return max((sample[2] for sample in self.samples), default=0)
+
+    def start(self):
+        """Schedule the first sample at the current simulation time."""
+        self.__running = True
+        core.Simulator.Schedule(core.Seconds(0), self.__sample)
+
+    def stop(self):
+        """Stop sampling."""
+        self.__running = False
+
+    def __sample(self):
+        if not self.__running:
+            return
+        wall_now = time.monotonic()
+        sim_now = core.Simulator.Now().GetSeconds()
+        if self.__wall_start is None:
+            self.__wall_start = wall_now
+            self.__sim_start = sim_now
+        wall_time = wall_now - self.__wall_start
+        if self.time_dilation is None:
+            lag = wall_time - (sim_now - self.__sim_start)
+            rate = 1
+        else:
+            lag = wall_now - self.time_dilation.expected_wall_time(sim_now)
+            rate = self.time_dilation.rate
+        self.samples.append((sim_now, wall_time, lag, rate))
+
+        histogram_bin = int(max(lag, 0) // self.bin_width)
+        self.histogram[histogram_bin] = self.histogram.get(histogram_bin, 0) + 1
+
+        # Only warn when the lag starts to exceed the threshold, not for every sample.
+        if lag > self.threshold and not self.__lagging:
+            logger.warning('The simulation lags %.3fs behind real time at %.3fs. '
+                           'Delays and data rates are not accurate.', lag, sim_now)
+        elif lag <= self.threshold and self.__lagging:
+            logger.info('The simulation caught up with real time at %.3fs.', sim_now)
+        self.__lagging = lag > self.threshold
+
+        if self.time_dilation is not None and self.time_dilation.adaptive:
+            self.time_dilation.adapt(lag, self.threshold)
+
+        core.Simulator.Schedule(core.Seconds(self.interval), self.__sample)
+
+    def write(self, directory, name='realtime-lag'):
+        """Write the time series and the histogram to a directory.
+
+        Parameters
+        ----------
+        directory : str
+            The path to the directory to put the files in.
+        name : str
+            The prefix of the file names.
+        """
+        if not self.samples:
+            return
+        with open(os.path.join(directory, f'{name}.csv'), 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['simulation_time', 'wall_time', 'lag', 'jitter', 'clock_rate'])
+            previous = self.samples[0][2]
+            for sim_time, wall_time, lag, rate in self.samples:
+                writer.writerow([f'{sim_time:.6f}', f'{wall_time:.6f}', f'{lag:.6f}', f'{lag - previous:.6f}',
+                                 f'{rate:.6f}'])
+                previous = lag
+
+        with open(os.path.join(directory, f'{name}-histogram.csv'), 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['lag_from', 'lag_to', 'count'])
+            for histogram_bin in sorted(self.histogram):
+                writer.writerow([f'{histogram_bin * self.bin_width:.6f}',
+                                 f'{(histogram_bin + 1) * self.bin_width:.6f}',
+                                 self.histogram[histogram_bin]])
+
+        logger.info('Real time lag: max %.3fs, last %.3fs (%d samples)', self.max_lag, self.lag, len(self.samples))
+
+class TimeDilation:
+    """The TimeDilation lets simulated time advance at a fraction of the wall clock.
+
+    Large scenarios (e.g. dense WiFi topologies) cannot be simulated in real time on a single host.
+    Instead of ns-3's realtime scheduler, the default scheduler is used and paced by a periodic event,
+    which sleeps until the wall clock reaches the (dilated) time of the event.
+    Thus, one simulated second takes :code:`1 / rate` seconds.
+    The containers still run in real time, so their timeouts and rates have to be scaled accordingly.
+
+    :meth:`.Workflow.sleep` and the SUMO stepping use the dilated clock.
+
+    Parameters
+    ----------
+    rate : float
+        The fraction of wall clock time the simulated time advances with (:code:`0 < rate <= 1`).
+    adaptive : bool
+        Whether to adapt the rate to the lag measured by the :class:`RealtimeMonitor`.
+        The rate is halved, when the simulation lags behind, and raised slowly, when it keeps up.
+    min_rate : float
+        The lowest rate for the adaptive mode.
+    resolution : float
+        The interval of the pacing event in simulated seconds.
+        Packets from the containers are scheduled with this granularity.
+    """
+
+    #: The number of consecutive samples without lag before the adaptive rate is raised.
+    STEADY_SAMPLES = 50
+
+    def __init__(self, rate, adaptive=False, min_rate=0.01, resolution=0.001):
+        if not 0 < rate <= 1:
+            raise ValueError('The clock rate has to be in (0, 1].')
+        #: The current clock rate.
+        self.rate = rate
+        #: The highest rate for the adaptive mode (the initial rate).
+        self.max_rate = rate
+        #: The lowest rate for the adaptive mode.
+        self.min_rate = min_rate
+        #: Whether to adapt the rate to the measured lag.
+        self.adaptive = adaptive
+        #: The interval of the pacing event in simulated seconds.
+        self.resolution = resolution
+
+        self.__sim_anchor = None
+        self.__wall_anchor = None
+        self.__steady = 0
+
+    def start(self):
+        """Schedule the pacing event."""
+        core.Simulator.Schedule(core.Seconds(0), self.__pace)
+
+    def expected_wall_time(self, sim_time):
+        """Return the wall clock time (:func:`time.monotonic`) a simulation time is due at.
+
+        Parameters
+        ----------
+        sim_time : float
+            The simulation time in seconds.
+        """
+        if self.__wall_anchor is None:
+            self.__sim_anchor = sim_time
+            self.__wall_anchor = time.monotonic()
+        return self.__wall_anchor + (sim_time - self.__sim_anchor) / self.rate
+
+    def wall_duration(self, duration):
+        """Return the wall clock duration of a simulated duration.
+
+        Parameters
+        ----------
+        duration : float
+            The duration in simulated seconds.
+        """
+        return duration / self.rate
+
+    def set_rate(self, rate):
+        """Change the clock rate.
+
+        The accumulated lag is dropped. This has to be called in the simulation thread.
+
+        Parameters
+        ----------
+        rate : float
+            The new clock rate.
+        """
+        logger.info('Changing the clock rate from %.3f to %.3f', self.rate, rate)
+        self.__sim_anchor = core.Simulator.Now().GetSeconds()
+        self.__wall_anchor = time.monotonic()
+        self.rate = rate
+
+    def adapt(self, lag, threshold):
+        """Adapt the rate to the measured lag.
+
+        Parameters
+        ----------
+        lag : float
+            The lag in seconds.
+        threshold : float
+            The lag in seconds, which is too much.
+        """
+        if lag > threshold:
+            self.__steady = 0
+            if self.rate > self.min_rate:
+                self.set_rate(max(self.min_rate, self.rate / 2))
+        elif lag < threshold / 10:
+            self.__steady += 1
+            if self.__steady >= self.STEADY_SAMPLES and self.rate < self.max_rate:
+                self.__steady = 0
+                self.set_rate(min(self.max_rate, self.rate * 1.25))
+
+    def __pace(self):
+        delay = self.expected_wall_time(core.Simulator.Now().GetSeconds()) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        core.Simulator.Schedule(core.Seconds(self.resolution), self.__pace)
@@ -2,8 +2,11 @@
 
 import logging
 
+from ns import core
+
 from .simulation import Simulation
 from .context import Context, SimpleContext
+from .images import acquire_images
 
 logger = logging.getLogger(__name__)
 
@@ -20,9 +23,56 @@ class Scenario:
         ...
         with scenario as simulation:
             simulation.simulate(simulation_time=60)
+
+    Parameters
+    ----------
+    prepare_workers : int
+        The maximum number of nodes to prepare concurrently.
+        Preparing a node builds or pulls its image, starts the container and sets up its interfaces.
+        The default of :code:`1` prepares one node after another.
+    image_workers : int
+        The maximum number of images to pull or build concurrently before the nodes are prepared.
+    synchronization_mode : str
+        The synchronization mode of ns-3's realtime scheduler.
+        With :code:`'BestEffort'` the simulation continues when it falls behind the wall clock,
+        with :code:`'HardLimit'` it is aborted when lagging more than :code:`hard_limit`.
+    hard_limit : float
+        The maximum lag in seconds for the :code:`'HardLimit'` synchronization mode.
+        :code:`None` keeps ns-3's default.
+    lag_interval : float
+        The interval (in simulated seconds) to sample the lag behind the wall clock in.
+        See :class:`.RealtimeMonitor`.
+    lag_threshold : float
+        A warning is logged, when the lag exceeds this threshold in seconds.
+    clock_rate : float
+        Run the simulation time-dilated: the simulated time advances at this fraction of the wall clock
+        (see :class:`.TimeDilation`). :code:`None` uses ns-3's realtime scheduler.
+        **Warning:** The scheduler is chosen when the scenario is created,
+        so create the scenario before any node.
+    adaptive_clock_rate : bool
+        Lower the clock rate when the simulation lags behind and raise it up to :code:`clock_rate` again,
+        when it keeps up.
+    partitions : int
+        The maximum number of ns-3 processes. If greater than :code:`1`, the independent parts
+        (connected components) of the scenario are simulated in separate processes (see :class:`.Partitioner`).
+    distribution : :class:`.Distribution`
+        Distribute the nodes over several hosts, each running this scenario.
+        See :meth:`.Distribution.from_environment`.
+    capture : :class:`.CapturePolicy`
+        The default capture policy of all channels. By default, every interface is captured completely.
+    flow_monitor : bool
+        Collect per-flow statistics with ns-3's FlowMonitor (see :class:`.FlowMonitor`).
+    metrics : :class:`.MetricsExporter`
+        Export live metrics of the simulation (e.g. to InfluxDB).
+    resource_interval : float
+        Record the CPU, memory and network usage of the containers in this interval (in seconds,
+        e.g. :code:`0.1`). See :class:`.ResourceSampler`. :code:`None` disables the recording.
     """
 
-    def __init__(self):
+    def __init__(self, prepare_workers=1, image_workers=4, synchronization_mode='BestEffort', hard_limit=None,
+                 lag_interval=0.1, lag_threshold=0.1, clock_rate=None, adaptive_clock_rate=False,
+                 partitions=1, distribution=None, capture=None, flow_monitor=False,
+                 metrics=None, resource_interval=None):
         #: All networks belonging to the scenario.
         self.networks = set()
         #: The workflows to be executed.
@@ -38,6 +88,52 @@ class Scenario:
         self.context = None
         self.mobility_inputs = []
 
+        if prepare_workers < 1:
+            raise ValueError('Please use at least one worker for preparing nodes.')
+        #: The maximum number of nodes being prepared concurrently.
+        self.prepare_workers = prepare_workers
+        #: The maximum number of images being acquired concurrently.
+        self.image_workers = image_workers
+
+        if synchronization_mode not in ('BestEffort', 'HardLimit'):
+            raise ValueError(f'Unknown synchronization mode "{synchronization_mode}".')
+        #: The synchronization mode of the realtime scheduler.
+        self.synchronization_mode = synchronization_mode
+        #: The maximum lag in seconds for the :code:`'HardLimit'` synchronization mode.
+        self.hard_limit = hard_limit
+        #: The sampling interval of the lag in seconds.
+        self.lag_interval = lag_interval
+        #: The lag in seconds to warn at.
+        self.lag_threshold = lag_threshold
+
+        if clock_rate is not None and not 0 < clock_rate <= 1:
+            raise ValueError('The clock rate has to be in (0, 1].')
+        #: The fraction of wall clock time the simulation advances with (:code:`None` for real time).
+        self.clock_rate = clock_rate
+        #: Whether to adapt the clock rate to the measured lag.
+        self.adaptive_clock_rate = adaptive_clock_rate
+        if partitions < 1:
+            raise ValueError('Please use at least one partition.')
+        #: The maximum number of ns-3 processes.
+        self.partitions = partitions
+        #: The distribution of the nodes over hosts (if any).
+        self.distribution = distribution
+        #: The default capture policy of all channels.
+        self.capture_policy = capture
+        #: Whether to collect per-flow statistics with ns-3's FlowMonitor.
+        self.flow_monitor = flow_monitor
+        #: The exporter of live metrics (if any).
+        self.metrics = metrics
+        #: The interval to record the containers' resource usage in (if any).
+        self.resource_interval = resource_interval
+
+        # The realtime scheduler cannot be slowed down. The default scheduler is paced instead.
+        # The binding is set for every scenario, so a later scenario in the same process does not
+        # inherit the scheduler of a time-dilated one. It only has an effect, if no ns-3 object
+        # has been created since the last simulation (the simulator is created with the first node).
+        implementation = "ns3::DefaultSimulatorImpl" if clock_rate is not None else "ns3::RealtimeSimulatorImpl"
+        core.GlobalValue.Bind("SimulatorImplementationType", core.StringValue(implementation))
+
     def add_network(self, network):
         """Add a network to be simulated.
 
@@ -98,6 +194,17 @@ class Scenario:
                     seen.add(node)
                     yield node
 
+    def acquire_images(self):
+        """Pull and build the distinct images of all nodes concurrently.
+
+        This is done by the simulation before any container is started. It can also be
+        called without running a simulation, e.g. to prewarm a CI host.
+        """
+        nodes = self.nodes()
+        if self.distribution is not None:
+            nodes = (node for node in nodes if self.distribution.is_local(node))
+        acquire_images((node.image_source() for node in nodes), max_workers=self.image_workers)
+
     def workflow(self, func):
         """Add a workflow to the scenario.
 
@@ -4,15 +4,22 @@ import logging
 import os
 import threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 from ns import core, internet
-from pyroute2 import IPRoute
 
 import docker
 
 from .util import once
-from .context import defer
+from .clients import docker_client, set_docker_pool_size, DEFAULT_DOCKER_POOL_SIZE
+from .context import Context, NoContext, defer
+from .interface import setup_host_links
+from .node import DockerNode
+from .netlink import NetlinkSession
+from .metrics.resources import ResourceSampler
+from .partition import Partitioner
+from .realtime import RealtimeMonitor, TimeDilation
 from .workflow import Workflow
 from .visualization import Visualization, NoVisualization
 
@@ -27,6 +34,24 @@ core.GlobalValue.Bind("ChecksumEnabled", core.BooleanValue(True))
 # core.LogComponentEnable('MacLow', core.LOG_DEBUG)
 # core.LogComponentEnable('Txop', core.LOG_DEBUG)
 
+class PrepareError(Exception):
+    """Preparing one or more nodes failed.
+
+    Nodes, that have been (partially) set up, are still registered in the current context
+    and will be torn down.
+
+    Parameters
+    ----------
+    errors : list of tuple
+        The failed :class:`.Node` and the exception raised while preparing it.
+    """
+
+    def __init__(self, errors):
+        names = ', '.join(node.name for node, _ in errors)
+        super().__init__(f'Failed to prepare {len(errors)} node(s): {names}')
+        #: The failed nodes and their exceptions.
+        self.errors = errors
+
 class Simulation:
     """ The simulation runs ns-3.
     The simulation is described by a :class:`.Scenario` which also prepares the simulation.
@@ -55,18 +80,20 @@ class Simulation:
         date = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
         #: The log directory for all logs
         self.log_directory = os.path.join(os.getcwd(), 'simulation-logs', date)
+        if scenario.distribution is not None:
+            # The hosts may share the working directory (see tools/distributed-netns).
+            self.log_directory = os.path.join(self.log_directory, scenario.distribution.local.name)
         os.makedirs(self.log_directory, exist_ok=True)
 
         self.visualization = scenario.visualization or NoVisualization()
         self.visualization.set_output_directory(self.log_directory)
-        # Refresh the position of all nodes for the new object
-        for node in scenario.nodes():
-            self.visualization.set_node_position(node, *node.position)
+        # The nodes are positioned by their mobility models, which are installed at Node.position when
+        # the simulation is prepared. Positioning them here would attach a model before the mobility inputs.
         Visualization.set_visualization(self.visualization)
 
         #: A docker runtime client for checking whether there is an
         #: influxdb running for monitoring purposes.
-        self.docker_client = docker.DockerClient()
+        self.docker_client = docker_client()
 
         # Saves IP -> hostname.
         #: All hosts of the simulation for mapping in nodes.
@@ -79,6 +106,21 @@ class Simulation:
         #:
         #: Determined by the scenario.
         self.workflows = []
+        #: The tcpdump captures to start after the nodes have been prepared.
+        self.captures = []
+        #: The partitioner (if the scenario is simulated in several processes).
+        self.partitioner = None
+        #: The time dilation (if the scenario has a clock rate).
+        self.time_dilation = None
+        if scenario.clock_rate is not None:
+            self.time_dilation = TimeDilation(scenario.clock_rate, adaptive=scenario.adaptive_clock_rate)
+        #: The ns-3 FlowMonitor (if enabled by the scenario).
+        self.flow_monitor = None
+        #: Records the containers' resource usage (if enabled by the scenario).
+        self.resource_sampler = None
+        #: Samples the lag of the simulation behind the wall clock.
+        self.realtime_monitor = RealtimeMonitor(interval=scenario.lag_interval, threshold=scenario.lag_threshold,
+                                                time_dilation=self.time_dilation)
 
     @classmethod
     @once
@@ -100,11 +142,20 @@ class Simulation:
         """
         logger.info('Preparing simulation')
 
+        # Every container holds two connections for its log streams.
+        docker_nodes = sum(1 for node in self.scenario.nodes() if isinstance(node, DockerNode))
+        workers = self.scenario.prepare_workers + self.scenario.image_workers
+        set_docker_pool_size(max(DEFAULT_DOCKER_POOL_SIZE, 2 * docker_nodes + workers))
+        self.docker_client = docker_client()
+
         # Add host to hostsfile.
-        ipr = IPRoute()
-        host_ip = ipr.get_addr(label='docker0')[0].get_attr('IFA_ADDRESS')
+        session = NetlinkSession.get()
+        with session.lock:
+            host_addresses = session.ipr.get_addr(label='docker0')
         self.hosts = defaultdict(list)
-        self.hosts['host'].append(host_ip)
+        # There is no docker0 within a network namespace standing in for a host (see tools/distributed-netns).
+        for host_address in host_addresses[:1]:
+            self.hosts['host'].append(host_address.get_attr('IFA_ADDRESS'))
 
         # Try to add influxdb to hosts file (if container is running).
         try:
@@ -121,22 +172,125 @@ class Simulation:
                 if interface.address is not None:
                     self.hosts[interface.node.name].append(interface.address.ip)
 
+        logger.info('Acquiring images for simulation.')
+        self.scenario.acquire_images()
+
         logger.info('Preparing networks for simulation.')
         for (i, network) in enumerate(self.scenario.networks):
             network.prepare(self, i)
 
         logger.info('Preparing nodes for simulation and visualization.')
-        for node in self.scenario.nodes():
+        nodes = list(self.scenario.nodes())
+        for node in nodes:
             Visualization.get_visualization().prepare_node(node)
-            node.prepare(self)
+        distribution = self.scenario.distribution
+        if distribution is not None:
+            logger.info('Preparing tunnels to other hosts (this is %s).', distribution.local)
+            distribution.setup_tunnels(self.scenario.channels())
+            distribution.setup_remote_nodes(nodes)
+            nodes = [node for node in nodes if distribution.is_local(node)]
+        setup_host_links([interface for node in nodes if node.wants_host_bridge()
+                          for interface in node.interfaces.values()],
+                         [interface for node in nodes if node.wants_host_veth()
+                          for interface in node.interfaces.values()])
+        self.__prepare_nodes(nodes)
+
+        if self.captures:
+            logger.info('Starting %d captures.', len(self.captures))
+            for capture in self.captures:
+                capture.start()
 
         logger.info('Preparing mobility inputs for simulation.')
-        for mobility_input in self.scenario.mobility_inputs:
+        for mobility_input in self.__mobility_inputs():
             mobility_input.prepare(self)
+        # All nodes without a model of a mobility input stay where they are.
+        for node in self.scenario.nodes():
+            node.install_mobility_model()
 
         routing_helper = internet.Ipv4GlobalRoutingHelper
         routing_helper.PopulateRoutingTables()
 
+        if self.scenario.flow_monitor:
+            # ns-3's flow-monitor module is only loaded if it is used.
+            from .flowmonitor import FlowMonitor # pylint: disable=import-outside-toplevel
+            self.flow_monitor = FlowMonitor()
+            self.flow_monitor.install(self.scenario.nodes())
+
+    def __prepare_nodes(self, nodes):
+        """Prepare the nodes, concurrently if the scenario allows more than one worker.
+
+        The workers defer their teardowns into the context of the calling thread.
+        Calls into ns-3 are serialized by :data:`.util.ns3_lock`.
+
+        Parameters
+        ----------
+        nodes : list of :class:`.Node`
+            The nodes to prepare.
+        """
+        workers = min(self.scenario.prepare_workers, len(nodes))
+        if workers <= 1:
+            for node in nodes:
+                node.prepare(self)
+            return
+
+        logger.info('Preparing %d nodes with %d workers.', len(nodes), workers)
+        ctx = Context.current() or NoContext()
+
+        def prepare_node(node):
+            with ctx.attach():
+                node.prepare(self)
+
+        errors = []
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prepare') as executor:
+            futures = {executor.submit(prepare_node, node): node for node in nodes}
+            for future in as_completed(futures):
+                node = futures[future]
+                err = future.exception()
+                if err is not None:
+                    logger.error('Failed to prepare node %s: %s', node.name, err)
+                    errors.append((node, err))
+        if errors:
+            raise PrepareError(errors)
+
+    def __configure_realtime(self):
+        """Apply the scenario's settings to the realtime scheduler (or start the time dilation)."""
+        implementation = core.Simulator.GetImplementation()
+        if self.time_dilation is not None:
+            if implementation.GetInstanceTypeId().GetName() != 'ns3::DefaultSimulatorImpl':
+                raise Exception('A time-dilated simulation needs the default scheduler. '
+                                'Please create the Scenario before any Node.')
+            logger.info('Simulating with a clock rate of %.3f', self.time_dilation.rate)
+            self.time_dilation.start()
+            return
+        if implementation.GetInstanceTypeId().GetName() != 'ns3::RealtimeSimulatorImpl':
+            raise Exception('The simulation needs the realtime scheduler. '
+                            'Please create the Scenario before any Node.')
+        implementation.SetAttribute('SynchronizationMode', core.StringValue(self.scenario.synchronization_mode))
+        if self.scenario.hard_limit is not None:
+            implementation.SetAttribute('HardLimit', core.TimeValue(core.Seconds(self.scenario.hard_limit)))
+        logger.debug('Realtime synchronization mode: %s', self.scenario.synchronization_mode)
+
+    def __is_coordinator(self):
+        """Return whether this host runs the workflows and mobility inputs."""
+        distribution = self.scenario.distribution
+        return distribution is None or distribution.is_coordinator()
+
+    def __mobility_inputs(self):
+        """Return the mobility inputs to run on this host."""
+        if not self.__is_coordinator():
+            return []
+        return self.scenario.mobility_inputs
+
+    def __start_workflows(self):
+        """Start a workflow for every task of the scenario (on the coordinator only)."""
+        if not self.__is_coordinator():
+            return
+        logger.debug('Starting workflows.')
+        for task in self.scenario.workflows:
+            workflow = Workflow(task, time_dilation=self.time_dilation)
+            self.workflows.append(workflow)
+            workflow.start()
+
     def __stop_workflows(self):
         """Stop all running workflows."""
         logger.info('Stopping Workflows.')
@@ -158,6 +312,10 @@ class Simulation:
             self.__simulate(simulation_time)
         except KeyboardInterrupt:
             pass
+        finally:
+            if self.resource_sampler is not None:
+                self.resource_sampler.stop()
+                self.resource_sampler.report(self.log_directory)
 
     def __simulate(self, simulation_time=None):
         """Simulate the network.
@@ -176,12 +334,28 @@ class Simulation:
 
         self.prepare()
 
+        self.__configure_realtime()
+        self.realtime_monitor.start()
+
+        if self.scenario.partitions > 1:
+            if not isinstance(self.visualization, NoVisualization):
+                raise Exception('A partitioned simulation cannot be visualized.')
+            self.partitioner = Partitioner(self.scenario.channels(), self.scenario.partitions)
+            if len(self.partitioner.partitions) > 1:
+                self.__simulate_partitioned(simulation_time)
+                return
+            # Only one component, so there is nothing to gain.
+            for partition in self.partitioner.partitions:
+                for node in partition.nodes:
+                    node.partition = None
+            self.partitioner = None
+
+        self.__start_metrics()
         started = threading.Semaphore(0)
-
         core.Simulator.Schedule(core.Seconds(0), started.release)
 
         logger.info('Starting MobilityInputs.')
-        for mobility_input in self.scenario.mobility_inputs:
+        for mobility_input in self.__mobility_inputs():
             mobility_input.start()
             defer('stop mobility input', mobility_input.destroy)
 
@@ -194,6 +368,8 @@ class Simulation:
             if simulation_time is not None:
                 core.Simulator.Stop(core.Seconds(simulation_time))
             core.Simulator.Run()
+            if self.flow_monitor is not None:
+                self.flow_monitor.write(self.log_directory)
             core.Simulator.Destroy()
 
         thread = threading.Thread(target=run_simulation)
@@ -202,14 +378,65 @@ class Simulation:
             thread.start()
             started.acquire()
 
-            logger.debug('Starting workflows.')
-            for task in self.scenario.workflows:
-                workflow = Workflow(task)
-                self.workflows.append(workflow)
-                workflow.start()
+            self.__start_workflows()
             thread.join()
         finally:
             # Stopping the workflows cannot be deferred, because
             # the deferred items won't be cleaned up, until workflows ended.
             self.__stop_workflows()
             core.Simulator.Stop()
+            self.realtime_monitor.stop()
+            self.realtime_monitor.write(self.log_directory)
+
+    def __start_metrics(self):
+        """Start the metrics exporter and the resource sampler (if any).
+
+        In a partitioned simulation, this has to happen after the partitions have been forked,
+        so their processes do not inherit the threads (and the locks and file buffers they hold).
+        """
+        if self.scenario.metrics is not None:
+            self.scenario.metrics.start(self)
+            defer('stop metrics exporter', self.scenario.metrics.stop)
+        if self.scenario.resource_interval is not None:
+            self.resource_sampler = ResourceSampler(self.scenario.nodes(), self.scenario.resource_interval)
+            self.resource_sampler.start(self.log_directory)
+
+    def __simulate_partitioned(self, simulation_time):
+        """Simulate the partitions in separate processes.
+
+        This process coordinates: it runs the mobility inputs and workflows and forwards
+        their changes to the partitions.
+
+        Parameters
+        ----------
+        simulation_time : float
+            The simulation timeout in seconds.
+        """
+        def worker(partition):
+            if simulation_time is not None:
+                core.Simulator.Stop(core.Seconds(simulation_time))
+            try:
+                core.Simulator.Run()
+            finally:
+                self.realtime_monitor.write(self.log_directory, f'realtime-lag-partition-{partition.index}')
+                if self.flow_monitor is not None:
+                    self.flow_monitor.write(self.log_directory, f'flow-monitor-partition-{partition.index}')
+                core.Simulator.Destroy()
+
+        logger.info('Simulating %d partitions in separate processes', len(self.partitioner.partitions))
+        try:
+            self.partitioner.start(worker)
+            self.__start_metrics()
+            logger.info('Starting MobilityInputs.')
+            for mobility_input in self.__mobility_inputs():
+                mobility_input.start()
+                defer('stop mobility input', mobility_input.destroy)
+
+            self.__start_workflows()
+            failed = self.partitioner.wait()
+            if failed:
+                raise Exception(f'{len(failed)} partition(s) failed')
+        finally:
+            self.__stop_workflows()
+            self.partitioner.stop()
+            self.partitioner.wait()
@@ -1,8 +1,20 @@
 """Internal utility functions."""
 import colorsys
+import contextlib
 import functools
+import importlib
+import sys
+import threading
+import time
 import weakref
 
+#: Serializes calls into the ns-3 bindings.
+#:
+#: The ns-3 object model is not thread-safe. Nodes may be prepared in parallel (see
+#: :attr:`.Scenario.prepare_workers`), so creating ns-3 objects during preparation
+#: has to hold this lock.
+ns3_lock = threading.RLock()
+
 # from http://stackoverflow.com/questions/4103773/efficient-way-of-having-a-function-only-execute-once-in-a-loop
 def once(func):
     """Runs a method (successfully) only once per instance."""
@@ -23,6 +35,54 @@ def once(func):
 
     return wrapper
 
+@contextlib.contextmanager
+def log_duration(logger, message, *args):
+    """Log the duration of a block (at debug level).
+
+    Parameters
+    ----------
+    logger : :class:`logging.Logger`
+        The logger to use.
+    message : str
+        A description of the block, formatted with :code:`args`.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        logger.debug(message + ' took %.3fs', *args, time.perf_counter() - start)
+
+def lazy_attributes(module_name, attributes):
+    """Load the attributes of a package on first access (see :pep:`562`).
+
+    This keeps importing a package cheap: the submodules (and their dependencies,
+    e.g. ns-3 modules or container runtimes) are only imported when used.
+
+    Parameters
+    ----------
+    module_name : str
+        The name of the package (:code:`__name__`).
+    attributes : dict
+        The submodule (relative to the package) for every attribute name.
+
+    Returns
+    -------
+    tuple
+        The :code:`__getattr__` and :code:`__dir__` functions for the package.
+    """
+    def __getattr__(name):
+        if name not in attributes:
+            raise AttributeError(f'module {module_name!r} has no attribute {name!r}')
+        value = getattr(importlib.import_module(attributes[name], module_name), name)
+        # Cache the value, so __getattr__ is not called again.
+        setattr(sys.modules[module_name], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[module_name])) | set(attributes))
+
+    return __getattr__, __dir__
+
 def network_color_for(network, number_of_networks):
     """Calculates a color on the hue-spectrum for a specific network.
 
@@ -1,9 +1,10 @@
 """NetAnim Visualization using the NetAnim format."""
 
 import os
-from ns import netanim
+from ns import core, mobility, netanim
 
 from .visualization import Visualization
+from ..node.base import NO_CONTEXT
 
 class NetAnimVisualization(Visualization):
     """The NetAnimVisualization class produces a netanim.xml file which
@@ -39,7 +40,25 @@ class NetAnimVisualization(Visualization):
         )
 
     def set_node_position(self, node, x, y, z=0):
-        netanim.AnimationInterface.SetConstantPosition(node.ns3_node, x, y, z)
+        # The position may be changed by any thread, so the models are moved by an event.
+        model = node.ns3_node.GetObject(mobility.ConstantPositionMobilityModel.GetTypeId())
+        if model is not None:
+            core.Simulator.ScheduleWithContext(NO_CONTEXT, core.Seconds(0),
+                                               lambda: self.set_node_positions({node: (x, y, z)}))
+
+    def set_node_positions(self, positions):
+        # NetAnim draws the nodes at the positions of their mobility models.
+        # In contrast to AnimationInterface.SetConstantPosition, no model is aggregated to a node without one,
+        # as the simulation installs the models (at the node's position) when it is prepared.
+        # Models already at their position (e.g. moved by set_positions) are skipped, so NetAnim does not
+        # record the same course change twice.
+        for node, (x, y, z) in positions.items(): # pylint: disable=invalid-name
+            model = node.ns3_node.GetObject(mobility.ConstantPositionMobilityModel.GetTypeId())
+            if model is None:
+                continue
+            current = model.GetPosition()
+            if (current.x, current.y, current.z) != (x, y, z):
+                model.SetPosition(core.Vector(x, y, z))
 
     def _prepare(self):
         if self.animation_interface is None:
@@ -1,6 +1,9 @@
 """Visualizations to display simulation results."""
 
+import threading
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
 from aexpr import aexpr
 
 class Visualization(ABC):
@@ -40,6 +43,8 @@ class Visualization(ABC):
         self.node_size = 4
         #: The output directory
         self.output_directory = None
+        # Whether position changes are ignored (per thread, see suspended()).
+        self.__suspended = threading.local()
 
     def set_node_size(self, new_node_size: float):
         """Sets a new node size
@@ -72,7 +77,38 @@ class Visualization(ABC):
         """
         # Every change at the position of node will be recognized
         aexpr(lambda: node.position, globals(), locals())\
-        .on_change(lambda obs, oldv, newv: self.set_node_position(node, *newv))
+        .on_change(lambda obs, oldv, newv: self.__position_changed(node, newv))
+
+    def __position_changed(self, node, position):
+        if not getattr(self.__suspended, 'value', False):
+            self.set_node_position(node, *position)
+
+    @contextmanager
+    def suspended(self):
+        """Ignore the position changes of the current thread.
+
+        This is used by :func:`.set_positions`, which calls :meth:`set_node_positions`
+        for all nodes at once instead.
+        """
+        previous = getattr(self.__suspended, 'value', False)
+        self.__suspended.value = True
+        try:
+            yield
+        finally:
+            self.__suspended.value = previous
+
+    def set_node_positions(self, positions):
+        """Set the positions of several nodes in the visualization.
+
+        :func:`.set_positions` calls this in the simulation thread.
+
+        Parameters
+        ----------
+        positions : dict
+            The positions (x, y, z) by :class:`.Node`.
+        """
+        for node, position in positions.items():
+            self.set_node_position(node, *position)
 
     @abstractmethod
     def set_node_position(self, node, x, y, z=0):
@@ -102,5 +138,8 @@ class NoVisualization(Visualization):
     def prepare_node(self, node):
         pass
 
+    def set_node_positions(self, positions):
+        pass
+
     def set_node_position(self, node, x, y, z=0):
         pass
@@ -34,14 +34,18 @@ class Workflow:
     ----------
     task : callable
         The function to be executed in the workflow.
+    time_dilation : :class:`.TimeDilation`
+        The time dilation of the simulation (if any) to scale the sleep durations with.
     """
-    def __init__(self, task):
+    def __init__(self, task, time_dilation=None):
         #: An event indicating when to stop the workflow thread.
         self.stop_event = threading.Event()
         #: These events are waiting on some condition to come true.
         self.current_waiting_events = []
         #: The function being executed by the workflow thread.
         self.task = task
+        #: The time dilation of the simulation.
+        self.time_dilation = time_dilation
 
     def stop(self):
         """Stop the workflow.
@@ -74,10 +78,13 @@ class Workflow:
         Parameters
         ----------
         duration : float
-            The duration to sleep in seconds.
+            The duration to sleep in (simulated) seconds.
         """
         logger.debug('Sleep for %gs.', duration)
-        close = self.stop_event.wait(duration)
+        wall_duration = duration
+        if self.time_dilation is not None:
+            wall_duration = self.time_dilation.wall_duration(duration)
+        close = self.stop_event.wait(wall_duration)
         logger.debug('Slept for %ds or stopped.', duration)
         if close is True:
             self.__stopped()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+# Run on one machine with: sudo ../tools/distributed-netns --hosts a,b -- distributed_example.py
+# On real hosts, set COHYDRA_HOSTS=a=<address>,b=<address> and COHYDRA_HOST=a (or b) on each host.
+
+from cohydra import ArgumentParser, Network, DockerNode, Scenario, Distribution
+
+def main():
+    distribution = Distribution.from_environment()
+    scenario = Scenario(distribution=distribution)
+
+    net = Network("10.0.0.0", "255.255.255.0")
+
+    node1 = DockerNode('ping', docker_build_dir='./docker/ping')
+    node2 = DockerNode('pong', docker_build_dir='./docker/pong')
+    net.connect(node1, node2, delay='200ms')
+
+    if distribution is not None:
+        # The channel is simulated on the host of ping (the coordinator), pong is tunnelled.
+        distribution.assign(node2, 'b')
+
+    scenario.add_network(net)
+
+    with scenario as sim:
+        sim.simulate(simulation_time=60)
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.run(main)